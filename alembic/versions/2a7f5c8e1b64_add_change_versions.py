@@ -0,0 +1,34 @@
+"""add_change_versions
+
+Revision ID: 2a7f5c8e1b64
+Revises: 9d3e6b4a2c17
+Create Date: 2026-10-17 16:48:19.660842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a7f5c8e1b64'
+down_revision: Union[str, None] = '9d3e6b4a2c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.create_table(
+        'change_counters',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.execute("INSERT INTO change_counters (name, value) VALUES ('conversations', 1)")
+
+
+def downgrade() -> None:
+    op.drop_table('change_counters')
+    op.drop_column('conversations', 'version')
@@ -0,0 +1,65 @@
+"""add_message_seq
+
+Revision ID: 3f9c2d7e8a41
+Revises: aac839eb9928
+Create Date: 2026-10-17 11:26:08.734512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7e8a41'
+down_revision: Union[str, None] = 'aac839eb9928'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Existing messages are numbered a batch of conversations at a time so the
+# backfill never runs as a single statement over the whole messages table.
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('seq', sa.Integer(), nullable=True))
+
+    # Number existing messages in id order; timestamps were all set to the
+    # process start time and cannot order them
+    connection = op.get_bind()
+    last_conversation_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text(
+                "SELECT DISTINCT conversation_id FROM messages "
+                "WHERE conversation_id > :last_conversation_id "
+                "ORDER BY conversation_id LIMIT :batch_size"
+            ),
+            {"last_conversation_id": last_conversation_id, "batch_size": BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        connection.execute(
+            sa.text(
+                "UPDATE messages SET seq = numbered.seq "
+                "FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY id) AS seq "
+                "      FROM messages "
+                "      WHERE conversation_id > :first_conversation_id AND conversation_id <= :last_conversation_id) AS numbered "
+                "WHERE messages.id = numbered.id"
+            ),
+            {"first_conversation_id": last_conversation_id, "last_conversation_id": rows[-1].conversation_id},
+        )
+        last_conversation_id = rows[-1].conversation_id
+
+    op.alter_column('messages', 'seq', nullable=False)
+    op.create_index('ix_messages_conversation_id_seq', 'messages', ['conversation_id', 'seq'], unique=True)
+    # The composite index covers every lookup by conversation_id alone
+    op.drop_index('ix_messages_conversation_id', table_name='messages')
+
+
+def downgrade() -> None:
+    op.create_index('ix_messages_conversation_id', 'messages', ['conversation_id'], unique=False)
+    op.drop_index('ix_messages_conversation_id_seq', table_name='messages')
+    op.drop_column('messages', 'seq')
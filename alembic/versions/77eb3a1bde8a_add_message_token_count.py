@@ -0,0 +1,57 @@
+"""add_message_token_count
+
+Revision ID: 77eb3a1bde8a
+Revises: e821632b3d10
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.history import count_tokens
+
+
+# revision identifiers, used by Alembic.
+revision: str = '77eb3a1bde8a'
+down_revision: Union[str, None] = 'e821632b3d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows are tokenized and updated in batches so the backfill never holds the
+# whole messages table in memory or in a single long-running statement.
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('token_count', sa.Integer(), nullable=True))
+    op.create_index('ix_messages_conversation_id', 'messages', ['conversation_id'], unique=False)
+
+    # Backfill token counts for existing messages
+    model = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text(
+                "SELECT id, content FROM messages "
+                "WHERE id > :last_id AND token_count IS NULL "
+                "ORDER BY id LIMIT :batch_size"
+            ),
+            {"last_id": last_id, "batch_size": BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+
+        connection.execute(
+            sa.text("UPDATE messages SET token_count = :token_count WHERE id = :id"),
+            [{"id": row.id, "token_count": count_tokens(row.content or "", model)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_conversation_id', table_name='messages')
+    op.drop_column('messages', 'token_count')
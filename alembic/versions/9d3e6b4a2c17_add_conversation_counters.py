@@ -0,0 +1,56 @@
+"""add_conversation_counters
+
+Revision ID: 9d3e6b4a2c17
+Revises: e5b2c9a17f40
+Create Date: 2026-10-17 16:04:51.207339
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3e6b4a2c17'
+down_revision: Union[str, None] = 'e5b2c9a17f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Counters are backfilled a range of conversation ids at a time so the
+# backfill never runs as a single statement over the whole messages table.
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    connection = op.get_bind()
+    max_id = connection.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM conversations")).scalar()
+    for first_id in range(0, max_id, BACKFILL_BATCH_SIZE):
+        connection.execute(
+            sa.text(
+                "UPDATE conversations SET message_count = counted.message_count, last_message_at = counted.last_message_at "
+                "FROM (SELECT conversation_id, COUNT(*) AS message_count, MAX(timestamp) AS last_message_at "
+                "      FROM messages "
+                "      WHERE conversation_id > :first_id AND conversation_id <= :last_id "
+                "      GROUP BY conversation_id) AS counted "
+                "WHERE conversations.id = counted.conversation_id"
+            ),
+            {"first_id": first_id, "last_id": first_id + BACKFILL_BATCH_SIZE},
+        )
+
+    # Conversation list sorted by recent activity
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_conversations_activity_id', 'conversations',
+            [sa.text('coalesce(last_message_at, created_at)'), 'id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_activity_id', table_name='conversations')
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'message_count')
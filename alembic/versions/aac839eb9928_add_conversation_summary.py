@@ -0,0 +1,28 @@
+"""add_conversation_summary
+
+Revision ID: aac839eb9928
+Revises: 77eb3a1bde8a
+Create Date: 2026-10-17 10:03:27.184420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'aac839eb9928'
+down_revision: Union[str, None] = '77eb3a1bde8a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_message_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'summary_message_id')
+    op.drop_column('conversations', 'summary')
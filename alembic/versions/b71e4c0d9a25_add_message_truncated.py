@@ -0,0 +1,26 @@
+"""add_message_truncated
+
+Revision ID: b71e4c0d9a25
+Revises: 3f9c2d7e8a41
+Create Date: 2026-10-17 12:48:53.210387
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e4c0d9a25'
+down_revision: Union[str, None] = '3f9c2d7e8a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('truncated', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'truncated')
@@ -0,0 +1,53 @@
+"""add_search_vectors
+
+Revision ID: c4e8a7d2f915
+Revises: b71e4c0d9a25
+Create Date: 2026-10-17 14:05:41.582913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a7d2f915'
+down_revision: Union[str, None] = 'b71e4c0d9a25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Stored generated columns: Postgres keeps them current on every insert
+    # and update, so no application code or trigger maintains them. Adding
+    # one rewrites the table once.
+    op.add_column('messages', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', content)", persisted=True),
+    ))
+    op.add_column('conversations', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', title)", persisted=True),
+    ))
+
+    # Build the GIN indexes without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_search_vector', 'messages', ['search_vector'],
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_conversations_search_vector', 'conversations', ['search_vector'],
+            postgresql_using='gin', postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_search_vector', table_name='conversations')
+    op.drop_index('ix_messages_search_vector', table_name='messages')
+    op.drop_column('conversations', 'search_vector')
+    op.drop_column('messages', 'search_vector')
@@ -0,0 +1,30 @@
+"""add_conversation_list_index
+
+Revision ID: e5b2c9a17f40
+Revises: c4e8a7d2f915
+Create Date: 2026-10-17 15:22:08.316475
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2c9a17f40'
+down_revision: Union[str, None] = 'c4e8a7d2f915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pages of the conversation list walk this index backwards
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_conversations_created_at_id', 'conversations', ['created_at', 'id'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_created_at_id', table_name='conversations')
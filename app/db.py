@@ -18,5 +18,18 @@ if not DATABASE_URL:
     DB_NAME = os.getenv("DB_NAME")
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL, echo=False)
+# Connection pool sizing. Chat requests only hold a connection for short
+# transactions (never while the model responds), so the pool bounds concurrent
+# DB work rather than concurrent chat streams.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
 SessionLocal = scoped_session(sessionmaker(bind=engine)) 
\ No newline at end of file
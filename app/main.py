@@ -8,7 +8,7 @@ from sqlalchemy import text
 from werkzeug.exceptions import BadRequest
 
 # Import blueprints
-from app.routes import conversations_bp, calculators_bp, documents_bp, education_bp, dashboard_bp
+from app.routes import conversations_bp, calculators_bp, documents_bp, education_bp, dashboard_bp, search_bp
 
 # Import utilities
 from app.utils.error_handlers import (
@@ -21,6 +21,12 @@ from app.utils.error_handlers import (
     ErrorSeverity
 )
 from app.utils.database import get_db_session
+from app.services.response_cache import response_cache
+from app.services.stream_metrics import stream_metrics
+from app.services.stream_buffer import stream_registry
+from app.services.admission import chat_admission
+from app.services.retrieval import retrieval_index
+from config import Config, config
 
 from app.models_base import Base
 from app.db import engine
@@ -32,6 +38,10 @@ load_dotenv()
 
 def create_app():
     """Application factory pattern"""
+    # Fail fast on settings the selected environment requires (e.g. SECRET_KEY in production)
+    config_class = config.get(os.getenv("FLASK_ENV", "default"), config["default"])
+    missing_configs = config_class.validate_config()
+    
     app = Flask(__name__)
     
     # Configure CORS
@@ -39,13 +49,15 @@ def create_app():
         "http://localhost:3000",  # Local development
         "https://my-financial-advisor.onrender.com",  # Your frontend domain
         "https://financial-advisor-4yle.onrender.com"  # Your backend domain (for health checks)
-    ]}})
+    ]}}, expose_headers=["X-Next-Cursor", "Retry-After"])
     
     # Configure logging
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
+    if missing_configs:
+        logging.warning(f"Missing configuration: {', '.join(missing_configs)}")
     
     # Register blueprints
     app.register_blueprint(conversations_bp, url_prefix='/api/v1')
@@ -53,6 +65,7 @@ def create_app():
     app.register_blueprint(documents_bp, url_prefix='/api/v1')
     app.register_blueprint(education_bp, url_prefix='/api/v1')
     app.register_blueprint(dashboard_bp, url_prefix='/api/v1')
+    app.register_blueprint(search_bp, url_prefix='/api/v1')
     
     # Health check endpoint
     @app.route("/health", methods=["GET"])
@@ -81,7 +94,9 @@ def create_app():
         
         # Check OpenAI
         api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
+        if Config.LLM_PROVIDER == "simulated":
+            health_status["services"]["openai"] = "simulated"
+        elif api_key:
             health_status["services"]["openai"] = "configured"
         else:
             health_status["services"]["openai"] = "not_configured"
@@ -92,6 +107,19 @@ def create_app():
         
         return jsonify(health_status)
     
+    # Metrics endpoint
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Runtime counters for this worker process"""
+        return jsonify({
+            "timestamp": datetime.now().isoformat(),
+            "response_cache": response_cache.stats(),
+            "streams": stream_metrics.stats(),
+            "stream_buffers": stream_registry.stats(),
+            "chat_admission": chat_admission.stats(),
+            "retrieval_index": retrieval_index.stats()
+        })
+    
     # Ping endpoint
     @app.route("/ping", methods=["GET"])
     def ping():
@@ -109,9 +137,13 @@ def create_app():
             "endpoints": {
                 "conversations": {
                     "POST /api/v1/conversations": "Create a new conversation",
-                    "GET /api/v1/conversations": "Get all conversations",
-                    "GET /api/v1/conversations/<id>": "Get specific conversation",
+                    "GET /api/v1/conversations?limit=&cursor=&sort=created|activity": "Get conversations, newest first (next page cursor in X-Next-Cursor)",
+                    "GET /api/v1/conversations/<id>?recent=": "Get specific conversation (only its newest messages with recent)",
+                    "GET /api/v1/conversations/<id>/messages?before=&limit=": "Get a page of messages, newest first",
+                    "GET /api/v1/conversations/<id>/changes?since=": "Get messages and metadata changed since a sync cursor",
                     "POST /api/v1/conversations/<id>": "Send message to conversation",
+                    "POST /api/v1/conversations/<id>/stream": "Send message with streaming response (resume with Last-Event-ID)",
+                    "DELETE /api/v1/conversations/<id>/streams/<stream_id>": "Stop a streaming response",
                     "POST /api/v1/conversations/<id>/rename": "Rename conversation",
                     "POST /api/v1/conversations/<id>/auto_rename": "Auto-rename conversation",
                     "PATCH /api/v1/conversations/<id>/tags": "Update conversation tags",
@@ -128,6 +160,9 @@ def create_app():
                     "DELETE /api/v1/documents/<filename>": "Delete document",
                     "DELETE /api/v1/documents/delete-all": "Delete all documents",
                     "POST /api/v1/documents/<filename>/analyze": "Re-analyze document"
+                },
+                "search": {
+                    "GET /api/v1/search?q=&limit=&cursor=": "Full-text search over messages and conversation titles"
                 }
             }
         })
@@ -3,12 +3,19 @@
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
     Text,
     DateTime,
     ForeignKey,
     ARRAY,
+    Boolean,
+    Index,
+    Computed,
+    false,
+    text,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime, timezone
 
@@ -20,13 +27,27 @@ class Conversation(Base):
     __tablename__ = "conversations"
     id = Column(Integer, primary_key=True)
     title = Column(String, default="Untitled", nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     tags = Column(ARRAY(Text), default=list)  # Use ARRAY of Text
+    summary = Column(Text, nullable=True)  # Rolling summary of older messages
+    summary_message_id = Column(Integer, nullable=True)  # Last message covered by the summary
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")  # Maintained by the chat service
+    last_message_at = Column(DateTime, nullable=True)  # Timestamp of the newest message
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every write, for ETags
+    # Full-text search document, maintained by Postgres
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('english', title)", persisted=True))
     messages = relationship(
         "Message",
         back_populates="conversation",
         cascade="all, delete-orphan",
-        order_by="Message.timestamp",
+        order_by="Message.seq",
+    )
+    __table_args__ = (
+        # Conversation list pages by (created_at, id), newest first
+        Index("ix_conversations_created_at_id", "created_at", "id"),
+        # Conversation list sorted by recent activity: last message, else creation
+        Index("ix_conversations_activity_id", text("coalesce(last_message_at, created_at)"), "id"),
+        Index("ix_conversations_search_vector", "search_vector", postgresql_using="gin"),
     )
     def __repr__(self):
         return f"<Conversation id={self.id} title='{self.title}' tags={self.tags}>"
@@ -35,9 +56,27 @@ class Message(Base):
     __tablename__ = "messages"
     id = Column(Integer, primary_key=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    seq = Column(Integer, nullable=False)  # Position within the conversation, starting at 1 in insertion order
     role = Column(String, nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=datetime.now(timezone.utc))
+    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    token_count = Column(Integer, nullable=True)  # Tokens in content, counted once at insert time
+    truncated = Column(Boolean, nullable=False, default=False, server_default=false())  # Reply cut short by a client disconnect
+    # Full-text search document, maintained by Postgres
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))
     conversation = relationship("Conversation", back_populates="messages")
+    __table_args__ = (
+        # History is always read per conversation in seq order
+        Index("ix_messages_conversation_id_seq", "conversation_id", "seq", unique=True),
+        Index("ix_messages_search_vector", "search_vector", postgresql_using="gin"),
+    )
     def __repr__(self):
         return f"<Message id={self.id} role={self.role} content='{self.content[:20]}...'>"
+
+class ChangeCounter(Base):
+    """Named counters bumped by every write to a collection, for list ETags"""
+    __tablename__ = "change_counters"
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    def __repr__(self):
+        return f"<ChangeCounter name={self.name} value={self.value}>"
@@ -4,5 +4,6 @@ from .calculators import calculators_bp
 from .documents import documents_bp
 from .education import education_bp
 from .dashboard import dashboard_bp
+from .search import search_bp
 
-__all__ = ['conversations_bp', 'calculators_bp', 'documents_bp', 'education_bp', 'dashboard_bp'] 
\ No newline at end of file
+__all__ = ['conversations_bp', 'calculators_bp', 'documents_bp', 'education_bp', 'dashboard_bp', 'search_bp'] 
\ No newline at end of file
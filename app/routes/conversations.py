@@ -3,7 +3,6 @@ import logging
 from datetime import datetime
 # from openai import OpenAI  # Removed unused import
 import os
-import json
 import openai
 
 from app.models import Conversation, Message
@@ -15,11 +14,27 @@ from app.utils.error_handlers import (
     NotFoundError, 
     ValidationError,
     ErrorType, 
-    ErrorSeverity
+    ErrorSeverity,
+    validate_numeric_range
 )
 from app.utils.database import get_db_session
-from app.services.chat import get_chat_response, get_chat_response_stream, auto_rename_conversation as rename_conversation_func
+from app.services.chat import get_chat_response, get_chat_response_stream
+from app.services.titling import title_worker
+from app.services.stream_buffer import parse_event_id, start_stream, stream_registry
+from app.services.admission import chat_admission, get_client_id
+from app.services.retrieval import retrieval_index
+from app.services.history import get_conversation_token_total
+from app.services.conversation_list import list_conversations
+from app.services.message_pages import get_all_messages, get_changes_since, get_message_page
+from app.services.conversation_counters import (
+    get_conversation_version,
+    get_list_version,
+    record_conversation_change,
+)
 from app.utils import validate_json_data
+from app.utils.pagination import encode_cursor, parse_limit
+from app.utils.conditional import is_not_modified, make_etag, not_modified, with_etag
+from config import Config
 
 # Create blueprint
 conversations_bp = Blueprint('conversations', __name__)
@@ -45,6 +60,8 @@ def create_conversation():
                 tags=[]
             )
             session.add(conversation)
+            session.flush()
+            record_conversation_change(session)
             session.commit()
             
             return jsonify({
@@ -59,60 +76,121 @@ def create_conversation():
 
 @conversations_bp.route("/conversations", methods=["GET"])
 def get_conversations():
-    """Get all conversations"""
+    """Get conversations newest first by creation or activity, one page at a time (next page cursor in X-Next-Cursor)"""
     try:
+        limit = parse_limit(
+            request.args.get("limit"), Config.CONVERSATIONS_PAGE_SIZE, Config.CONVERSATIONS_MAX_PAGE_SIZE
+        )
         with get_db_session() as session:
-            conversations = session.query(Conversation).order_by(Conversation.created_at.desc()).all()
-            
-            result = []
-            for conv in conversations:
-                # Count messages for this conversation
-                message_count = session.query(Message).filter_by(conversation_id=conv.id).count()
-                
-                result.append({
-                    "id": conv.id,
-                    "title": conv.title,
-                    "created_at": conv.created_at.isoformat(),
-                    "tags": conv.tags,
-                    "message_count": message_count
-                })
-            
-            return jsonify(result)
+            etag = make_etag("conversations", get_list_version(session), request.query_string.decode())
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+            result, next_cursor = list_conversations(
+                session, limit, request.args.get("cursor") or None, request.args.get("sort", "created")
+            )
+
+        response = jsonify(result)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return with_etag(response, etag)
             
     except Exception as e:
         return handle_api_error(e, "Failed to fetch conversations")
 
 @conversations_bp.route("/conversations/<int:conversation_id>", methods=["GET"])
 def get_conversation(conversation_id):
-    """Get a specific conversation with its messages"""
+    """Get a specific conversation with its messages (only the newest N with ?recent=N)"""
     try:
+        recent = request.args.get("recent")
+        if recent is not None:
+            recent = parse_limit(recent, Config.MESSAGES_PAGE_SIZE, Config.MESSAGES_MAX_PAGE_SIZE)
+        
         with get_db_session() as session:
-            conversation = session.get(Conversation, conversation_id)
-            if not conversation:
+            version = get_conversation_version(session, conversation_id)
+            if version is None:
                 not_found_error = NotFoundError(
                     "Conversation not found",
                     resource_type="conversation"
                 )
                 return create_error_response(not_found_error)
+            etag = make_etag("conversation", conversation_id, version, recent)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
             
-            messages = session.query(Message).filter_by(conversation_id=conversation_id).order_by(Message.timestamp).all()
-            
-            return jsonify({
+            conversation = session.get(Conversation, conversation_id)
+            result = {
                 "id": conversation.id,
                 "title": conversation.title,
                 "created_at": conversation.created_at.isoformat(),
                 "tags": conversation.tags,
-                "messages": [{
-                    "id": msg.id,
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat()
-                } for msg in messages]
-            })
+                "total_tokens": get_conversation_token_total(session, conversation_id),
+            }
+            if recent is not None:
+                # Older messages are fetched from /messages?before=<messages_before>
+                result["messages"], result["messages_before"] = get_message_page(session, conversation_id, recent)
+            else:
+                result["messages"] = get_all_messages(session, conversation_id)
+            # Poll /changes?since=<sync_cursor> for anything newer than this response
+            last_seq = result["messages"][-1]["seq"] if result["messages"] else 0
+            result["sync_cursor"] = encode_cursor([version, last_seq])
+            
+            return with_etag(jsonify(result), etag)
             
     except Exception as e:
         return handle_api_error(e, "Failed to fetch conversation")
 
+@conversations_bp.route("/conversations/<int:conversation_id>/messages", methods=["GET"])
+def get_conversation_messages(conversation_id):
+    """Get a page of a conversation's messages, newest first (older pages with ?before=<seq>)"""
+    try:
+        limit = parse_limit(request.args.get("limit"), Config.MESSAGES_PAGE_SIZE, Config.MESSAGES_MAX_PAGE_SIZE)
+        before = request.args.get("before")
+        if before is not None:
+            before = int(validate_numeric_range(before, 1, None, "before"))
+        
+        with get_db_session() as session:
+            version = get_conversation_version(session, conversation_id)
+            if version is None:
+                not_found_error = NotFoundError(
+                    "Conversation not found",
+                    resource_type="conversation"
+                )
+                return create_error_response(not_found_error)
+            etag = make_etag("messages", conversation_id, version, limit, before)
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+            
+            messages, next_before = get_message_page(session, conversation_id, limit, before)
+        
+        return with_etag(jsonify({
+            "conversation_id": conversation_id,
+            "messages": messages,
+            "next_before": next_before
+        }), etag)
+        
+    except Exception as e:
+        return handle_api_error(e, "Failed to fetch messages")
+
+@conversations_bp.route("/conversations/<int:conversation_id>/changes", methods=["GET"])
+def get_conversation_changes(conversation_id):
+    """Get the messages and metadata changed since a sync cursor, and the next cursor"""
+    try:
+        limit = parse_limit(request.args.get("limit"), Config.MESSAGES_MAX_PAGE_SIZE, Config.MESSAGES_MAX_PAGE_SIZE)
+        
+        with get_db_session() as session:
+            changes = get_changes_since(session, conversation_id, request.args.get("since") or None, limit)
+        if changes is None:
+            not_found_error = NotFoundError(
+                "Conversation not found",
+                resource_type="conversation"
+            )
+            return create_error_response(not_found_error)
+        
+        return jsonify(changes)
+        
+    except Exception as e:
+        return handle_api_error(e, "Failed to fetch conversation changes")
+
 @conversations_bp.route("/conversations/<int:conversation_id>", methods=["POST"])
 def send_message(conversation_id):
     """Send a message to a conversation"""
@@ -127,16 +205,19 @@ def send_message(conversation_id):
             )
             return create_error_response(validation_error)
         
-        with get_db_session() as session:
-            conversation = session.get(Conversation, conversation_id)
-            if not conversation:
-                not_found_error = NotFoundError(
-                    "Conversation not found",
-                    resource_type="conversation"
-                )
-                return create_error_response(not_found_error)
+        # Refuse with 429 before touching the database when overloaded
+        with chat_admission.admit(get_client_id(request)):
+            with get_db_session() as session:
+                conversation = session.get(Conversation, conversation_id)
+                if not conversation:
+                    not_found_error = NotFoundError(
+                        "Conversation not found",
+                        resource_type="conversation"
+                    )
+                    return create_error_response(not_found_error)
             
-            # Get AI response using the service
+            # Get AI response using the service (outside the session so no
+            # connection is held while waiting on OpenAI)
             try:
                 ai_response, _ = get_chat_response(message_content, conversation_id)
                 
@@ -157,10 +238,52 @@ def send_message(conversation_id):
     except Exception as e:
         return handle_api_error(e, "Failed to send message")
 
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type, Last-Event-ID',
+}
+
+def stream_response(buffer, last_number=0):
+    """Return an SSE response that tails a stream buffer from after last_number"""
+    return Response(
+        buffer.tail(
+            last_number,
+            keepalive_seconds=Config.STREAM_KEEPALIVE_SECONDS,
+            flush_interval=Config.STREAM_FLUSH_INTERVAL_MS / 1000,
+            max_frame_bytes=Config.STREAM_FRAME_MAX_BYTES,
+        ),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS,
+    )
+
+def resume_stream(conversation_id):
+    """Resume the stream named by the Last-Event-ID header, replaying missed events"""
+    parsed = parse_event_id(request.headers.get("Last-Event-ID"))
+    buffer = stream_registry.get(parsed[0]) if parsed else None
+    if not buffer or buffer.conversation_id != conversation_id:
+        # Expired, evicted or served by another worker: the client has to send the message again
+        not_found_error = NotFoundError(
+            "Stream not found or expired",
+            resource_type="stream"
+        )
+        return create_error_response(not_found_error)
+    return stream_response(buffer, parsed[1])
+
 @conversations_bp.route("/conversations/<int:conversation_id>/stream", methods=["POST"])
 def send_message_stream(conversation_id):
-    """Send a message to a conversation with streaming response"""
+    """
+    Send a message to a conversation with streaming response.
+    
+    Every event carries an id. A reconnect with a Last-Event-ID header resumes
+    the in-flight stream (replaying missed events) instead of starting a new
+    generation; no message body is needed then.
+    """
     try:
+        if request.headers.get("Last-Event-ID"):
+            return resume_stream(conversation_id)
+        
         data = validate_json_data(request)
         message_content = data.get("message", "").strip()
         
@@ -171,47 +294,66 @@ def send_message_stream(conversation_id):
             )
             return create_error_response(validation_error)
         
-        with get_db_session() as session:
-            conversation = session.get(Conversation, conversation_id)
-            if not conversation:
-                not_found_error = NotFoundError(
-                    "Conversation not found",
-                    resource_type="conversation"
-                )
-                return create_error_response(not_found_error)
-        
-        def generate():
-            try:
-                # Stream the AI response
-                for chunk in get_chat_response_stream(message_content, conversation_id):
-                    # Send each chunk as a Server-Sent Event
-                    yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-                
-                # Send end signal
-                yield f"data: {json.dumps({'end': True, 'conversation_id': conversation_id})}\n\n"
-                
-            except Exception as ai_error:
-                logging.error(f"AI streaming error: {ai_error}")
-                error_data = {
-                    'error': 'Failed to get AI response',
-                    'details': str(ai_error)
-                }
-                yield f"data: {json.dumps(error_data)}\n\n"
-        
-        return Response(
-            generate(),
-            mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'Connection': 'keep-alive',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-            }
-        )
+        # Refuse with 429 before touching the database when overloaded; the
+        # slot is held until generation ends, not just for this request
+        slot = chat_admission.admit(get_client_id(request))
+        try:
+            with get_db_session() as session:
+                conversation = session.get(Conversation, conversation_id)
+                if not conversation:
+                    slot.release()
+                    not_found_error = NotFoundError(
+                        "Conversation not found",
+                        resource_type="conversation"
+                    )
+                    return create_error_response(not_found_error)
+            
+            # Generation runs on its own thread so it survives a dropped connection
+            buffer = start_stream(
+                stream_registry,
+                conversation_id,
+                lambda: get_chat_response_stream(message_content, conversation_id),
+                grace_seconds=Config.STREAM_RESUME_GRACE_SECONDS,
+                on_finish=slot.release,
+            )
+        except Exception:
+            slot.release()
+            raise
+        return stream_response(buffer)
             
     except Exception as e:
         return handle_api_error(e, "Failed to send message")
 
+@conversations_bp.route("/conversations/<int:conversation_id>/stream", methods=["GET"])
+def resume_message_stream(conversation_id):
+    """Resume an in-flight stream from its Last-Event-ID (EventSource reconnects)"""
+    try:
+        return resume_stream(conversation_id)
+    except Exception as e:
+        return handle_api_error(e, "Failed to resume stream")
+
+@conversations_bp.route("/conversations/<int:conversation_id>/streams/<stream_id>", methods=["DELETE"])
+def cancel_message_stream(conversation_id, stream_id):
+    """Stop an in-flight stream right away; its partial reply is kept as truncated"""
+    try:
+        buffer = stream_registry.get(stream_id)
+        if not buffer or buffer.conversation_id != conversation_id:
+            not_found_error = NotFoundError(
+                "Stream not found or expired",
+                resource_type="stream"
+            )
+            return create_error_response(not_found_error)
+        
+        buffer.cancel()
+        return jsonify({
+            "id": stream_id,
+            "conversation_id": conversation_id,
+            "status": "finished" if buffer.finished else "cancelling"
+        })
+    
+    except Exception as e:
+        return handle_api_error(e, "Failed to cancel stream")
+
 @conversations_bp.route("/conversations/<int:conversation_id>/rename", methods=["POST"])
 def rename_conversation(conversation_id):
     """Rename a conversation"""
@@ -236,6 +378,7 @@ def rename_conversation(conversation_id):
                 return create_error_response(not_found_error)
             
             conversation.title = new_title
+            record_conversation_change(session, conversation_id)
             
             return jsonify({
                 "id": conversation.id,
@@ -248,7 +391,7 @@ def rename_conversation(conversation_id):
 
 @conversations_bp.route("/conversations/<int:conversation_id>/auto_rename", methods=["POST"])
 def auto_rename_conversation(conversation_id):
-    """Auto-rename conversation based on content using AI"""
+    """Schedule an AI-generated title for a conversation"""
     try:
         with get_db_session() as session:
             conversation = session.get(Conversation, conversation_id)
@@ -259,17 +402,15 @@ def auto_rename_conversation(conversation_id):
                 )
                 return create_error_response(not_found_error)
             
-            # Use the updated auto_rename_conversation function from chat.py
-            rename_conversation_func(session, conversation_id)
-            
-            # Refresh the conversation to get the updated title
-            session.refresh(conversation)
+            # The title is generated by the background worker; return the current one
+            title_worker.request(conversation_id)
             
             return jsonify({
                 "id": conversation.id,
                 "title": conversation.title,
-                "message": "Conversation auto-renamed successfully"
-            })
+                "status": "pending",
+                "message": "Conversation auto-rename scheduled"
+            }), 202
             
     except Exception as e:
         return handle_api_error(e, "Failed to auto-rename conversation")
@@ -299,6 +440,7 @@ def update_tags(conversation_id):
             
             # Use setattr to properly assign to SQLAlchemy column
             setattr(conversation, 'tags', list(tags))
+            record_conversation_change(session, conversation_id)
             session.commit()
             
             return jsonify({
@@ -328,7 +470,9 @@ def delete_conversation(conversation_id):
             
             # Delete the conversation
             session.delete(conversation)
+            record_conversation_change(session)
             session.commit()
+            retrieval_index.forget(conversation_id)
             
             return jsonify({
                 "message": "Conversation deleted successfully"
@@ -28,6 +28,9 @@ def get_dashboard_stats():
                 Message.timestamp >= seven_days_ago
             ).count()
             
+            # Get token usage from the per-message counts stored at insert time
+            total_tokens = session.query(func.coalesce(func.sum(Message.token_count), 0)).scalar()
+            
             # Get recent activity
             recent_activity = []
             recent_conversations = session.query(Conversation).order_by(
@@ -45,6 +48,7 @@ def get_dashboard_stats():
             return jsonify({
                 "total_conversations": total_conversations,
                 "total_messages": total_messages,
+                "total_tokens": int(total_tokens or 0),
                 "recent_activity": recent_activity
             })
             
@@ -0,0 +1,41 @@
+from flask import Blueprint, request, jsonify
+
+from app.services.search import search_messages, search_conversation_titles
+from app.utils.database import get_db_session
+from app.utils.error_handlers import handle_api_error, ValidationError
+from app.utils.pagination import parse_limit
+from config import Config
+
+# Create blueprint for search routes
+search_bp = Blueprint('search', __name__)
+
+@search_bp.route("/search", methods=["GET"])
+def search():
+    """Full-text search over messages and conversation titles, paged with an opaque cursor"""
+    try:
+        query = request.args.get("q", "").strip()
+        if not query:
+            raise ValidationError("Search query is required", field="q")
+        if len(query) > Config.SEARCH_MAX_QUERY_LENGTH:
+            raise ValidationError(
+                f"Search query must be at most {Config.SEARCH_MAX_QUERY_LENGTH} characters", field="q"
+            )
+        limit = parse_limit(request.args.get("limit"), Config.SEARCH_DEFAULT_LIMIT, Config.SEARCH_MAX_LIMIT)
+        cursor = request.args.get("cursor") or None
+
+        with get_db_session() as session:
+            results, next_cursor = search_messages(session, query, limit, cursor)
+            # Title matches only accompany the first page
+            conversations = [] if cursor else search_conversation_titles(
+                session, query, Config.SEARCH_TITLE_LIMIT
+            )
+
+        return jsonify({
+            "query": query,
+            "results": results,
+            "conversations": conversations,
+            "next_cursor": next_cursor,
+        })
+
+    except Exception as e:
+        return handle_api_error(e, "Failed to search conversations")
@@ -0,0 +1,180 @@
+"""
+Admission control for chat requests.
+
+Every chat request that would call the model first asks ``chat_admission``
+for a slot. It is refused right away with a ``RateLimitError`` (HTTP 429
+with ``Retry-After``) when any of these is true:
+
+* the client's token bucket is empty (sustained rate plus a small burst);
+* the worker-wide bucket is empty;
+* the worker already has ``CHAT_MAX_IN_FLIGHT`` model calls running.
+
+Shedding at the door keeps a burst from tying up every worker thread
+waiting on OpenAI until requests time out. State is per worker process.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.utils.error_handlers import RateLimitError
+from config import Config
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`; one token per request"""
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+class AdmissionSlot:
+    """An admitted request's claim on an in-flight model call; release it exactly once"""
+
+    def __init__(self, controller: Optional["AdmissionController"]):
+        self._controller = controller
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            controller, self._controller = self._controller, None
+        if controller is not None:
+            controller._release()
+
+    def __enter__(self) -> "AdmissionSlot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+class AdmissionController:
+    """Per-client and global token buckets plus a cap on concurrent model calls"""
+
+    def __init__(
+        self,
+        client_rate: float,
+        client_burst: float,
+        global_rate: float,
+        global_burst: float,
+        max_in_flight: int,
+        busy_retry_after: float = 1.0,
+        max_clients: int = 10000,
+        enabled: bool = True,
+    ):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_in_flight = max_in_flight
+        self.busy_retry_after = busy_retry_after
+        self.max_clients = max_clients
+        self.enabled = enabled
+        self._global = TokenBucket(global_rate, global_burst)
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_client = 0
+        self.rejected_global = 0
+        self.rejected_busy = 0
+
+    def admit(self, client_id: str) -> AdmissionSlot:
+        """
+        Claim a slot for one model call, or raise RateLimitError.
+
+        Nothing is consumed when a request is refused, so a rejected client
+        does not also drain the global budget.
+        """
+        if not self.enabled:
+            return AdmissionSlot(None)
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._client_bucket(client_id, now)
+            client_wait = bucket.wait_time(now)
+            if client_wait > 0:
+                self.rejected_client += 1
+                raise RateLimitError("Too many chat requests from this client", retry_after=client_wait, scope="client")
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                self.rejected_global += 1
+                raise RateLimitError("The service is receiving too many chat requests", retry_after=global_wait, scope="global")
+            if self.in_flight >= self.max_in_flight:
+                self.rejected_busy += 1
+                raise RateLimitError("All chat workers are busy", retry_after=self.busy_retry_after, scope="in_flight")
+            bucket.take()
+            self._global.take()
+            self.in_flight += 1
+            self.admitted += 1
+        return AdmissionSlot(self)
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _client_bucket(self, client_id: str, now: float) -> TokenBucket:
+        bucket = self._clients.get(client_id)
+        if bucket is not None:
+            self._clients.move_to_end(client_id)
+            return bucket
+        # Forget the least recently seen clients to bound memory
+        while len(self._clients) >= self.max_clients:
+            self._clients.popitem(last=False)
+        bucket = TokenBucket(self.client_rate, self.client_burst, now)
+        self._clients[client_id] = bucket
+        return bucket
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "admitted": self.admitted,
+                "rejected_client": self.rejected_client,
+                "rejected_global": self.rejected_global,
+                "rejected_busy": self.rejected_busy,
+                "tracked_clients": len(self._clients),
+            }
+
+def get_client_id(request) -> str:
+    """
+    Identify the client for rate limiting.
+
+    Behind ``RATE_LIMIT_TRUSTED_PROXIES`` trusted proxies, the client is the
+    address the outermost of them appended to X-Forwarded-For, i.e. that many
+    hops from the right. Entries further left are written by the client and
+    could be changed on every request to get a fresh bucket. Without a
+    trusted proxy, or with fewer hops than proxies, it is the peer address.
+    """
+    if Config.RATE_LIMIT_TRUST_PROXY and Config.RATE_LIMIT_TRUSTED_PROXIES > 0:
+        hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",")]
+        if len(hops) >= Config.RATE_LIMIT_TRUSTED_PROXIES:
+            forwarded = hops[-Config.RATE_LIMIT_TRUSTED_PROXIES]
+            if forwarded:
+                return forwarded
+    return request.remote_addr or "unknown"
+
+# Process-wide controller used by the chat routes
+chat_admission = AdmissionController(
+    client_rate=Config.RATE_LIMIT_CLIENT_PER_MINUTE / 60,
+    client_burst=Config.RATE_LIMIT_CLIENT_BURST,
+    global_rate=Config.RATE_LIMIT_GLOBAL_PER_SECOND,
+    global_burst=Config.RATE_LIMIT_GLOBAL_BURST,
+    max_in_flight=Config.CHAT_MAX_IN_FLIGHT,
+    busy_retry_after=Config.CHAT_BUSY_RETRY_AFTER_SECONDS,
+    max_clients=Config.RATE_LIMIT_MAX_CLIENTS,
+    enabled=Config.RATE_LIMIT_ENABLED,
+)
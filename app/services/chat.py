@@ -1,17 +1,26 @@
-import os
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-import openai
-from app.db import SessionLocal
+from sqlalchemy import func
 from app.models import Conversation, Message
+from app.utils.database import get_db_session
+from app.utils.openai_client import get_openai_client
+from app.services.history import build_history_window, count_tokens
+from app.services.summaries import advance_summary, get_unsummarized_messages
+from app.services.response_cache import response_cache, make_cache_key, iter_cached_chunks
+from app.services.model_router import CHAT, route_request
+from app.services.stream_metrics import stream_metrics
+from app.services.chat_tools import TOOLS, TOOLS_PROMPT, ToolCallAccumulator, run_tool_calls
+from app.services.retrieval import format_recalled_messages, recall_related_messages, retrieval_index
+from app.services.conversation_counters import bump_list_version, record_message_added
+from config import Config
 from typing import Optional, List, Tuple, Dict, Any, Generator
+import logging
 import re
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-openai.api_key = os.getenv("OPENAI_API_KEY")
+logger = logging.getLogger(__name__)
 
 def clean_ai_response(text: str) -> str:
     """Clean up excessive newlines and whitespace in AI response."""
@@ -65,6 +74,9 @@ def clean_ai_response(text: str) -> str:
     # print(f"CLEAN_AI_RESPONSE OUTPUT: {repr(result)}")  # DEBUG
     return result
 
+# Sampling temperature for advisory chat replies
+CHAT_TEMPERATURE = 0.7
+
 # Base Financial Advisor System Prompt
 BASE_FINANCIAL_ADVISOR_PROMPT = """
 You are an expert financial advisor AI. When presenting information, you may use Markdown formatting, including code blocks, tables, and LaTeX math. 
@@ -124,220 +136,344 @@ def fix_missing_spaces(text: str) -> str:
     text = re.sub(r'\s{2,}', ' ', text)
     return text
 
-def auto_rename_conversation(session, conversation_id: int) -> None:
-    """Automatically rename conversation based on its content using AI"""
-    try:
-        conversation = session.get(Conversation, conversation_id)
-        if not conversation:
-            return
-        
-        # Get all messages in the conversation
-        messages = session.query(Message).filter_by(
-            conversation_id=conversation_id
-        ).order_by(Message.timestamp).all()
-        
-        if not messages:
-            return
-        
-        # Create a summary of the conversation for AI to generate a title
-        conversation_summary = ""
-        for msg in messages:
-            role = "User" if msg.role == "user" else "Assistant"
-            conversation_summary += f"{role}: {msg.content}\n"
-        
-        # Use AI to generate a better title
-        title_prompt = f"""Based on this conversation, generate a concise, descriptive title that is exactly 6 words or less. The title should capture the main topic or question being discussed. Return only the title, nothing else.
+# Lines starting with one of these open a new paragraph instead of being joined
+# to the previous line (see clean_ai_response)
+PARAGRAPH_LEADS = ('where:', 'note:', 'therefore:', 'thus:', 'hence:', 'so:', 'then:')
 
-Conversation:
-{conversation_summary}
+# Enough of a line's start to classify it as a list item or paragraph lead
+LINE_HEAD_CHARS = 32
 
-Title (6 words or less):"""
-        
-        try:
-            # Get AI-generated title
-            title_response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates concise, descriptive titles for conversations. Return only the title, no additional text."},
-                    {"role": "user", "content": title_prompt}
-                ],
-                max_tokens=50,
-                temperature=0.3
-            )
-            
-            title_content = title_response.choices[0].message.content
-            if title_content:
-                new_title = title_content.strip()
-                
-                # Clean up the title (remove quotes, extra spaces, etc.)
-                new_title = new_title.strip('"\'')
-                new_title = new_title.strip()
-                
-                # Limit to at most 6 words
-                words = new_title.split()
-                if len(words) > 6:
-                    # Take words until we reach 6, then stop
-                    new_title = ' '.join(words[:6])
-                
-                # Also ensure it's not too long (character limit as backup)
-                if len(new_title) > 60:
-                    new_title = new_title[:57] + "..."
-                
-                # Update the conversation title
-                conversation.title = new_title
-                session.commit()
-            else:
-                # If AI returned empty response, use fallback
-                raise Exception("AI returned empty title")
-            
-        except Exception as ai_error:
-            # Fallback to original method if AI fails
-            print(f"AI title generation failed, using fallback: {ai_error}")
-            first_user_message = session.query(Message).filter_by(
-                conversation_id=conversation_id, 
-                role="user"
-            ).order_by(Message.timestamp).first()
-            
-            if first_user_message:
-                message_content = str(first_user_message.content)
-                # Limit fallback title to 6 words as well
-                words = message_content.split()
-                if len(words) > 6:
-                    new_title = ' '.join(words[:6])
-                else:
-                    new_title = message_content[:50]  # Character limit as backup
-                    if len(message_content) > 50:
-                        new_title += "..."
-                
-                conversation.title = new_title
-                session.commit()
-            
-    except Exception as e:
-        # Log error but don't fail the main operation
-        print(f"Auto-rename failed for conversation {conversation_id}: {e}")
+# An unterminated "$$" or "\[" is most likely not math; past this many held
+# characters the span is released as plain text
+MAX_HELD_MATH_CHARS = 2000
 
-def convert_standalone_math_to_block(text: str) -> str:
-    """Convert standalone inline math formulas to block math format for centering, with no extra newlines inside the block."""
-    lines = text.split('\n')
-    result_lines = []
-    
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        # Check if the line contains only a math formula (with optional whitespace)
-        # and doesn't already contain $$ block math delimiters
-        if (stripped.startswith('$') and stripped.endswith('$') and 
-            stripped.count('$') == 2 and '$$' not in stripped):
-            # Convert inline math to block math, no extra newlines
-            math_content = stripped[1:-1].strip()  # Remove the $ symbols and extra spaces
-            result_lines.append(f"$${math_content}$$")
-        elif (stripped.startswith('$$') and stripped.endswith('$$') and 
-              stripped.count('$$') == 2):
-            # Already block math, ensure it's properly formatted (no extra newlines)
-            math_content = stripped[2:-2].strip()  # Remove the $$ symbols and extra spaces
-            result_lines.append(f"$${math_content}$$")
-        elif (stripped.startswith('\\(') and stripped.endswith('\\)')):
-            # Convert LaTeX inline math to block math
-            math_content = stripped[2:-2].strip()  # Remove the \( \) symbols
-            result_lines.append(f"$${math_content}$$")
-        elif (stripped.startswith('\\[') and stripped.endswith('\\]')):
-            # Convert LaTeX block math to our format
-            math_content = stripped[2:-2].strip()  # Remove the \[ \] symbols
-            result_lines.append(f"$${math_content}$$")
-        else:
-            result_lines.append(line)
-    
-    return '\n'.join(result_lines)
-
-def convert_bracket_math_to_dollars(text: str) -> str:
-    """Convert various math delimiters to proper LaTeX math format."""
-    # Convert [ ... ] blocks (on their own line) to $$ ... $$
-    def replacer_block(match):
-        content = match.group(1).strip()
-        return f"$$\n{content}\n$$"
-    
-    # Convert inline [ ... ] to $ ... $
-    def replacer_inline(match):
-        content = match.group(1).strip()
-        return f"${content}$"
-    
-    # Pattern for block math: [ ... ] on its own line, possibly with whitespace
-    block_pattern = re.compile(r"^\s*\[(.*?)\]\s*$", re.DOTALL | re.MULTILINE)
-    text = block_pattern.sub(replacer_block, text)
-    
-    # Manual scan for (( ... ))
-    def manual_double_parens_replace(s):
-        result = ''
-        i = 0
-        while i < len(s):
-            if s[i:i+2] == '((':  # Found ((
-                start = i + 2
-                depth = 1
-                j = start
-                while j < len(s):
-                    if s[j:j+2] == '))' and depth == 1:
-                        match_str = s[start:j]
-                        # If the match starts with (, include it
-                        if match_str and s[start-1] == '(':
-                            match_str = '(' + match_str
-                        result += f'${match_str}$'
-                        i = j + 2
-                        break
-                    elif s[j:j+2] == '((':  # Nested ((
-                        depth += 1
-                        j += 2
-                    elif s[j:j+2] == '))' and depth > 1:
-                        depth -= 1
-                        j += 2
-                    else:
-                        j += 1
+_MATH_SPECIAL_CHARS = re.compile(r"[\\$]")
+
+class StreamingResponseNormalizer:
+    """
+    Chunk-at-a-time post-processing of a streamed AI response.
+
+    Applies the newline cleanup of ``clean_ai_response`` and converts LaTeX
+    ``\\(...\\)`` and ``\\[...\\]`` delimiters to ``$...$`` and ``$$...$$`` as
+    chunks arrive. Text is released as soon as it can no longer change; only
+    an incomplete ``$$...$$`` or ``\\[...\\]`` block, a half-received
+    delimiter, the start of a line that cannot be classified yet and trailing
+    whitespace are held back. Each chunk costs time proportional to its own
+    length, and the concatenated output of ``feed`` and ``finish`` does not
+    depend on how the text was split into chunks.
+    """
+
+    def __init__(self):
+        # Math delimiter state
+        self._math_pending = ""  # trailing "\" or "$" that may start a delimiter
+        self._block_close: Optional[str] = None  # closing delimiter of the open block
+        self._block_open = ""  # opening delimiter as received
+        self._block_parts: List[str] = []
+        self._block_size = 0
+
+        # Line cleanup state
+        self._started = False  # any line emitted yet
+        self._in_line = False  # the current line has been classified and is streaming
+        self._held_parts: List[str] = []  # unclassified start of the current line
+        self._held_head = ""
+        self._held_size = 0
+        self._bold_closed = False  # the held line starts with "**" and closes it
+        self._trailing_space = ""
+        self._output_head = ""  # start of the current output line
+
+    def feed(self, chunk: str) -> str:
+        """Process the next chunk and return the text that is now final"""
+        return self._clean_lines(self._convert_math(chunk))
+
+    def finish(self) -> str:
+        """Flush everything still held back at the end of the stream"""
+        text = self._math_pending
+        self._math_pending = ""
+        if self._block_close is not None:
+            # Unterminated block: pass it through unconverted
+            text = self._block_open + "".join(self._block_parts) + text
+            self._block_close = None
+        out = [self._clean_lines(text)]
+        self._end_line(out)
+        return "".join(out)
+
+    def _convert_math(self, chunk: str) -> str:
+        """Convert math delimiters, holding back open blocks until they close"""
+        text = self._math_pending + chunk
+        self._math_pending = ""
+        out: List[str] = []
+        i, n = 0, len(text)
+        while i < n:
+            match = _MATH_SPECIAL_CHARS.search(text, i)
+            end = match.start() if match else n
+            if end > i:
+                self._emit_math(out, text[i:end])
+            if not match:
+                break
+            i = end
+            if i + 1 == n:
+                # Could be the first half of a delimiter; wait for the next chunk
+                self._math_pending = text[i]
+                break
+            pair = text[i:i + 2]
+
+            if self._block_close is None:
+                if pair in ("\\(", "\\)"):
+                    out.append("$")
+                elif pair in ("\\[", "$$"):
+                    self._block_close = "\\]" if pair == "\\[" else "$$"
+                    self._block_open = pair
+                    self._block_parts = []
+                    self._block_size = 0
+                elif pair[0] == "\\":
+                    # Escaped character, e.g. "\$" or "\\"
+                    out.append(pair)
                 else:
-                    # No closing )), just add the rest
-                    result += s[i:]
-                    break
+                    out.append("$")
+                    i += 1
+                    continue
+                i += 2
+            elif pair == self._block_close:
+                out.append("$$" + "".join(self._block_parts) + "$$")
+                self._block_close = None
+                self._block_parts = []
+                i += 2
+            elif pair[0] == "\\":
+                self._emit_math(out, pair)
+                i += 2
             else:
-                result += s[i]
+                self._emit_math(out, "$")
                 i += 1
-        return result
-    text = manual_double_parens_replace(text)
-    
-    # Convert \( ... \) to $ ... $
-    text = re.sub(r"\\\((.*?)\\\)", r"$\1$", text)
-    
-    # Convert \[ ... \] to $$ ... $$
-    text = re.sub(r"\\\[(.*?)\\\]", r"$$\1$$", text)
+        return "".join(out)
+
+    def _emit_math(self, out: List[str], text: str) -> None:
+        """Append text to the output, or to the open block if there is one"""
+        if self._block_close is None:
+            out.append(text)
+            return
+        self._block_parts.append(text)
+        self._block_size += len(text)
+        if self._block_size > MAX_HELD_MATH_CHARS:
+            out.append(self._block_open + "".join(self._block_parts))
+            self._block_close = None
+            self._block_parts = []
+
+    def _clean_lines(self, text: str) -> str:
+        """Apply the clean_ai_response line rules to the next piece of text"""
+        out: List[str] = []
+        i, n = 0, len(text)
+        while i < n:
+            end = text.find("\n", i)
+            segment = text[i:] if end == -1 else text[i:end]
+            if segment:
+                self._add_to_line(out, segment)
+            if end == -1:
+                break
+            self._end_line(out)
+            i = end + 1
+        return "".join(out)
+
+    def _add_to_line(self, out: List[str], segment: str) -> None:
+        if self._in_line:
+            content = segment.rstrip()
+            if not content:
+                self._trailing_space += segment
+                return
+            self._emit_line_text(out, self._trailing_space + content)
+            self._trailing_space = segment[len(content):]
+            return
+
+        if not self._held_parts:
+            segment = segment.lstrip()
+            if not segment:
+                return
+
+        # Track whether a "**" line closes its bold text, scanning only new text
+        if self._held_size >= 3:
+            scan, start = self._held_parts[-1][-1] + segment, 0
+        else:
+            scan, start = "".join(self._held_parts) + segment, 2
+        if scan.find("**", start) != -1:
+            self._bold_closed = True
+
+        self._held_parts.append(segment)
+        self._held_size += len(segment)
+        if len(self._held_head) < LINE_HEAD_CHARS:
+            self._held_head = (self._held_head + segment)[:LINE_HEAD_CHARS]
+
+        starts_new_line = self._classify_line(self._held_head)
+        if starts_new_line is not None:
+            self._start_line(out, starts_new_line)
+
+    def _end_line(self, out: List[str]) -> None:
+        if self._held_parts:
+            line = "".join(self._held_parts).rstrip()
+            self._held_parts = [line]
+            self._start_line(out, self._classify_line(line[:LINE_HEAD_CHARS], line))
+        self._in_line = False
+        self._trailing_space = ""
+
+    def _classify_line(self, head: str, line: Optional[str] = None) -> Optional[bool]:
+        """
+        Decide whether the held line starts a new output line.
+
+        Mirrors the list-item and paragraph checks of clean_ai_response using
+        only the start of the line. ``line`` is the complete stripped line once
+        it has ended. Returns None while the answer still depends on text that
+        has not arrived.
+        """
+        complete = line is not None
+        text = line if complete else head
+        undecided = False
+
+        # Numbered list item: "1."
+        if text[0].isdigit():
+            digits = len(text) - len(text.lstrip("0123456789"))
+            if digits < len(text):
+                if text[digits] == ".":
+                    return True
+            elif not complete:
+                undecided = True
+
+        # Bullet: "- item"
+        if text[0] in "-*+":
+            if len(text) >= 2 and text[1].isspace() and text[2:].strip():
+                return True
+            if not complete and (len(text) < 2 or text[1].isspace()):
+                undecided = True
+
+        # Bold heading: "**Title**" or "**Title:** text"
+        if text.startswith("**"):
+            if self._bold_closed or (complete and text.endswith("**")):
+                return True
+            undecided = undecided or not complete
+
+        # Paragraph lead: "Where:", "Note:", ...
+        lowered = text.lower()
+        if lowered.startswith(PARAGRAPH_LEADS):
+            return True
+        if not complete and any(lead.startswith(lowered) for lead in PARAGRAPH_LEADS):
+            undecided = True
+
+        return None if undecided else False
+
+    def _start_line(self, out: List[str], starts_new_line: bool) -> None:
+        """Emit the held line start, either joined to the previous line or on a new one"""
+        held = "".join(self._held_parts)
+        content = held.rstrip()
+        self._trailing_space = held[len(content):]
+        if not self._started:
+            separator = ""
+        elif starts_new_line or re.match(r'^\d+\.', self._output_head) or re.match(r'^[-*+]\s', self._output_head):
+            separator = "\n"
+        else:
+            separator = " "
+        if separator == " ":
+            content = separator + content
+        else:
+            out.append(separator)
+            self._output_head = ""
+
+        self._started = True
+        self._in_line = True
+        self._held_parts = []
+        self._held_head = ""
+        self._held_size = 0
+        self._bold_closed = False
+        self._emit_line_text(out, content)
+
+    def _emit_line_text(self, out: List[str], text: str) -> None:
+        out.append(text)
+        if len(self._output_head) < LINE_HEAD_CHARS:
+            self._output_head = (self._output_head + text)[:LINE_HEAD_CHARS]
+
+def normalize_ai_response(text: str) -> str:
+    """Post-process a complete AI response exactly as it would be streamed"""
+    normalizer = StreamingResponseNormalizer()
+    return normalizer.feed(text) + normalizer.finish()
+
+def build_message_payload(
+    history: List[Message], summary: Optional[str] = None, session = None, conversation_id: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """
+    Build the OpenAI message payload for a conversation turn.
     
-    # Pattern for inline math: [ ... ] not on its own line and not inside parentheses
-    inline_pattern = re.compile(r"(?<!\()\[(.*?)](?!\))")
-    text = inline_pattern.sub(replacer_inline, text)
+    Keeps the system prompt (plus the rolling summary of older messages, if
+    any) and the newest messages that fit in the configured model's context
+    window after reserving OPENAI_MAX_TOKENS for the reply.
     
-    # Convert bullet point math like (B_x), (P), etc. to $B_x$, $P$, etc.
-    # When they appear at start of bullet points or after equals signs
-    text = re.sub(r"^\s*[-*+]\s*\(([A-Za-z_][A-Za-z0-9_]*)\)", r"* $\1$", text, flags=re.MULTILINE)
-    text = re.sub(r"=\s*\(([A-Za-z_][A-Za-z0-9_]*)\)", r"= $\1$", text)
+    Given a session and conversation_id, earlier messages outside that window
+    which relate to the newest message are recalled into the system prompt,
+    within RETRIEVAL_MAX_TOKENS reserved from the window.
+    """
+    system_prompt = BASE_FINANCIAL_ADVISOR_PROMPT
+    if Config.CHAT_TOOLS_ENABLED:
+        system_prompt += TOOLS_PROMPT
+    if summary:
+        system_prompt += f"\nSummary of the earlier conversation:\n{summary}\n"
     
-    # Convert standalone inline math to block math for centering
-    text = convert_standalone_math_to_block(text)
+    recall = Config.RETRIEVAL_ENABLED and session is not None and conversation_id is not None and bool(history)
+    window = build_history_window(
+        system_prompt,
+        history,
+        model=Config.OPENAI_MODEL,
+        max_reply_tokens=Config.OPENAI_MAX_TOKENS + (Config.RETRIEVAL_MAX_TOKENS if recall else 0),
+    )
+    if recall:
+        # Everything before the oldest message in the window is a candidate
+        related = recall_related_messages(
+            session,
+            conversation_id,
+            str(history[-1].content),
+            before_seq=history[window.dropped_messages].seq,
+            max_tokens=Config.RETRIEVAL_MAX_TOKENS,
+            top_k=Config.RETRIEVAL_TOP_K,
+            model=Config.OPENAI_MODEL,
+        )
+        if related:
+            window.messages[0]["content"] += format_recalled_messages(related)
+    return window.messages
+
+def get_first_turn_cache_key(user_message: str) -> Optional[str]:
+    """Return the response cache key for a first-turn question, or None if caching is off"""
+    if not Config.RESPONSE_CACHE_ENABLED:
+        return None
+    return make_cache_key(user_message, Config.OPENAI_MODEL, CHAT_TEMPERATURE)
+
+def next_message_seq(session, conversation_id: int) -> int:
+    """
+    Return the seq for the next message in a conversation.
     
-    return text
+    Locks the conversation row until the transaction ends, so concurrent
+    inserts into the same conversation take consecutive numbers instead of
+    colliding on the unique (conversation_id, seq) index. The lookup is a
+    single descent of that index.
+    """
+    session.query(Conversation.id).filter(Conversation.id == conversation_id).with_for_update().first()
+    last_seq = session.query(func.max(Message.seq)).filter(Message.conversation_id == conversation_id).scalar()
+    return (last_seq or 0) + 1
 
-def get_chat_response_stream(
+def start_chat_turn(
     user_message: str, conversation_id = None, tags = None
-) -> Generator[str, None, int]:
+) -> Tuple[int, List[Dict[str, str]], bool]:
     """
-    Stream chat response from OpenAI and yield chunks as they arrive.
-    Returns the conversation_id at the end.
+    Persist the user's message and build the prompt for the reply.
+    
+    Runs in one short transaction so the pooled connection is released before
+    the (potentially long) model call starts.
+    
+    Returns:
+        Tuple of (conversation_id, message payload for OpenAI, whether this is
+        the first turn of the conversation)
     """
-    session = SessionLocal()
-
-    try:
+    with get_db_session() as session:
         # Create new conversation if not provided
         if not conversation_id:
             conversation = Conversation(
                 title=user_message[:50], tags=tags or []  # Set tags if provided
             )
             session.add(conversation)
-            session.commit()
-            session.refresh(conversation)
+            session.flush()
             conversation_id = getattr(conversation, "id", None)
         else:
             conversation = session.get(Conversation, conversation_id)
@@ -351,134 +487,252 @@ def get_chat_response_stream(
 
         # Store user message
         user_msg = Message(
-            conversation_id=conversation_id_int, role="user", content=str(user_message)
+            conversation_id=conversation_id_int,
+            seq=next_message_seq(session, conversation_id_int),
+            role="user",
+            content=str(user_message),
+            timestamp=datetime.now(timezone.utc),
+            token_count=count_tokens(str(user_message), Config.OPENAI_MODEL),
         )
         session.add(user_msg)
-        session.commit()
-
-        # Get full message history
-        history = (
-            session.query(Message)
-            .filter_by(conversation_id=conversation_id_int)
-            .order_by(Message.timestamp)
-            .all()
-        )
-        
-        # Build message payload with system prompt
-        message_payload: List[Dict[str, str]] = [
-            {"role": "system", "content": BASE_FINANCIAL_ADVISOR_PROMPT}
-        ]
-        
-        # Add conversation history
-        for msg in history:
-            message_payload.append({"role": str(msg.role), "content": str(msg.content)})
-
-        # Get streaming response from OpenAI
-        stream = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=message_payload,  # type: ignore
-            max_tokens=1000,
-            temperature=0.7,
-            stream=True
-        )
-        
-        full_response = ""
-        
-        # Stream the response chunks in real-time
-        for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                content_chunk = chunk.choices[0].delta.content
-                # print("RAW AI CHUNK:", repr(content_chunk))  # DEBUG: print raw AI output chunk
-                full_response += content_chunk
-                # Yield each chunk immediately for real-time streaming
-                yield content_chunk
-        
-        # After streaming is complete, clean and store the full response
-        # print("BEFORE CLEANING (streaming):", repr(full_response))  # DEBUG
-        cleaned_response = clean_ai_response(full_response)  # Clean up excessive newlines
-        # print("AFTER CLEANING (streaming):", repr(cleaned_response))  # DEBUG
+        record_message_added(session, conversation_id_int, user_msg.timestamp)
+        session.flush()
+
+        # Get the messages not yet covered by the conversation summary
+        history = get_unsummarized_messages(session, conversation)
+        is_first_turn = len(history) == 1 and not conversation.summary
         
-        # Store the cleaned response in the database
+        # Build message payload with system prompt, summary, the newest history
+        # that fits and any related older messages
+        message_payload = build_message_payload(history, conversation.summary, session, conversation_id_int)
+        user_seq = user_msg.seq
+        # Last statement before commit: the global list counter row stays locked until then
+        bump_list_version(session)
+
+    retrieval_index.note_message(conversation_id_int, user_seq, str(user_message))
+    return conversation_id_int, message_payload, is_first_turn
+
+def finish_chat_turn(conversation_id: int, assistant_content: str, truncated: bool = False) -> None:
+    """
+    Persist the assistant's reply in a new short transaction and update the summary.
+    
+    Replies cut short by a client disconnect are stored with ``truncated`` set
+    and skip the summary update, so the worker is freed right away; the next
+    turn advances the summary instead.
+    """
+    with get_db_session() as session:
         assistant = Message(
-            conversation_id=conversation_id_int, role="assistant", content=cleaned_response
+            conversation_id=conversation_id,
+            seq=next_message_seq(session, conversation_id),
+            role="assistant",
+            content=assistant_content,
+            timestamp=datetime.now(timezone.utc),
+            token_count=count_tokens(assistant_content, Config.OPENAI_MODEL),
+            truncated=truncated,
         )
         session.add(assistant)
-        session.commit()
-        
-        # Return the conversation_id as an integer
-        return conversation_id_int
+        record_message_added(session, conversation_id, assistant.timestamp)
+        assistant_seq = assistant.seq
+        bump_list_version(session)
+    
+    retrieval_index.note_message(conversation_id, assistant_seq, assistant_content)
+    
+    if truncated:
+        return
+    
+    # Fold older messages into the summary once the tail grows too long
+    advance_summary(conversation_id)
 
-    finally:
-        session.close()
+def create_chat_completion(route, messages: List[Dict[str, Any]], tool_rounds: int, stream: bool = False):
+    """
+    Request a chat reply, offering the calculator tools when they are enabled.
+    
+    After CHAT_TOOL_MAX_ROUNDS tool round trips the tools stay listed, since
+    the prompt already contains tool calls, but ``tool_choice="none"`` makes
+    the model answer in text.
+    """
+    tool_options: Dict[str, Any] = {}
+    if Config.CHAT_TOOLS_ENABLED:
+        tool_options["tools"] = TOOLS
+        if tool_rounds >= Config.CHAT_TOOL_MAX_ROUNDS:
+            tool_options["tool_choice"] = "none"
+    return get_openai_client().chat.completions.create(
+        model=route.model,
+        messages=messages,  # type: ignore
+        max_tokens=route.max_tokens,
+        temperature=CHAT_TEMPERATURE,
+        stream=stream,
+        **tool_options
+    )
 
-def get_chat_response(
-    user_message: str, conversation_id = None, tags = None
-) -> tuple[str, int]:
-    session = SessionLocal()
+def get_tool_calls(message: Any) -> List[Dict[str, str]]:
+    """Return the tool calls of a complete response message as id/name/arguments dicts"""
+    return [
+        {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+        for call in (getattr(message, "tool_calls", None) or [])
+    ]
 
+def close_upstream_stream(stream: Any) -> None:
+    """Stop an upstream completion stream by closing its HTTP response"""
     try:
-        # Create new conversation if not provided
-        if not conversation_id:
-            conversation = Conversation(
-                title=user_message[:50], tags=tags or []  # Set tags if provided
-            )
-            session.add(conversation)
-            session.commit()
-            session.refresh(conversation)
-            conversation_id = getattr(conversation, "id", None)
-        else:
-            conversation = session.get(Conversation, conversation_id)
-            if not conversation:
-                raise ValueError("Invalid conversation ID")
+        close = getattr(stream, "close", None)
+        if close is None:
+            response = getattr(stream, "response", None)
+            close = getattr(response, "close", None)
+        if close is not None:
+            close()
+    except Exception as e:
+        logger.warning(f"Failed to close upstream stream: {e}")
 
-        # Ensure conversation_id is int and not None
-        if conversation_id is None:
-            raise ValueError("conversation_id is None after creation")
-        conversation_id_int = int(conversation_id)
+def save_cancelled_turn(conversation_id: int, partial_content: str) -> None:
+    """Persist the part of a reply produced before the client disconnected"""
+    try:
+        finish_chat_turn(conversation_id, partial_content, truncated=True)
+    except Exception as e:
+        logger.error(f"Failed to save truncated reply for conversation {conversation_id}: {e}")
 
-        # Store user message
-        user_msg = Message(
-            conversation_id=conversation_id_int, role="user", content=str(user_message)
-        )
-        session.add(user_msg)
-        session.commit()
-
-        # Get full message history
-        history = (
-            session.query(Message)
-            .filter_by(conversation_id=conversation_id_int)
-            .order_by(Message.timestamp)
-            .all()
-        )
-        
-        # Build message payload with system prompt
-        message_payload: List[Dict[str, str]] = [
-            {"role": "system", "content": BASE_FINANCIAL_ADVISOR_PROMPT}
-        ]
+def get_chat_response_stream(
+    user_message: str, conversation_id = None, tags = None
+) -> Generator[str, None, int]:
+    """
+    Stream chat response from OpenAI and yield chunks as they arrive.
+    Returns the conversation_id at the end.
+    
+    No database connection is held while the response streams: the user
+    message is stored before the OpenAI call and the reply after it, each in
+    its own short transaction. First-turn answers found in the response cache
+    are replayed as a stream without calling OpenAI.
+    
+    Closing the generator early (the SSE client disconnected) closes the
+    upstream stream at once so no more tokens are generated, and stores the
+    partial reply marked as truncated.
+    
+    When the model calls a calculator tool, the tool runs in-process and the
+    model is asked again with its result; only the text of the final answer
+    is streamed.
+    """
+    conversation_id_int, message_payload, is_first_turn = start_chat_turn(user_message, conversation_id, tags)
+    stream_metrics.record_started()
+
+    # Replay a cached answer for common opening questions
+    cache_key = get_first_turn_cache_key(user_message) if is_first_turn else None
+    cached_response = response_cache.get(cache_key) if cache_key else None
+    if cached_response is not None:
+        replayed = []
+        try:
+            for content_chunk in iter_cached_chunks(cached_response):
+                replayed.append(content_chunk)
+                yield content_chunk
+        except GeneratorExit:
+            stream_metrics.record_cancelled(tokens_streamed=0, tokens_saved=0)
+            save_cancelled_turn(conversation_id_int, "".join(replayed))
+            raise
+        finish_chat_turn(conversation_id_int, cached_response)
+        stream_metrics.record_completed(tokens_streamed=0)
+        return conversation_id_int
+
+    # Get streaming response from OpenAI
+    route = route_request(CHAT, message_payload)
+    messages = list(message_payload)
+    tool_rounds = 0
+    try:
+        stream = create_chat_completion(route, messages, tool_rounds, stream=True)
+    except Exception:
+        stream_metrics.record_failed(tokens_streamed=0)
+        raise
+    
+    # Normalize chunks as they arrive so the streamed text is exactly what gets stored
+    normalizer = StreamingResponseNormalizer()
+    response_parts = []
+    # Each upstream content delta carries about one token
+    upstream_tokens = 0
+    finished = False
+    
+    try:
+        while True:
+            tool_calls = ToolCallAccumulator()
+            round_content = []
+            # Stream the response chunks in real-time
+            for chunk in stream:
+                delta = chunk.choices[0].delta
+                if getattr(delta, "tool_calls", None):
+                    tool_calls.add(delta.tool_calls)
+                if delta.content is not None:
+                    upstream_tokens += 1
+                    round_content.append(delta.content)
+                    content_chunk = normalizer.feed(delta.content)
+                    if content_chunk:
+                        response_parts.append(content_chunk)
+                        yield content_chunk
+            if not tool_calls or tool_rounds >= Config.CHAT_TOOL_MAX_ROUNDS:
+                break
+            # Run the requested calculators locally and ask again with their results
+            messages += run_tool_calls(tool_calls.calls(), "".join(round_content))
+            tool_rounds += 1
+            stream = create_chat_completion(route, messages, tool_rounds, stream=True)
         
-        # Add conversation history
-        for msg in history:
-            message_payload.append({"role": str(msg.role), "content": str(msg.content)})
-
-        # Get assistant response from OpenAI
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=message_payload,  # type: ignore
-            max_tokens=1000,
-            temperature=0.7
-        )
-        assistant_msg = response.choices[0].message.content if response.choices and response.choices[0].message.content else ""
-        # print("RAW AI FULL MESSAGE:", repr(assistant_msg))  # DEBUG: print raw AI output
-        # print("BEFORE CLEANING (non-streaming):", repr(assistant_msg))  # DEBUG
-        # Clean up excessive newlines before storing and returning
-        assistant_msg = clean_ai_response(assistant_msg)
-        # print("AFTER CLEANING (non-streaming):", repr(assistant_msg))  # DEBUG
-        assistant = Message(
-            conversation_id=conversation_id_int, role="assistant", content=assistant_msg
+        finished = True
+        content_chunk = normalizer.finish()
+        if content_chunk:
+            response_parts.append(content_chunk)
+            yield content_chunk
+    except GeneratorExit:
+        # The client went away: stop generation now and keep what was produced
+        close_upstream_stream(stream)
+        if not finished:
+            response_parts.append(normalizer.finish())
+        tokens_saved = route.max_tokens - upstream_tokens if not finished else 0
+        stream_metrics.record_cancelled(tokens_streamed=upstream_tokens, tokens_saved=tokens_saved)
+        logger.info(
+            f"Stream for conversation {conversation_id_int} cancelled by the client after "
+            f"{upstream_tokens} tokens (up to {tokens_saved} tokens saved)"
         )
-        session.add(assistant)
-        session.commit()
-        return str(assistant_msg), conversation_id_int
+        save_cancelled_turn(conversation_id_int, "".join(response_parts))
+        raise
+    except Exception:
+        close_upstream_stream(stream)
+        stream_metrics.record_failed(tokens_streamed=upstream_tokens)
+        raise
+    cleaned_response = "".join(response_parts)
+    
+    if cache_key and cleaned_response:
+        response_cache.set(cache_key, cleaned_response)
+    
+    # Store the cleaned response in the database
+    finish_chat_turn(conversation_id_int, cleaned_response)
+    stream_metrics.record_completed(tokens_streamed=upstream_tokens)
+    
+    # Return the conversation_id as an integer
+    return conversation_id_int
+
+def get_chat_response(
+    user_message: str, conversation_id = None, tags = None
+) -> tuple[str, int]:
+    conversation_id_int, message_payload, is_first_turn = start_chat_turn(user_message, conversation_id, tags)
+
+    # Answer common opening questions from the response cache
+    cache_key = get_first_turn_cache_key(user_message) if is_first_turn else None
+    cached_response = response_cache.get(cache_key) if cache_key else None
+    if cached_response is not None:
+        finish_chat_turn(conversation_id_int, cached_response)
+        return cached_response, conversation_id_int
 
-    finally:
-        session.close()
+    # Get assistant response from OpenAI
+    route = route_request(CHAT, message_payload)
+    messages = list(message_payload)
+    tool_rounds = 0
+    while True:
+        response = create_chat_completion(route, messages, tool_rounds)
+        tool_calls = get_tool_calls(response.choices[0].message) if response.choices else []
+        if not tool_calls or tool_rounds >= Config.CHAT_TOOL_MAX_ROUNDS:
+            break
+        # Run the requested calculators locally and ask again with their results
+        messages += run_tool_calls(tool_calls, response.choices[0].message.content)
+        tool_rounds += 1
+    assistant_msg = response.choices[0].message.content if response.choices and response.choices[0].message.content else ""
+    # Clean up newlines and math delimiters the same way the stream does
+    assistant_msg = normalize_ai_response(assistant_msg)
+    if cache_key and assistant_msg:
+        response_cache.set(cache_key, assistant_msg)
+    finish_chat_turn(conversation_id_int, assistant_msg)
+    return str(assistant_msg), conversation_id_int
@@ -0,0 +1,220 @@
+"""
+Financial calculators exposed to the chat model as function-calling tools.
+
+When a user asks for a mortgage payment, a retirement projection, compound
+growth or an income tax estimate, the model calls one of these tools instead
+of doing the arithmetic in generated text. Tools run in-process using the
+same code as the calculator endpoints. Only a compact summary of each result
+(no schedules, projections or advice text) goes back to the model, which
+keeps the follow-up prompt small.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.calculators import (
+    calculate_retirement,
+    calculate_mortgage,
+    calculate_compound_interest,
+)
+from app.services.taxes import calculate_tax
+from app.utils.error_handlers import APIError, validate_numeric_range
+
+logger = logging.getLogger(__name__)
+
+# Added to the system prompt when tools are offered
+TOOLS_PROMPT = """
+When the user asks for a mortgage payment, a retirement savings projection, compound interest growth or an income tax estimate, call the matching calculator tool instead of computing it yourself, then explain its results. Ask for any required input that is missing rather than guessing it.
+"""
+
+def _number(description: str) -> Dict[str, str]:
+    return {"type": "number", "description": description}
+
+TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "mortgage_calculator",
+            "description": "Monthly payment, total interest and total cost of a fixed-rate mortgage.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "loan_amount": _number("Home price / loan amount before the down payment, in dollars"),
+                    "interest_rate": _number("Annual interest rate in percent, e.g. 6.5"),
+                    "loan_term_years": {"type": "integer", "description": "Loan term in years (default 30)"},
+                    "down_payment": _number("Down payment in dollars (default 0)"),
+                    "property_tax": _number("Annual property tax in dollars"),
+                    "insurance": _number("Annual home insurance in dollars"),
+                    "pmi_rate": _number("Annual PMI rate in percent, charged below 20% down"),
+                    "annual_income": _number("Gross annual income in dollars, for the debt-to-income ratio"),
+                },
+                "required": ["loan_amount", "interest_rate"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "retirement_calculator",
+            "description": "Projected retirement savings, income gap and readiness score.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "current_age": _number("Current age in years"),
+                    "retirement_age": _number("Planned retirement age"),
+                    "current_savings": _number("Current retirement savings in dollars"),
+                    "monthly_contribution": _number("Monthly contribution in dollars"),
+                    "expected_return": _number("Expected annual return in percent, e.g. 7"),
+                    "life_expectancy": _number("Life expectancy in years (default 85)"),
+                    "inflation_rate": _number("Annual inflation in percent (default 2.5)"),
+                    "social_security_income": _number("Expected monthly Social Security income in dollars"),
+                    "pension_income": _number("Expected monthly pension income in dollars"),
+                    "desired_retirement_income": _number("Desired annual retirement income in dollars"),
+                },
+                "required": [
+                    "current_age", "retirement_age", "current_savings", "monthly_contribution",
+                    "expected_return", "desired_retirement_income",
+                ],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "compound_interest_calculator",
+            "description": "Growth of an investment with compound interest, contributions, taxes and inflation.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "principal": _number("Starting amount in dollars"),
+                    "interest_rate": _number("Annual interest rate in percent"),
+                    "time_period": _number("Number of years"),
+                    "compounding_frequency": {
+                        "type": "string",
+                        "enum": ["annually", "semiannually", "quarterly", "monthly", "weekly", "daily", "continuously"],
+                    },
+                    "monthly_contribution": _number("Monthly contribution in dollars"),
+                    "tax_rate": _number("Tax rate on returns in percent"),
+                    "inflation_rate": _number("Annual inflation in percent"),
+                    "contribution_increase_rate": _number("Yearly increase of the monthly contribution in percent"),
+                },
+                "required": ["principal", "interest_rate", "time_period"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "calculate_tax",
+            "description": "Estimated US federal income tax for a taxable income, using the single-filer brackets.",
+            "parameters": {
+                "type": "object",
+                "properties": {"income": _number("Taxable annual income in dollars")},
+                "required": ["income"],
+            },
+        },
+    },
+]
+
+def _compact(result: Dict[str, Any], keys: List[str]) -> Dict[str, Any]:
+    return {key: result[key] for key in keys if key in result}
+
+def _mortgage(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    result = calculate_mortgage(arguments)
+    return _compact(result, [
+        "monthly_payment", "total_monthly_payment", "principal", "down_payment_percentage",
+        "pmi_monthly", "total_interest", "total_payments", "total_cost",
+    ])
+
+def _retirement(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    result = calculate_retirement(arguments)
+    compact = _compact(result, [
+        "years_to_retirement", "projected_savings", "total_contributions", "interest_earned",
+        "inflation_adjusted_income", "savings_gap", "readiness_score", "readiness_level",
+    ])
+    compact["withdrawal_4_percent_annual"] = next(
+        (s["annual_withdrawal"] for s in result["withdrawal_scenarios"] if s["withdrawal_rate"] == 4.0), None
+    )
+    return compact
+
+def _compound_interest(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    result = calculate_compound_interest(arguments)
+    return _compact(result, [
+        "final_amount", "total_contributions", "interest_earned", "effective_rate",
+        "real_rate", "inflation_adjusted_balance",
+    ])
+
+def _tax(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    income = validate_numeric_range(arguments.get("income"), 0, None, "income")
+    return calculate_tax(income)
+
+TOOL_FUNCTIONS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "mortgage_calculator": _mortgage,
+    "retirement_calculator": _retirement,
+    "compound_interest_calculator": _compound_interest,
+    "calculate_tax": _tax,
+}
+
+def run_tool(name: str, arguments: Optional[str]) -> str:
+    """
+    Run a tool call and return its result as compact JSON.
+
+    Invalid calls come back as ``{"error": ...}`` so the model can correct
+    the arguments or ask the user, instead of failing the chat turn.
+    """
+    function = TOOL_FUNCTIONS.get(name)
+    if function is None:
+        return json.dumps({"error": f"Unknown tool: {name}"})
+    try:
+        parsed = json.loads(arguments or "{}")
+        if not isinstance(parsed, dict):
+            raise ValueError("arguments must be a JSON object")
+        result = function(parsed)
+    except APIError as e:
+        return json.dumps({"error": e.message})
+    except (ValueError, TypeError, ArithmeticError) as e:
+        return json.dumps({"error": f"Invalid arguments: {e}"})
+    logger.info(f"Chat tool {name} ran locally")
+    return json.dumps(result, separators=(",", ":"))
+
+class ToolCallAccumulator:
+    """Reassembles tool calls from the fragments of a streamed response"""
+
+    def __init__(self):
+        self._calls: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, deltas: Any) -> None:
+        for delta in deltas:
+            call = self._calls.setdefault(delta.index, {"id": "", "name": "", "arguments": ""})
+            if delta.id:
+                call["id"] = delta.id
+            if delta.function is not None:
+                call["name"] += delta.function.name or ""
+                call["arguments"] += delta.function.arguments or ""
+
+    def calls(self) -> List[Dict[str, str]]:
+        return [self._calls[index] for index in sorted(self._calls)]
+
+    def __bool__(self) -> bool:
+        return bool(self._calls)
+
+def run_tool_calls(calls: List[Dict[str, str]], content: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Run the model's tool calls and return the messages to append to the prompt.
+
+    ``calls`` are dicts with ``id``, ``name`` and ``arguments``. The result is
+    the assistant message requesting the calls followed by one ``tool``
+    message per call.
+    """
+    messages: List[Dict[str, Any]] = [{
+        "role": "assistant",
+        "content": content or None,
+        "tool_calls": [
+            {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+            for call in calls
+        ],
+    }]
+    for call in calls:
+        messages.append({"role": "tool", "tool_call_id": call["id"], "content": run_tool(call["name"], call["arguments"])})
+    return messages
@@ -0,0 +1,131 @@
+"""
+Denormalized per-conversation counters and change versions.
+
+``Conversation.message_count`` and ``Conversation.last_message_at`` let
+listing screens show a count and sort by recent activity without touching
+``messages``. The chat service bumps them in the transaction that inserts
+each message, while it already holds the conversation row lock taken for the
+message's ``seq``. Messages written any other way (imports, fixtures, manual
+SQL) leave them stale until ``repair_conversation_counters`` recomputes them.
+
+Every write to a conversation (a message, a rename, new tags) also bumps its
+``version``, and every write to any conversation, including creating and
+deleting one, bumps the global ``conversations`` change counter. Both are
+plain column updates inside the writing transaction, so a reader never sees
+a version before the data it stands for is committed. They back the ETags of
+the conversation endpoints.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models import ChangeCounter, Conversation
+from app.utils.database import get_db_session
+
+logger = logging.getLogger(__name__)
+
+REPAIR_BATCH_SIZE = 1000
+
+_RECOUNT_SQL = text(
+    "UPDATE conversations SET message_count = counted.message_count, last_message_at = counted.last_message_at, "
+    "       version = conversations.version + 1 "
+    "FROM (SELECT conversations.id, COUNT(messages.id) AS message_count, MAX(messages.timestamp) AS last_message_at "
+    "      FROM conversations LEFT JOIN messages ON messages.conversation_id = conversations.id "
+    "      WHERE conversations.id > :first_id AND conversations.id <= :last_id "
+    "      GROUP BY conversations.id) AS counted "
+    "WHERE conversations.id = counted.id "
+    "AND (conversations.message_count IS DISTINCT FROM counted.message_count "
+    "     OR conversations.last_message_at IS DISTINCT FROM counted.last_message_at)"
+)
+
+# Name of the global change counter of the conversation list
+CONVERSATIONS_COUNTER = "conversations"
+
+def bump_list_version(session) -> None:
+    """Mark the conversation list as changed, in the caller's transaction"""
+    statement = insert(ChangeCounter).values(name=CONVERSATIONS_COUNTER, value=1)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[ChangeCounter.name], set_={"value": ChangeCounter.value + 1}
+    ))
+
+def bump_conversation_version(session, conversation_id: int) -> None:
+    """Mark one conversation as changed, in the caller's transaction"""
+    session.query(Conversation).filter(Conversation.id == conversation_id).update(
+        {Conversation.version: Conversation.version + 1}, synchronize_session=False
+    )
+
+def record_conversation_change(session, conversation_id: Optional[int] = None) -> None:
+    """
+    Bump the version of a changed conversation (if given) and of the conversation list.
+
+    For a single change only: a transaction changing several conversations
+    bumps each with ``bump_conversation_version`` and then the list once,
+    last, so it never waits for a conversation row while holding the list row.
+    """
+    if conversation_id is not None:
+        bump_conversation_version(session, conversation_id)
+    bump_list_version(session)
+
+def record_message_added(session, conversation_id: int, timestamp: datetime) -> None:
+    """
+    Count one new message in its conversation's counters and version, in the caller's transaction.
+
+    The list version is not bumped here: its single row would stay locked,
+    serializing every chat turn, until the caller commits. Callers call
+    ``bump_list_version`` as the last statement before committing.
+    """
+    session.query(Conversation).filter(Conversation.id == conversation_id).update(
+        {
+            Conversation.message_count: Conversation.message_count + 1,
+            Conversation.last_message_at: func.greatest(
+                func.coalesce(Conversation.last_message_at, timestamp), timestamp
+            ),
+            Conversation.version: Conversation.version + 1,
+        },
+        synchronize_session=False,
+    )
+
+def get_list_version(session) -> int:
+    """Current value of the conversation list's change counter"""
+    value = session.query(ChangeCounter.value).filter(ChangeCounter.name == CONVERSATIONS_COUNTER).scalar()
+    return value or 0
+
+def get_conversation_version(session, conversation_id: int) -> Optional[int]:
+    """Current version of a conversation, or None if it does not exist"""
+    return session.query(Conversation.version).filter(Conversation.id == conversation_id).scalar()
+
+def repair_conversation_counters(batch_size: int = REPAIR_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Recompute every conversation's counters from ``messages``.
+
+    Works through conversations in id ranges of batch_size, one transaction
+    per batch, so row locks are held briefly. Only rows whose counters
+    changed are written, and their versions and the list version are bumped
+    so cached ETags stop matching. Returns the highest conversation id
+    covered and the number of conversations repaired.
+    """
+    with get_db_session() as session:
+        max_id = session.query(func.max(Conversation.id)).scalar() or 0
+
+    repaired = 0
+    last_id = 0
+    while last_id < max_id:
+        batch_end = min(last_id + batch_size, max_id)
+        with get_db_session() as session:
+            # Chat inserts lock the conversation row first, so holding these
+            # locks keeps the batch's counts from racing new messages
+            session.query(Conversation.id).filter(
+                Conversation.id > last_id, Conversation.id <= batch_end
+            ).with_for_update().all()
+            result = session.execute(_RECOUNT_SQL, {"first_id": last_id, "last_id": batch_end})
+            repaired += result.rowcount
+            if result.rowcount:
+                bump_list_version(session)
+        last_id = batch_end
+
+    logger.info(f"Conversation counters repaired for {repaired} conversations (ids up to {max_id})")
+    return {"max_conversation_id": max_id, "repaired": repaired}
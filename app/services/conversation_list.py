@@ -0,0 +1,74 @@
+"""
+Paged conversation listing.
+
+Conversations are listed newest first, by creation (``created``) or by
+recent activity (``activity``: the last message, else creation), and paged
+with a keyset cursor on ``(sort key, id)``. Each order is served by its own
+index walked backwards, so a page deep in the list costs the same as the
+first one. Message counts and the last activity time come from the
+conversation's denormalized counters, so ``messages`` is never read.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+
+from app.models import Conversation
+from app.utils.error_handlers import ValidationError
+from app.utils.pagination import decode_cursor, encode_cursor
+
+SORT_KEYS = {
+    "created": Conversation.created_at,
+    "activity": func.coalesce(Conversation.last_message_at, Conversation.created_at),
+}
+
+def decode_conversation_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Return the (sort key, id) a conversation list cursor points after"""
+    sort_value, conversation_id = decode_cursor(cursor, 2)
+    try:
+        if type(conversation_id) is not int:
+            raise ValueError("bad conversation id")
+        return datetime.fromisoformat(sort_value), conversation_id
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid cursor", field="cursor")
+
+def list_conversations(
+    session, limit: int, cursor: Optional[str] = None, sort: str = "created"
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return one page of conversations with their message counts, and the cursor of the next page"""
+    if sort not in SORT_KEYS:
+        raise ValidationError(f"sort must be one of: {', '.join(SORT_KEYS)}", field="sort")
+    sort_key = SORT_KEYS[sort]
+
+    query = session.query(
+        Conversation.id,
+        Conversation.title,
+        Conversation.created_at,
+        Conversation.tags,
+        Conversation.message_count,
+        Conversation.last_message_at,
+        sort_key.label("sort_key"),
+    )
+    if cursor:
+        after_value, after_id = decode_conversation_cursor(cursor)
+        query = query.filter(tuple_(sort_key, Conversation.id) < tuple_(after_value, after_id))
+    rows = query.order_by(sort_key.desc(), Conversation.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].sort_key.isoformat(), rows[-1].id])
+
+    conversations = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "created_at": row.created_at.isoformat(),
+            "tags": row.tags,
+            "message_count": row.message_count,
+            "last_message_at": row.last_message_at.isoformat() if row.last_message_at else None,
+        }
+        for row in rows
+    ]
+    return conversations, next_cursor
@@ -0,0 +1,172 @@
+"""
+Token-budgeted conversation history for chat prompts.
+
+Long conversations cannot be sent to the model verbatim: every turn would get
+slower and more expensive until the request fails on the context limit. The
+helpers here count tokens against the model's context window (minus the
+system prompt and the tokens reserved for the reply) and keep only the newest
+turns that fit.
+"""
+
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import tiktoken
+from sqlalchemy import func
+
+from app.models import Message
+
+logger = logging.getLogger(__name__)
+
+# Context window (prompt + completion tokens) per model family. Lookups use
+# the longest matching prefix so dated snapshots like "gpt-4-0613" resolve.
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Every chat message is wrapped in a few framing tokens (role and separators),
+# and every reply is primed with a few more.
+TOKENS_PER_MESSAGE = 4
+REPLY_PRIMING_TOKENS = 3
+
+# Rough characters-per-token ratio for English text, used when no tiktoken
+# encoding can be loaded (e.g. the BPE files cannot be downloaded offline).
+APPROX_CHARS_PER_TOKEN = 4
+
+def get_context_window(model: str) -> int:
+    """Return the context window size for a model name"""
+    matches = [name for name in MODEL_CONTEXT_WINDOWS if model.startswith(name)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Return the (cached) tiktoken encoding for a model, or None if unavailable"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding for {model}, estimating token counts: {e}")
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding cl100k_base, estimating token counts: {e}")
+        return None
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens in a piece of text for the given model"""
+    if not text:
+        return 0
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+def count_message_tokens(content: str, model: str) -> int:
+    """Count the tokens a single chat message occupies in the prompt"""
+    return count_tokens(content, model) + TOKENS_PER_MESSAGE
+
+def get_message_tokens(msg: Any, model: str) -> int:
+    """
+    Return the prompt tokens for a history message.
+    
+    Uses the ``token_count`` stored on the row at insert time when present and
+    only re-tokenizes the content for rows that predate the column.
+    """
+    stored = getattr(msg, "token_count", None)
+    if stored is not None:
+        return stored + TOKENS_PER_MESSAGE
+    return count_message_tokens(str(msg.content), model)
+
+def get_conversation_token_total(session, conversation_id: int) -> int:
+    """Return the stored token total of a conversation with one aggregate query"""
+    total = (
+        session.query(func.coalesce(func.sum(Message.token_count), 0))
+        .filter(Message.conversation_id == conversation_id)
+        .scalar()
+    )
+    return int(total or 0)
+
+@dataclass
+class HistoryWindow:
+    """Prompt messages selected for a model call, plus what was left out"""
+    messages: List[Dict[str, str]]
+    prompt_tokens: int
+    budget: int
+    dropped_messages: int = 0
+    dropped_tokens: int = 0
+
+def build_history_window(
+    system_prompt: str,
+    history: Sequence[Any],
+    model: str,
+    max_reply_tokens: int,
+    context_window: Optional[int] = None,
+) -> HistoryWindow:
+    """
+    Build the message payload for a chat completion within a token budget.
+
+    The budget is the model's context window minus the tokens reserved for the
+    reply. The system prompt is always included; history messages (objects
+    with ``role``, ``content`` and optionally a stored ``token_count``, oldest
+    first) are added newest first until the next one would not fit. The newest message is always kept so the
+    current user turn is never dropped.
+
+    Args:
+        system_prompt: System prompt placed at the start of the payload
+        history: Conversation messages in chronological order
+        model: Model name used for tokenization and the context window
+        max_reply_tokens: Tokens reserved for the completion
+        context_window: Override for the model's context window
+
+    Returns:
+        HistoryWindow with the payload and counts of dropped messages/tokens
+    """
+    if context_window is None:
+        context_window = get_context_window(model)
+    budget = context_window - max_reply_tokens
+
+    used = count_message_tokens(system_prompt, model) + REPLY_PRIMING_TOKENS
+    kept: List[Dict[str, str]] = []
+    dropped_messages = 0
+    dropped_tokens = 0
+
+    for index in range(len(history) - 1, -1, -1):
+        msg = history[index]
+        tokens = get_message_tokens(msg, model)
+        if kept and used + tokens > budget:
+            # Everything older than this message is dropped as well
+            dropped_messages = index + 1
+            dropped_tokens = tokens + sum(get_message_tokens(older, model) for older in history[:index])
+            break
+        kept.append({"role": str(msg.role), "content": str(msg.content)})
+        used += tokens
+
+    kept.reverse()
+    window = HistoryWindow(
+        messages=[{"role": "system", "content": system_prompt}] + kept,
+        prompt_tokens=used,
+        budget=budget,
+        dropped_messages=dropped_messages,
+        dropped_tokens=dropped_tokens,
+    )
+
+    if dropped_messages:
+        logger.info(
+            f"History window for {model}: kept {len(kept)} messages ({used} tokens), "
+            f"dropped {dropped_messages} messages ({dropped_tokens} tokens) to fit budget of {budget}"
+        )
+    return window
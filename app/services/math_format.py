@@ -0,0 +1,316 @@
+"""
+Single-pass normalization of math delimiters in AI responses.
+
+Models do not always follow the "``$...$`` and ``$$...$$`` only" instruction
+in the system prompt. ``convert_bracket_math_to_dollars`` rewrites the other
+delimiters they produce into the ones the frontend renders:
+
+* ``[ ... ]`` on its own line(s) becomes a ``$$`` block
+* ``(( ... ))`` becomes ``$( ... $``
+* ``\\( ... \\)`` becomes ``$ ... $`` and ``\\[ ... \\]`` becomes ``$$ ... $$``
+* inline ``[ ... ]`` becomes ``$ ... $``
+* ``(P)`` after a bullet or an equals sign becomes ``$P$``
+* a line holding nothing but one formula becomes block math
+
+The text is scanned once, left to right, and the output is collected in lists.
+Searches for closing delimiters are memoized, so no part of the input is
+scanned more than a constant number of times and long responses convert in
+linear time. The content of a converted span is run through the same rules,
+which reproduces the results of applying each rule as a separate pass.
+"""
+
+import re
+from typing import Callable, List, Optional
+
+_NON_SPACE = re.compile(r"\S")
+_SPECIAL = re.compile(r"[\n\[(\\=]")
+_PARENS = re.compile(r"[()]")
+_INLINE_CLOSE = re.compile(r"\](?!\))")
+_PAREN_IDENTIFIER = re.compile(r"\(([A-Za-z_][A-Za-z0-9_]*)\)")
+
+class _Finder:
+    """Memoized "first hit at or after pos" search over one string"""
+
+    def __init__(self, search: Callable[[int], int]):
+        self._search = search
+        self._start = -1
+        self._hit = -1
+
+    def __call__(self, pos: int) -> int:
+        # No hit lies between the last query and its result
+        if not (self._start <= pos <= self._hit):
+            self._start, self._hit = pos, self._search(pos)
+        return self._hit
+
+class _Buffer:
+    """Output collected as a list of pieces"""
+
+    def __init__(self, last_char: str = ""):
+        self._parts: List[str] = []
+        self.last_char = last_char
+
+    def write(self, text: str) -> None:
+        if text:
+            self._parts.append(text)
+            self.last_char = text[-1]
+
+    def getvalue(self) -> str:
+        return "".join(self._parts)
+
+class _LineBuffer(_Buffer):
+    """Output buffer that turns finished lines holding a single formula into block math"""
+
+    def __init__(self):
+        super().__init__()
+        self._lines: List[str] = []
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        self.last_char = text[-1]
+        start = 0
+        end = text.find("\n")
+        while end != -1:
+            self._parts.append(text[start:end])
+            self._lines.append(format_standalone_math_line("".join(self._parts)))
+            self._parts = []
+            start = end + 1
+            end = text.find("\n", start)
+        if start < len(text):
+            self._parts.append(text[start:])
+
+    def getvalue(self) -> str:
+        return "\n".join(self._lines + [format_standalone_math_line("".join(self._parts))])
+
+def format_standalone_math_line(line: str) -> str:
+    """Convert a line holding only one formula to block math, with no extra newlines inside the block."""
+    stripped = line.strip()
+    if not stripped.startswith(("$", "\\(", "\\[")):
+        return line
+
+    if (stripped.startswith('$') and stripped.endswith('$') and
+        stripped.count('$') == 2 and '$$' not in stripped):
+        # Inline math on its own line
+        return f"$${stripped[1:-1].strip()}$$"
+    if (stripped.startswith('$$') and stripped.endswith('$$') and stripped.count('$$') == 2):
+        # Already block math, drop surrounding whitespace
+        return f"$${stripped[2:-2].strip()}$$"
+    if (stripped.startswith('\\(') and stripped.endswith('\\)')) or (stripped.startswith('\\[') and stripped.endswith('\\]')):
+        return f"$${stripped[2:-2].strip()}$$"
+    return line
+
+class _ScanState:
+    """State shared by a scanner and the scanners of the spans nested in it"""
+
+    def __init__(self):
+        # Cleared once a (( has no closing )): every later (( is left alone
+        self.double_parens_enabled = True
+
+class _MathScanner:
+    """Left-to-right delimiter conversion over one piece of text"""
+
+    def __init__(
+        self,
+        text: str,
+        state: Optional[_ScanState] = None,
+        convert_blocks: bool = True,
+        convert_double_parens: bool = True,
+    ):
+        self.text = text
+        self.state = state or _ScanState()
+        self.convert_blocks = convert_blocks
+        self.convert_double_parens = convert_double_parens
+
+        n = len(text)
+
+        def find(sub: str) -> Callable[[int], int]:
+            def search(pos: int) -> int:
+                found = text.find(sub, pos)
+                return n if found == -1 else found
+            return search
+
+        def search_regex(pattern) -> Callable[[int], int]:
+            def search(pos: int) -> int:
+                match = pattern.search(text, pos)
+                return match.start() if match else n
+            return search
+
+        self._next_non_space = _Finder(search_regex(_NON_SPACE))
+        self._line_end = _Finder(find("\n"))
+        self._inline_close = _Finder(search_regex(_INLINE_CLOSE))
+        self._paren_close = _Finder(find("\\)"))
+        self._bracket_close = _Finder(find("\\]"))
+        self._block_close = _Finder(self._search_block_close)
+        self._double_parens_match = (-1, -1)
+
+    def scan(self, out: _Buffer, at_line_start: bool) -> None:
+        text = self.text
+        n = len(text)
+        i = 0
+        bullets = True
+        while i < n:
+            if at_line_start:
+                end = self._convert_line_start(out, i, bullets)
+                at_line_start, bullets = False, True
+                if end is not None:
+                    if text[end - 1] == "\n":
+                        # A block can swallow one trailing newline; another block may still start after it
+                        at_line_start, bullets = True, False
+                    i = end
+                    continue
+
+            match = _SPECIAL.search(text, i)
+            special = match.start() if match else n
+            out.write(text[i:special])
+            i = special
+            if i == n:
+                break
+
+            char = text[i]
+            if char == "\n":
+                out.write("\n")
+                at_line_start = True
+                i += 1
+            elif char == "(":
+                i = self._convert_double_parens(out, i)
+            elif char == "\\":
+                i = self._convert_latex_delimiters(out, i)
+            elif char == "[":
+                i = self._convert_inline_brackets(out, i)
+            else:
+                i = self._convert_equals_identifier(out, i)
+
+    def _convert(self, text: str, last_char: str, at_line_start: bool = False, convert_double_parens: bool = True) -> str:
+        """Convert the content of a matched span"""
+        out = _Buffer(last_char)
+        scanner = _MathScanner(text, self.state, convert_blocks=False, convert_double_parens=convert_double_parens)
+        scanner.scan(out, at_line_start)
+        return out.getvalue()
+
+    def _convert_line_start(self, out: _Buffer, i: int, bullets: bool = True) -> Optional[int]:
+        """Convert a [ ... ] block or a "- (P)" bullet starting at a line start (after any blank lines)"""
+        text = self.text
+        n = len(text)
+        start = self._next_non_space(i)
+        if start == n:
+            return None
+
+        if text[start] == "[" and self.convert_blocks:
+            close = self._block_close(start + 1)
+            if close < n:
+                content = self._convert(text[start + 1:close].strip(), "\n", at_line_start=True)
+                out.write(f"$$\n{content}\n$$")
+                return self._block_end(close)
+
+        if bullets and text[start] in "-*+":
+            match = _PAREN_IDENTIFIER.match(text, self._next_non_space(start + 1))
+            if match:
+                out.write(f"* ${match.group(1)}$")
+                return match.end()
+        return None
+
+    def _search_block_close(self, pos: int) -> int:
+        """Find the first "]" at or after pos that only whitespace follows on its line"""
+        text = self.text
+        close = text.find("]", pos)
+        while close != -1:
+            if self._block_end(close) != -1:
+                return close
+            close = text.find("]", close + 1)
+        return len(text)
+
+    def _block_end(self, close: int) -> int:
+        """Return where a block closed at close ends (trailing blank lines included), or -1"""
+        text = self.text
+        following = self._next_non_space(close + 1)
+        if following == len(text):
+            return following
+        return text.rfind("\n", close + 1, following)
+
+    def _double_parens_close(self, i: int) -> int:
+        """Return the position of the )) matching the (( at i, or -1"""
+        if not (self.convert_double_parens and self.state.double_parens_enabled and self.text.startswith("((", i)):
+            return -1
+        if self._double_parens_match[0] == i:
+            return self._double_parens_match[1]
+
+        text = self.text
+        depth = 1
+        j = i + 2
+        while True:
+            match = _PARENS.search(text, j)
+            if not match:
+                self.state.double_parens_enabled = False
+                return -1
+            j = match.start()
+            if text.startswith("))", j):
+                if depth == 1:
+                    break
+                depth -= 1
+                j += 2
+            elif text.startswith("((", j):
+                depth += 1
+                j += 2
+            else:
+                j += 1
+        self._double_parens_match = (i, j)
+        return j
+
+    def _convert_double_parens(self, out: _Buffer, i: int) -> int:
+        """Convert (( ... )), matching nested (( and )) pairs"""
+        close = self._double_parens_close(i)
+        if close == -1:
+            out.write("(")
+            return i + 1
+
+        content = self.text[i + 2:close]
+        if content:
+            content = self._convert("(" + content, "$", convert_double_parens=False)
+        out.write(f"${content}$")
+        return close + 2
+
+    def _convert_latex_delimiters(self, out: _Buffer, i: int) -> int:
+        """Convert \\( ... \\) and \\[ ... \\] on a single line"""
+        text = self.text
+        if text.startswith("\\((", i) and self._double_parens_close(i + 1) != -1:
+            # (( ... )) takes precedence, even when its first ( belongs to \(
+            out.write("\\")
+            return i + 1
+        if text.startswith("\\(", i):
+            close, delimiter = self._paren_close(i + 2), "$"
+        elif text.startswith("\\[", i):
+            close, delimiter = self._bracket_close(i + 2), "$$"
+        else:
+            out.write("\\")
+            return i + 1
+
+        if close >= self._line_end(i):
+            out.write("\\")
+            return i + 1
+        out.write(delimiter + self._convert(text[i + 2:close], delimiter[-1]) + delimiter)
+        return close + 2
+
+    def _convert_inline_brackets(self, out: _Buffer, i: int) -> int:
+        """Convert [ ... ] within a line, unless it sits inside parentheses"""
+        text = self.text
+        close = self._inline_close(i + 1)
+        if out.last_char == "(" or close >= self._line_end(i):
+            out.write("[")
+            return i + 1
+        out.write("$" + self._convert(text[i + 1:close].strip(), "$") + "$")
+        return close + 1
+
+    def _convert_equals_identifier(self, out: _Buffer, i: int) -> int:
+        """Convert "= (P)" to "= $P$" """
+        match = _PAREN_IDENTIFIER.match(self.text, self._next_non_space(i + 1))
+        if not match:
+            out.write("=")
+            return i + 1
+        out.write(f"= ${match.group(1)}$")
+        return match.end()
+
+def convert_bracket_math_to_dollars(text: str) -> str:
+    """Convert various math delimiters to proper LaTeX math format."""
+    out = _LineBuffer()
+    _MathScanner(text).scan(out, at_line_start=True)
+    return out.getvalue()
@@ -0,0 +1,119 @@
+"""
+Paged message history and delta sync.
+
+Long conversations are read a page at a time, newest first, through the
+unique ``(conversation_id, seq)`` index: each page is one backward range scan
+of that index below the ``before`` seq, however long the conversation is.
+Only the columns the API returns are selected, so no ORM objects are built.
+
+Polling clients sync with a cursor holding the conversation ``version`` and
+the last ``seq`` they have. Messages are append-only and take their seq under
+the conversation row lock, so everything new is exactly ``seq > cursor seq``.
+An unchanged conversation costs one primary key probe for its version.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models import Conversation, Message
+from app.utils.error_handlers import ValidationError
+from app.utils.pagination import decode_cursor, encode_cursor
+
+def get_message_page(
+    session, conversation_id: int, limit: int, before: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Return up to limit messages older than seq `before` (the newest ones if
+    None) in chronological order, and the `before` value of the next older
+    page, or None when there is none.
+    """
+    query = _message_query(session, conversation_id)
+    if before is not None:
+        query = query.filter(Message.seq < before)
+    rows = query.order_by(Message.seq.desc()).limit(limit + 1).all()
+
+    next_before = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_before = rows[-1].seq
+
+    return [_message_dict(row) for row in reversed(rows)], next_before
+
+def get_all_messages(session, conversation_id: int) -> List[Dict[str, Any]]:
+    """Return every message of a conversation in chronological order, in the same shape as a page"""
+    rows = _message_query(session, conversation_id).order_by(Message.seq).all()
+    return [_message_dict(row) for row in rows]
+
+def _message_query(session, conversation_id: int):
+    return session.query(
+        Message.id, Message.seq, Message.role, Message.content, Message.timestamp, Message.truncated
+    ).filter(Message.conversation_id == conversation_id)
+
+def _message_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "seq": row.seq,
+        "role": row.role,
+        "content": row.content,
+        "timestamp": row.timestamp.isoformat(),
+        "truncated": row.truncated,
+    }
+
+def decode_sync_cursor(cursor: str) -> Tuple[int, int]:
+    """Return the (version, seq) a sync cursor was issued at"""
+    version, seq = decode_cursor(cursor, 2)
+    if type(version) is not int or type(seq) is not int or version < 0 or seq < 0:
+        raise ValidationError("Invalid cursor", field="since")
+    return version, seq
+
+def get_changes_since(
+    session, conversation_id: int, since: Optional[str], limit: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Return what changed in a conversation after the `since` cursor (from the
+    start if None), or None if the conversation does not exist.
+
+    ``conversation`` holds the metadata when the version moved, else None.
+    At most limit messages are returned; ``has_more`` asks the client to
+    sync again right away with the new cursor.
+    """
+    since_version, since_seq = decode_sync_cursor(since) if since else (0, 0)
+
+    # Read the version before the messages, so a write landing in between
+    # is picked up again by the next sync rather than lost
+    row = session.query(
+        Conversation.version,
+        Conversation.title,
+        Conversation.tags,
+        Conversation.message_count,
+        Conversation.last_message_at,
+    ).filter(Conversation.id == conversation_id).first()
+    if row is None:
+        return None
+    if row.version == since_version:
+        return {"conversation": None, "messages": [], "has_more": False, "cursor": since}
+
+    rows = (
+        _message_query(session, conversation_id)
+        .filter(Message.seq > since_seq)
+        .order_by(Message.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last_seq = rows[-1].seq if rows else since_seq
+
+    return {
+        "conversation": {
+            "id": conversation_id,
+            "title": row.title,
+            "tags": row.tags,
+            "message_count": row.message_count,
+            "last_message_at": row.last_message_at.isoformat() if row.last_message_at else None,
+            "version": row.version,
+        },
+        "messages": [_message_dict(message) for message in rows],
+        "has_more": has_more,
+        # Keep the old version until every new message is delivered, so the next sync continues the range
+        "cursor": encode_cursor([since_version if has_more else row.version, last_seq]),
+    }
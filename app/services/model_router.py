@@ -0,0 +1,106 @@
+"""
+Model and output budget selection for OpenAI calls.
+
+Each call site names its request class instead of hard-coding a model. The
+router measures the prompt and picks the class's preferred model: the chat
+model for chat turns, summaries and documents, and the cheaper, faster model
+for short utility work like titles. It only escalates to the large-context
+model when the prompt plus the output budget does not fit the preferred
+model's context window. Every decision is logged with its token counts.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from app.services.history import REPLY_PRIMING_TOKENS, count_message_tokens, get_context_window
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Request classes
+CHAT = "chat"
+TITLE = "title"
+SUMMARY = "summary"
+DOCUMENT = "document"
+
+# Output tokens a reply is never squeezed below when escalation cannot make room
+MIN_OUTPUT_TOKENS = 64
+
+@dataclass
+class ModelRoute:
+    """Model and output budget chosen for one call"""
+    request_class: str
+    model: str
+    max_tokens: int
+    prompt_tokens: int
+    escalated: bool = False
+
+def get_preferred_model(request_class: str) -> str:
+    """Return the model a request class uses when its prompt fits"""
+    if request_class == TITLE:
+        return Config.ROUTER_FAST_MODEL
+    return Config.OPENAI_MODEL
+
+def get_default_max_tokens(request_class: str) -> int:
+    """Return the output budget of a request class"""
+    if request_class == TITLE:
+        return Config.TITLE_MAX_TOKENS
+    if request_class == SUMMARY:
+        return Config.SUMMARY_MAX_TOKENS
+    if request_class == DOCUMENT:
+        return Config.DOCUMENT_MAX_TOKENS
+    return Config.OPENAI_MAX_TOKENS
+
+def count_prompt_tokens(messages: List[Dict[str, str]], model: str) -> int:
+    """Count the prompt tokens of a chat completion payload"""
+    return sum(count_message_tokens(str(msg["content"]), model) for msg in messages) + REPLY_PRIMING_TOKENS
+
+def route_request(
+    request_class: str,
+    messages: List[Dict[str, str]],
+    max_tokens: Optional[int] = None,
+) -> ModelRoute:
+    """
+    Pick the model and output budget for a completion.
+
+    Args:
+        request_class: One of CHAT, TITLE, SUMMARY or DOCUMENT
+        messages: The payload that will be sent
+        max_tokens: Output budget, defaults to the request class's budget
+
+    Returns:
+        ModelRoute with the model to call and its max_tokens
+    """
+    preferred = get_preferred_model(request_class)
+    if max_tokens is None:
+        max_tokens = get_default_max_tokens(request_class)
+    prompt_tokens = count_prompt_tokens(messages, preferred)
+
+    model = preferred
+    escalated = False
+    if prompt_tokens + max_tokens > get_context_window(preferred):
+        large = Config.ROUTER_LARGE_CONTEXT_MODEL
+        if get_context_window(large) > get_context_window(preferred):
+            model, escalated = large, True
+        # Shrink the reply rather than send a request that is sure to fail
+        room = get_context_window(model) - prompt_tokens
+        if room < max_tokens:
+            max_tokens = max(room, MIN_OUTPUT_TOKENS)
+            logger.warning(
+                f"{request_class} prompt of {prompt_tokens} tokens leaves {room} tokens of output room on {model}"
+            )
+
+    route = ModelRoute(
+        request_class=request_class,
+        model=model,
+        max_tokens=max_tokens,
+        prompt_tokens=prompt_tokens,
+        escalated=escalated,
+    )
+    logger.info(
+        f"Routed {request_class} request to {model}"
+        f"{f' (escalated from {preferred})' if escalated else ''}: "
+        f"{prompt_tokens} prompt tokens, {max_tokens} max output tokens"
+    )
+    return route
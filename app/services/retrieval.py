@@ -0,0 +1,221 @@
+"""
+Recall of earlier messages related to the current question.
+
+The history window only keeps the newest turns, and the rolling summary
+compresses older ones, so an exact figure stated long ago ("my mortgage rate
+is 6.25%") can drop out of the prompt. Each conversation gets a BM25 inverted
+index over its message contents. When a prompt is built, the messages that
+fell outside the window are ranked against the new user message, and the
+best matches are added to the system prompt within a small token budget.
+
+Indexes live in a per-process LRU keyed by conversation. Messages are keyed
+by ``seq``: committed messages are appended as they are stored, and before
+each query the index catches up on any higher ``seq`` written by another
+worker (one probe of the ``(conversation_id, seq)`` index). Nothing is
+re-tokenized after a message has been indexed.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models import Message
+from app.services.history import get_message_tokens
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words, and numbers with their decimal or thousands separators ("6.25", "300,000")
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be been before but by can could did do does doing
+for from had has have having he her here him his how i if in into is it its just me my myself
+no not now of on or our out over said say she should so some tell than that the their them then there
+these they this those to told too up us very was we were what when where which while who why will with
+would you your
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms of a text without stopwords; plural "s" is stripped so "rates" matches "rate" """
+    terms = []
+    for term in _TOKEN_PATTERN.findall(text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss") and not term[-2].isdigit():
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+class ConversationIndex:
+    """BM25 inverted index over the messages of one conversation"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.last_seq = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, seq: int, text: str) -> None:
+        """Index one message; seq must be higher than every indexed seq"""
+        terms = tokenize(text or "")
+        for term, count in Counter(terms).items():
+            self.postings.setdefault(term, {})[seq] = count
+        self.lengths[seq] = len(terms)
+        self.total_length += len(terms)
+        self.last_seq = max(self.last_seq, seq)
+
+    def search(self, query: str, top_k: int, before_seq: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return up to top_k (seq, score) pairs, best first, for messages before before_seq"""
+        if not self.lengths:
+            return []
+        count = len(self.lengths)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for seq, frequency in postings.items():
+                if before_seq is not None and seq >= before_seq:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[seq] / average_length)
+                scores[seq] = scores.get(seq, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], -item[0]))
+
+class RetrievalIndex:
+    """Per-process LRU of conversation indexes"""
+
+    def __init__(self, max_conversations: int = 1000):
+        self.max_conversations = max_conversations
+        self._indexes: "OrderedDict[int, ConversationIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, conversation_id: int, create: bool) -> Optional[ConversationIndex]:
+        with self._lock:
+            index = self._indexes.get(conversation_id)
+            if index is not None:
+                self._indexes.move_to_end(conversation_id)
+            elif create:
+                index = ConversationIndex()
+                self._indexes[conversation_id] = index
+                while len(self._indexes) > self.max_conversations:
+                    self._indexes.popitem(last=False)
+            return index
+
+    def note_message(self, conversation_id: int, seq: int, content: str) -> None:
+        """
+        Index a just-committed message if its conversation is loaded.
+
+        Only the next seq is appended; anything else (the index is not loaded,
+        or another worker wrote in between) is picked up by the next catch-up.
+        """
+        index = self._get(conversation_id, create=False)
+        if index is None:
+            return
+        with index.lock:
+            if seq == index.last_seq + 1:
+                index.add(seq, content)
+
+    def forget(self, conversation_id: int) -> None:
+        with self._lock:
+            self._indexes.pop(conversation_id, None)
+
+    def search(
+        self, session, conversation_id: int, query: str, before_seq: int, top_k: int
+    ) -> List[Tuple[int, float]]:
+        """Rank the messages with seq below before_seq against the query; returns (seq, score) pairs"""
+        if before_seq <= 1 or top_k <= 0:
+            return []
+        index = self._get(conversation_id, create=True)
+        with index.lock:
+            if index.last_seq < before_seq - 1:
+                # Every message below before_seq is committed (seqs are allocated under a row lock)
+                for seq, content in self._load_rows(session, conversation_id, index.last_seq, before_seq):
+                    index.add(seq, content)
+                index.last_seq = max(index.last_seq, before_seq - 1)
+            return index.search(query, top_k, before_seq)
+
+    @staticmethod
+    def _load_rows(session, conversation_id: int, after_seq: int, before_seq: int) -> Iterable[Tuple[int, str]]:
+        return (
+            session.query(Message.seq, Message.content)
+            .filter(
+                Message.conversation_id == conversation_id,
+                Message.seq > after_seq,
+                Message.seq < before_seq,
+            )
+            .order_by(Message.seq)
+            .all()
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "conversations": len(self._indexes),
+                "messages": sum(len(index) for index in self._indexes.values()),
+            }
+
+def recall_related_messages(
+    session,
+    conversation_id: int,
+    query: str,
+    before_seq: int,
+    max_tokens: int,
+    top_k: int,
+    model: str,
+) -> List[Any]:
+    """
+    Return the earlier messages most related to the query, oldest first.
+
+    Only messages with seq below before_seq (those outside the prompt window)
+    are considered. Hits are taken best first while they fit in max_tokens.
+    """
+    hits = retrieval_index.search(session, conversation_id, query, before_seq, top_k)
+    if not hits:
+        return []
+    rows = {
+        msg.seq: msg
+        for msg in session.query(Message)
+        .filter(Message.conversation_id == conversation_id, Message.seq.in_([seq for seq, _ in hits]))
+        .all()
+    }
+    selected = []
+    used = 0
+    for seq, _ in hits:
+        msg = rows.get(seq)
+        if msg is None:
+            continue
+        tokens = get_message_tokens(msg, model)
+        if used + tokens > max_tokens:
+            continue
+        selected.append(msg)
+        used += tokens
+    selected.sort(key=lambda msg: msg.seq)
+    if selected:
+        logger.info(
+            f"Recalled {len(selected)} earlier messages ({used} tokens) into the prompt "
+            f"for conversation {conversation_id}"
+        )
+    return selected
+
+def format_recalled_messages(messages: Sequence[Any]) -> str:
+    """Render recalled messages for the system prompt"""
+    lines = [f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}" for msg in messages]
+    return "\nEarlier messages from this conversation related to the current question:\n" + "\n".join(lines) + "\n"
+
+# Process-wide indexes used by the chat service
+retrieval_index = RetrievalIndex(max_conversations=Config.RETRIEVAL_MAX_CONVERSATIONS)
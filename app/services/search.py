@@ -0,0 +1,130 @@
+"""
+Full-text search over message contents and conversation titles.
+
+Both tables carry a stored ``search_vector`` column generated by Postgres
+(``to_tsvector('english', ...)``) with a GIN index, so matching never parses
+documents at query time. The user's query goes through
+``websearch_to_tsquery``, which accepts free text, quoted phrases, ``or`` and
+``-term`` without ever raising a syntax error.
+
+Message hits are ranked with ``ts_rank_cd`` and paged with a keyset cursor on
+``(rank, id)``. To keep latency flat on very common terms, only the most
+recent ``SEARCH_MAX_CANDIDATES`` matching messages are ranked; the planner
+can then satisfy the candidate query by walking the primary key backwards
+and stopping early instead of fetching every match. Snippets
+(``ts_headline``, which re-parses the text) are built for the returned page
+only.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import cast, func, tuple_
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+
+from app.models import Conversation, Message
+from app.utils.error_handlers import ValidationError
+from app.utils.pagination import decode_cursor, encode_cursor
+from config import Config
+
+# Must match the configuration of the generated search_vector columns
+SEARCH_TEXT_CONFIG = "english"
+
+# Matched terms are wrapped in Markdown bold, which the chat UI already renders
+HEADLINE_OPTIONS = "StartSel=**, StopSel=**, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=\" … \""
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """Return the (rank, message id) a search cursor points after"""
+    rank, message_id = decode_cursor(cursor, 2)
+    if isinstance(rank, bool) or not isinstance(rank, (int, float)) or type(message_id) is not int:
+        raise ValidationError("Invalid cursor", field="cursor")
+    return float(rank), message_id
+
+def _tsquery(query: str):
+    return func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, query)
+
+def search_messages(
+    session,
+    query: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    max_candidates: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Return one page of message hits, best first, and the cursor of the next page.
+
+    The next cursor is None on the last page.
+    """
+    tsquery = _tsquery(query)
+    max_candidates = max_candidates or Config.SEARCH_MAX_CANDIDATES
+
+    candidates = (
+        session.query(Message.id)
+        .filter(Message.search_vector.op("@@")(tsquery))
+        .order_by(Message.id.desc())
+        .limit(max_candidates)
+        .subquery()
+    )
+
+    # ts_rank_cd returns real; compare as double so a cursor rank survives the JSON round trip exactly
+    rank = cast(func.ts_rank_cd(Message.search_vector, tsquery, 32), DOUBLE_PRECISION).label("rank")
+    ranked = session.query(Message.id, rank).join(candidates, candidates.c.id == Message.id)
+    if cursor:
+        after_rank, after_id = decode_search_cursor(cursor)
+        ranked = ranked.filter(tuple_(rank, Message.id) < tuple_(after_rank, after_id))
+    page = ranked.order_by(rank.desc(), Message.id.desc()).limit(limit + 1).subquery()
+
+    rows = (
+        session.query(
+            Message.id,
+            Message.conversation_id,
+            Message.role,
+            Message.timestamp,
+            Conversation.title,
+            page.c.rank,
+            func.ts_headline(SEARCH_TEXT_CONFIG, Message.content, tsquery, HEADLINE_OPTIONS).label("snippet"),
+        )
+        .join(page, page.c.id == Message.id)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .order_by(page.c.rank.desc(), Message.id.desc())
+        .all()
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].rank, rows[-1].id])
+
+    hits = [
+        {
+            "message_id": row.id,
+            "conversation_id": row.conversation_id,
+            "conversation_title": row.title,
+            "role": row.role,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+            "rank": row.rank,
+            "snippet": row.snippet,
+        }
+        for row in rows
+    ]
+    return hits, next_cursor
+
+def search_conversation_titles(session, query: str, limit: int) -> List[Dict[str, Any]]:
+    """Return the conversations whose titles best match the query"""
+    tsquery = _tsquery(query)
+    rank = func.ts_rank_cd(Conversation.search_vector, tsquery, 32)
+    rows = (
+        session.query(Conversation.id, Conversation.title, Conversation.created_at, rank.label("rank"))
+        .filter(Conversation.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Conversation.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "conversation_id": row.id,
+            "title": row.title,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "rank": row.rank,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,308 @@
+"""
+Resumable chat streams.
+
+A streamed reply is produced by a background thread into a ``StreamBuffer``:
+a bounded ring of SSE events, each with an id of the form
+``<stream id>:<event number>``. HTTP responses only tail the buffer. A client
+that reconnects with ``Last-Event-ID`` gets the events it missed replayed and
+then follows the live tail, without a second OpenAI call.
+
+Buffers live in a per-process ``StreamRegistry`` capped by stream count and
+evicted a TTL after they finish. If every client stays detached from a
+running stream for longer than the resume grace period (or the stream is
+cancelled explicitly), the producer closes the chat stream. That stops
+upstream generation and stores the partial reply as truncated.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def format_event_id(stream_id: str, number: int) -> str:
+    return f"{stream_id}:{number}"
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Split a Last-Event-ID value into (stream id, event number), or None if malformed"""
+    if not event_id:
+        return None
+    stream_id, _, number = event_id.strip().rpartition(":")
+    if not stream_id or not number.isdigit():
+        return None
+    return stream_id, int(number)
+
+def format_sse(data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    """Format one Server-Sent Event frame"""
+    frame = f"id: {event_id}\n" if event_id else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+class StreamBuffer:
+    """Ring buffer of the events of one in-flight stream"""
+
+    def __init__(self, conversation_id: int, max_events: int = 2000, stream_id: Optional[str] = None):
+        self.stream_id = stream_id or uuid.uuid4().hex
+        self.conversation_id = conversation_id
+        self._events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=max_events)
+        self._next_number = 1
+        self._condition = threading.Condition()
+        self._subscribers = 0
+        self.finished = False
+        self.cancelled = False
+        self.finished_at: Optional[float] = None
+        self.detached_since: Optional[float] = time.monotonic()
+
+    def append(self, data: Dict[str, Any]) -> int:
+        """Add an event and wake the tailing responses; returns its number"""
+        with self._condition:
+            number = self._next_number
+            self._next_number += 1
+            self._events.append((number, data))
+            self._condition.notify_all()
+            return number
+
+    def finish(self) -> None:
+        """Mark the stream complete; no more events follow"""
+        with self._condition:
+            self.finished = True
+            self.finished_at = time.monotonic()
+            self._condition.notify_all()
+
+    def cancel(self) -> None:
+        """Ask the producer to stop generating"""
+        with self._condition:
+            self.cancelled = True
+            self._condition.notify_all()
+
+    def attach(self) -> None:
+        with self._condition:
+            self._subscribers += 1
+            self.detached_since = None
+
+    def detach(self) -> None:
+        with self._condition:
+            self._subscribers -= 1
+            if self._subscribers == 0:
+                self.detached_since = time.monotonic()
+
+    def abandoned(self, grace_seconds: float) -> bool:
+        """True once cancelled, or when no client has been attached for grace_seconds"""
+        with self._condition:
+            if self.cancelled:
+                return True
+            return self.detached_since is not None and time.monotonic() - self.detached_since > grace_seconds
+
+    def events_after(self, last_number: int) -> Optional[List[Tuple[int, Dict[str, Any]]]]:
+        """Return the buffered events after last_number, or None if some were already dropped"""
+        with self._condition:
+            return self._events_after(last_number)
+
+    def _events_after(self, last_number: int) -> Optional[List[Tuple[int, Dict[str, Any]]]]:
+        oldest = self._events[0][0] if self._events else self._next_number
+        if last_number + 1 < oldest:
+            return None
+        return [(number, data) for number, data in self._events if number > last_number]
+
+    def wait_for_events(self, last_number: int, timeout: float) -> Tuple[Optional[List[Tuple[int, Dict[str, Any]]]], bool]:
+        """Block until events after last_number exist or the stream ends; returns (events, finished)"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.finished or self._next_number - 1 > last_number,
+                timeout=timeout,
+            )
+            return self._events_after(last_number), self.finished
+
+    def tail(
+        self,
+        last_number: int = 0,
+        keepalive_seconds: float = 15.0,
+        flush_interval: float = 0.0,
+        max_frame_bytes: int = 0,
+    ) -> Iterator[str]:
+        """
+        Yield SSE frames from after last_number until the stream finishes.
+
+        With a flush_interval, consecutive chunk events are coalesced: at most
+        one frame is sent per flush_interval, and chunks arriving sooner wait
+        for the next frame unless max_frame_bytes of text are already pending.
+        The first frame, and any chunk arriving after a quiet period, go out
+        at once, so slow streams and the first token gain no latency. A
+        coalesced frame carries the id of its last event, so resuming from it
+        loses nothing.
+        """
+        self.attach()
+        try:
+            last_sent = float("-inf")
+            while True:
+                events, finished = self.wait_for_events(last_number, keepalive_seconds)
+                if events and flush_interval > 0 and not finished:
+                    events, finished = self._gather(events, last_sent + flush_interval, max_frame_bytes)
+                if events is None:
+                    yield format_sse({"error": "Stream history is no longer available", "resumable": False})
+                    return
+                if not events:
+                    if finished:
+                        return
+                    # Comment frame, keeps proxies from timing out an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                for number, data in self._coalesce(events, max_frame_bytes if flush_interval > 0 else 1):
+                    yield format_sse(data, format_event_id(self.stream_id, number))
+                    last_number = number
+                last_sent = time.monotonic()
+        finally:
+            self.detach()
+
+    def _gather(
+        self, events: List[Tuple[int, Dict[str, Any]]], deadline: float, max_frame_bytes: int
+    ) -> Tuple[Optional[List[Tuple[int, Dict[str, Any]]]], bool]:
+        """Collect more chunk events until the deadline, stopping early once a frame is full"""
+        pending_bytes = sum(len(data.get("chunk", "")) for _, data in events)
+        finished = False
+        while "chunk" in events[-1][1] and (not max_frame_bytes or pending_bytes < max_frame_bytes):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more, finished = self.wait_for_events(events[-1][0], remaining)
+            if more is None:
+                return None, finished
+            events.extend(more)
+            pending_bytes += sum(len(data.get("chunk", "")) for _, data in more)
+            if finished:
+                break
+        return events, finished
+
+    @staticmethod
+    def _coalesce(events: List[Tuple[int, Dict[str, Any]]], max_frame_bytes: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Merge runs of chunk events into frames of up to max_frame_bytes (0 for no limit)"""
+        parts: List[str] = []
+        size = 0
+        last = 0
+        for number, data in events:
+            chunk = data.get("chunk") if len(data) == 1 else None
+            if chunk is None:
+                if parts:
+                    yield last, {"chunk": "".join(parts)}
+                    parts, size = [], 0
+                yield number, data
+                continue
+            parts.append(chunk)
+            size += len(chunk)
+            last = number
+            if max_frame_bytes and size >= max_frame_bytes:
+                yield last, {"chunk": "".join(parts)}
+                parts, size = [], 0
+        if parts:
+            yield last, {"chunk": "".join(parts)}
+
+class StreamRegistry:
+    """Per-process registry of stream buffers, bounded by count and TTL"""
+
+    def __init__(self, max_streams: int = 500, max_events: int = 2000, ttl_seconds: float = 300.0):
+        self.max_streams = max_streams
+        self.max_events = max_events
+        self.ttl_seconds = ttl_seconds
+        self._buffers: "OrderedDict[str, StreamBuffer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def create(self, conversation_id: int) -> StreamBuffer:
+        buffer = StreamBuffer(conversation_id, max_events=self.max_events)
+        with self._lock:
+            self._evict_expired()
+            while len(self._buffers) >= self.max_streams:
+                self._evict_one()
+            self._buffers[buffer.stream_id] = buffer
+        return buffer
+
+    def get(self, stream_id: str) -> Optional[StreamBuffer]:
+        with self._lock:
+            self._evict_expired()
+            return self._buffers.get(stream_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buffers)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "streams": len(self._buffers),
+                "active": sum(1 for buffer in self._buffers.values() if not buffer.finished),
+                "evictions": self.evictions,
+            }
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            stream_id for stream_id, buffer in self._buffers.items()
+            if buffer.finished_at is not None and now - buffer.finished_at > self.ttl_seconds
+        ]
+        for stream_id in expired:
+            del self._buffers[stream_id]
+            self.evictions += 1
+
+    def _evict_one(self) -> None:
+        # Prefer the oldest finished stream; otherwise stop the oldest running one
+        victim = next((stream_id for stream_id, buffer in self._buffers.items() if buffer.finished), None)
+        if victim is None:
+            victim = next(iter(self._buffers))
+            self._buffers[victim].cancel()
+            logger.warning(f"Stream registry full, cancelling stream {victim}")
+        del self._buffers[victim]
+        self.evictions += 1
+
+def produce(buffer: StreamBuffer, chunks: Iterator[str], grace_seconds: float) -> None:
+    """Copy a chat stream's chunks into the buffer, stopping it if every client is gone"""
+    try:
+        for chunk in chunks:
+            buffer.append({"chunk": chunk})
+            if buffer.abandoned(grace_seconds):
+                logger.info(f"Stream {buffer.stream_id} abandoned by its clients, stopping generation")
+                chunks.close()  # type: ignore[attr-defined]
+                buffer.append({"error": "Stream cancelled", "resumable": False})
+                return
+        buffer.append({"end": True, "conversation_id": buffer.conversation_id})
+    except Exception as e:
+        logger.error(f"AI streaming error: {e}")
+        buffer.append({"error": "Failed to get AI response", "details": str(e)})
+    finally:
+        buffer.finish()
+
+def start_stream(
+    registry: StreamRegistry,
+    conversation_id: int,
+    chunk_source: Callable[[], Iterator[str]],
+    grace_seconds: float,
+    on_finish: Optional[Callable[[], None]] = None,
+) -> StreamBuffer:
+    """
+    Register a buffer and start filling it from chunk_source() on a daemon thread.
+    
+    on_finish, if given, is called on that thread once the stream has ended.
+    """
+    buffer = registry.create(conversation_id)
+
+    def run() -> None:
+        try:
+            produce(buffer, chunk_source(), grace_seconds)
+        finally:
+            if on_finish is not None:
+                on_finish()
+
+    thread = threading.Thread(target=run, name=f"stream-{buffer.stream_id[:8]}", daemon=True)
+    thread.start()
+    return buffer
+
+# Process-wide registry used by the streaming route
+stream_registry = StreamRegistry(
+    max_streams=Config.STREAM_BUFFER_MAX_STREAMS,
+    max_events=Config.STREAM_BUFFER_MAX_EVENTS,
+    ttl_seconds=Config.STREAM_BUFFER_TTL_SECONDS,
+)
@@ -0,0 +1,66 @@
+"""
+Counters for streamed chat responses.
+
+A stream ends in one of three ways: it completes, the client disconnects
+(cancelled), or the upstream call fails. For cancelled streams the upstream
+generation is stopped early; ``tokens_saved`` estimates the completion tokens
+that were not generated as the unused part of the stream's max_tokens budget.
+Counters are per worker process.
+"""
+
+import threading
+from typing import Dict
+
+class StreamMetrics:
+    """Thread-safe counters of stream outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.tokens_streamed = 0
+        self.tokens_saved = 0
+
+    def record_started(self) -> None:
+        with self._lock:
+            self.started += 1
+
+    def record_completed(self, tokens_streamed: int) -> None:
+        with self._lock:
+            self.completed += 1
+            self.tokens_streamed += tokens_streamed
+
+    def record_cancelled(self, tokens_streamed: int, tokens_saved: int) -> None:
+        with self._lock:
+            self.cancelled += 1
+            self.tokens_streamed += tokens_streamed
+            self.tokens_saved += max(tokens_saved, 0)
+
+    def record_failed(self, tokens_streamed: int) -> None:
+        with self._lock:
+            self.failed += 1
+            self.tokens_streamed += tokens_streamed
+
+    def reset(self) -> None:
+        """Reset all counters"""
+        with self._lock:
+            self.started = self.completed = self.cancelled = self.failed = 0
+            self.tokens_streamed = self.tokens_saved = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the stream outcome counters"""
+        with self._lock:
+            return {
+                "started": self.started,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "in_progress": self.started - self.completed - self.cancelled - self.failed,
+                "tokens_streamed": self.tokens_streamed,
+                "tokens_saved": self.tokens_saved,
+            }
+
+# Process-wide counters used by the chat service
+stream_metrics = StreamMetrics()
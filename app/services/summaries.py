@@ -0,0 +1,137 @@
+"""
+Rolling conversation summaries.
+
+Each conversation keeps a summary checkpoint: ``Conversation.summary`` plus the
+id of the last message it covers (``Conversation.summary_message_id``). Chat
+prompts send the system prompt, the summary and the un-summarized tail instead
+of the whole history. Once that tail grows past ``SUMMARY_TRIGGER_TOKENS`` the
+checkpoint is advanced incrementally: only the previous summary and the newly
+covered messages are sent to the model, never the full transcript.
+"""
+
+import logging
+from typing import Any, List, Optional, Sequence
+
+from app.models import Conversation, Message
+from app.services.history import get_message_tokens
+from app.services.model_router import SUMMARY, route_request
+from app.utils.database import get_db_session
+from app.utils.openai_client import get_openai_client
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a financial advisor. "
+    "Keep every concrete fact the user shared (ages, income, balances, rates, goals, risk tolerance) "
+    "and the key recommendations given. Be concise and factual. Return only the summary."
+)
+
+def get_unsummarized_messages(session, conversation: Conversation) -> List[Message]:
+    """Return the messages after the conversation's summary checkpoint, oldest first"""
+    query = session.query(Message).filter(Message.conversation_id == conversation.id)
+    if conversation.summary_message_id is not None:
+        query = query.filter(Message.id > conversation.summary_message_id)
+    return query.order_by(Message.seq).all()
+
+def select_messages_to_summarize(
+    tail: Sequence[Any],
+    model: str,
+    trigger_tokens: int,
+    keep_recent_tokens: int,
+) -> List[Any]:
+    """
+    Pick the oldest part of the un-summarized tail to fold into the summary.
+
+    Returns an empty list while the tail is within ``trigger_tokens``. Otherwise
+    returns the oldest messages, leaving at least ``keep_recent_tokens`` worth
+    of the newest messages (and always the newest one) verbatim.
+    """
+    tokens = [get_message_tokens(msg, model) for msg in tail]
+    if sum(tokens) <= trigger_tokens:
+        return []
+
+    kept_tokens = 0
+    split = len(tail)
+    while split > 1 and kept_tokens < keep_recent_tokens:
+        split -= 1
+        kept_tokens += tokens[split]
+    return list(tail[:split])
+
+def format_summary_prompt(previous_summary: Optional[str], messages: Sequence[Any]) -> str:
+    """Build the prompt that folds new messages into the previous summary"""
+    transcript = "\n".join(
+        f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}" for msg in messages
+    )
+    return f"""Update the summary of this conversation with the new messages below.
+
+Current summary:
+{previous_summary or "(none yet)"}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+def advance_summary(conversation_id: int) -> bool:
+    """
+    Advance the conversation's summary checkpoint if its tail is too long.
+
+    The tail is read and the new checkpoint written in separate short
+    transactions, so no database connection is held during the model call.
+    Returns True if the checkpoint moved. Failures are logged and leave the
+    checkpoint untouched, so prompts simply fall back to the token-budgeted
+    history window.
+    """
+    try:
+        with get_db_session() as session:
+            conversation = session.get(Conversation, conversation_id)
+            if not conversation:
+                return False
+
+            tail = get_unsummarized_messages(session, conversation)
+            to_summarize = select_messages_to_summarize(
+                tail,
+                Config.OPENAI_MODEL,
+                trigger_tokens=Config.SUMMARY_TRIGGER_TOKENS,
+                keep_recent_tokens=Config.SUMMARY_KEEP_RECENT_TOKENS,
+            )
+            if not to_summarize:
+                return False
+
+            previous_checkpoint = conversation.summary_message_id
+            summary_prompt = format_summary_prompt(conversation.summary, to_summarize)
+            new_checkpoint = to_summarize[-1].id
+
+        summary_messages = [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": summary_prompt}
+        ]
+        route = route_request(SUMMARY, summary_messages)
+        response = get_openai_client().chat.completions.create(
+            model=route.model,
+            messages=summary_messages,  # type: ignore
+            max_tokens=route.max_tokens,
+            temperature=0.3
+        )
+        summary = response.choices[0].message.content if response.choices else None
+        if not summary or not summary.strip():
+            raise Exception("AI returned empty summary")
+
+        with get_db_session() as session:
+            conversation = session.get(Conversation, conversation_id)
+            # Another request may have advanced the checkpoint meanwhile
+            if not conversation or conversation.summary_message_id != previous_checkpoint:
+                return False
+            conversation.summary = summary.strip()
+            conversation.summary_message_id = new_checkpoint
+
+        logger.info(
+            f"Advanced summary for conversation {conversation_id} through message "
+            f"{new_checkpoint} ({len(to_summarize)} messages folded in)"
+        )
+        return True
+
+    except Exception as e:
+        logger.warning(f"Summary update failed for conversation {conversation_id}: {e}")
+        return False
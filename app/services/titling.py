@@ -0,0 +1,259 @@
+"""
+Background conversation titling.
+
+``/auto_rename`` requests only enqueue the conversation; a single worker
+thread titles it later. Requests are debounced: asking again while a
+conversation is pending pushes its deadline back (up to a maximum delay), so
+a burst of requests produces one title. Once conversations are due, the worker
+reads just the first ``TITLE_CONTEXT_TOKENS`` of each one, asks for all of
+their titles in a single completion and writes the results in one short
+transaction. No request thread waits on the model.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models import Conversation, Message
+from app.services.model_router import TITLE, route_request
+from app.services.history import APPROX_CHARS_PER_TOKEN, get_message_tokens
+from app.utils.database import get_db_session
+from app.services.conversation_counters import bump_conversation_version, bump_list_version
+from app.utils.openai_client import get_openai_client
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+TITLE_MAX_WORDS = 6
+TITLE_MAX_CHARS = 60
+
+# At most this many leading messages are read per conversation
+TITLE_MAX_MESSAGES = 10
+
+TITLE_SYSTEM_PROMPT = (
+    "You generate concise, descriptive titles for conversations. "
+    f"Each title is {TITLE_MAX_WORDS} words or less and captures the main topic or question. "
+    "Return only JSON, no additional text."
+)
+
+def clean_title(title: str) -> str:
+    """Strip quotes and limit a generated title to TITLE_MAX_WORDS words and TITLE_MAX_CHARS characters"""
+    title = title.strip().strip('"\'').strip()
+    words = title.split()
+    if len(words) > TITLE_MAX_WORDS:
+        title = ' '.join(words[:TITLE_MAX_WORDS])
+    if len(title) > TITLE_MAX_CHARS:
+        title = title[:TITLE_MAX_CHARS - 3] + "..."
+    return title
+
+def fallback_title(first_user_message: str) -> str:
+    """Title a conversation from its first user message when the model gives no title"""
+    words = first_user_message.split()
+    if len(words) > TITLE_MAX_WORDS:
+        return ' '.join(words[:TITLE_MAX_WORDS])
+    title = first_user_message[:50]
+    if len(first_user_message) > 50:
+        title += "..."
+    return title
+
+def get_leading_transcript(messages: Iterable, model: str, max_tokens: int) -> str:
+    """Format the start of a conversation, stopping after about max_tokens tokens"""
+    lines = []
+    remaining = max_tokens
+    for msg in messages:
+        if remaining <= 0:
+            break
+        content = str(msg.content)
+        tokens = get_message_tokens(msg, model)
+        if tokens > remaining:
+            content = content[:remaining * APPROX_CHARS_PER_TOKEN]
+        remaining -= tokens
+        lines.append(f"{'User' if msg.role == 'user' else 'Assistant'}: {content}")
+    return "\n".join(lines)
+
+def format_title_prompt(transcripts: Dict[int, str]) -> str:
+    """Build one prompt asking for a title per conversation, keyed by id"""
+    sections = "\n\n".join(
+        f"Conversation {conversation_id}:\n{transcript}" for conversation_id, transcript in transcripts.items()
+    )
+    return f"""Generate a title for each conversation below.
+Respond with a JSON object mapping each conversation id to its title, e.g. {{"12": "Saving for a House"}}.
+
+{sections}"""
+
+def parse_titles(content: Optional[str], conversation_ids: Sequence[int]) -> Dict[int, str]:
+    """Extract the {id: title} object from a completion, ignoring unknown ids and empty titles"""
+    if not content:
+        return {}
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    titles = {}
+    for conversation_id in conversation_ids:
+        title = data.get(str(conversation_id))
+        if isinstance(title, str) and clean_title(title):
+            titles[conversation_id] = clean_title(title)
+    return titles
+
+class TitleWorker:
+    """Debounced queue of conversations to title, drained in batches by a daemon thread"""
+
+    def __init__(
+        self,
+        debounce_seconds: float = 2.0,
+        max_delay_seconds: float = 10.0,
+        batch_size: int = 10,
+        context_tokens: int = 500,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.batch_size = batch_size
+        self.context_tokens = context_tokens
+        # conversation_id -> (first requested at, due at)
+        self._pending: Dict[int, Tuple[float, float]] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def request(self, conversation_id: int) -> None:
+        """Schedule a conversation for titling, debouncing repeated requests"""
+        now = time.monotonic()
+        with self._condition:
+            first_requested, _ = self._pending.get(conversation_id, (now, now))
+            due = min(now + self.debounce_seconds, first_requested + self.max_delay_seconds)
+            self._pending[conversation_id] = (first_requested, due)
+            self._ensure_started()
+            self._condition.notify()
+
+    def pending_count(self) -> int:
+        """Return the number of conversations waiting to be titled"""
+        with self._condition:
+            return len(self._pending)
+
+    def take_due(self, now: Optional[float] = None) -> List[int]:
+        """Remove and return up to batch_size conversations whose deadline has passed"""
+        now = time.monotonic() if now is None else now
+        with self._condition:
+            due = sorted(
+                (due_at, conversation_id) for conversation_id, (_, due_at) in self._pending.items() if due_at <= now
+            )
+            conversation_ids = [conversation_id for _, conversation_id in due[:self.batch_size]]
+            for conversation_id in conversation_ids:
+                del self._pending[conversation_id]
+            return conversation_ids
+
+    def title_conversations(self, conversation_ids: Sequence[int]) -> Dict[int, str]:
+        """Generate and store titles for a batch of conversations; returns the titles written"""
+        # Read the leading messages, then release the connection before the model call
+        transcripts: Dict[int, str] = {}
+        first_user_messages: Dict[int, str] = {}
+        with get_db_session() as session:
+            for conversation_id in conversation_ids:
+                messages = (
+                    session.query(Message)
+                    .filter(Message.conversation_id == conversation_id)
+                    .order_by(Message.seq)
+                    .limit(TITLE_MAX_MESSAGES)
+                    .all()
+                )
+                if not messages:
+                    continue
+                transcripts[conversation_id] = get_leading_transcript(messages, Config.OPENAI_MODEL, self.context_tokens)
+                first_user = next((msg for msg in messages if msg.role == "user"), None)
+                if first_user is not None:
+                    first_user_messages[conversation_id] = str(first_user.content)
+
+        if not transcripts:
+            return {}
+
+        titles: Dict[int, str] = {}
+        try:
+            title_messages = [
+                {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+                {"role": "user", "content": format_title_prompt(transcripts)}
+            ]
+            route = route_request(TITLE, title_messages, max_tokens=Config.TITLE_MAX_TOKENS * (len(transcripts) + 1))
+            response = get_openai_client().chat.completions.create(
+                model=route.model,
+                messages=title_messages,  # type: ignore
+                max_tokens=route.max_tokens,
+                temperature=0.3
+            )
+            content = response.choices[0].message.content if response.choices else None
+            titles = parse_titles(content, list(transcripts))
+        except Exception as e:
+            logger.warning(f"AI title generation failed for conversations {list(transcripts)}, using fallback: {e}")
+
+        # Fall back to the first user message for anything the model did not title
+        for conversation_id, first_user_message in first_user_messages.items():
+            if conversation_id not in titles:
+                titles[conversation_id] = fallback_title(first_user_message)
+
+        with get_db_session() as session:
+            # Conversation rows first, in id order, then the list counter once,
+            # the same lock order as a chat turn
+            titled = 0
+            for conversation_id in sorted(titles):
+                conversation = session.get(Conversation, conversation_id)
+                if conversation:
+                    conversation.title = titles[conversation_id]
+                    bump_conversation_version(session, conversation_id)
+                    titled += 1
+            if titled:
+                bump_list_version(session)
+
+        logger.info(f"Titled {len(titles)} conversations in one batch")
+        return titles
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker thread"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        # Called with the condition held
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="title-worker", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    now = time.monotonic()
+                    next_due = min((due_at for _, due_at in self._pending.values()), default=None)
+                    if next_due is not None and next_due <= now:
+                        break
+                    self._condition.wait(None if next_due is None else next_due - now)
+                if self._stopped:
+                    return
+
+            conversation_ids = self.take_due()
+            if not conversation_ids:
+                continue
+            try:
+                self.title_conversations(conversation_ids)
+            except Exception as e:
+                logger.error(f"Titling failed for conversations {conversation_ids}: {e}")
+
+# Process-wide worker used by the /auto_rename route
+title_worker = TitleWorker(
+    debounce_seconds=Config.TITLE_DEBOUNCE_SECONDS,
+    max_delay_seconds=Config.TITLE_MAX_DELAY_SECONDS,
+    batch_size=Config.TITLE_BATCH_SIZE,
+    context_tokens=Config.TITLE_CONTEXT_TOKENS,
+)
@@ -35,6 +35,7 @@ from .error_handlers import (
 
 from .document_processor import extract_text_from_pdf, extract_text_from_txt, extract_data_from_csv, analyze_document_with_ai
 from .database import get_db_session, get_db_session_dependency, execute_in_transaction, DatabaseManager
+from .openai_client import get_openai_client, close_openai_client
 
 __all__ = [
     # Error handling
@@ -69,5 +70,9 @@ __all__ = [
     'get_db_session',
     'get_db_session_dependency',
     'execute_in_transaction',
-    'DatabaseManager'
+    'DatabaseManager',
+    
+    # OpenAI client
+    'get_openai_client',
+    'close_openai_client'
 ] 
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""
+Conditional GET support.
+
+Endpoints compute an ETag from a version number that is cheap to look up,
+answer ``304 Not Modified`` when the client already holds it, and only
+otherwise build the full payload. ``Cache-Control: no-cache`` makes browsers
+keep the response but revalidate it on every request, so ``fetch`` calls
+send ``If-None-Match`` without any client code.
+"""
+
+import hashlib
+from typing import Any
+
+from flask import Response
+
+def make_etag(*parts: Any) -> str:
+    """ETag value for a resource version; include every request parameter that changes the body"""
+    return hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:24]
+
+def is_not_modified(request, etag: str) -> bool:
+    return etag in request.if_none_match
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 response for a client whose copy is current"""
+    response = Response(status=304)
+    return with_etag(response, etag)
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
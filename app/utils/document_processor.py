@@ -2,9 +2,10 @@ import pypdf
 import pandas as pd
 import logging
 import os
-import openai
 from dotenv import load_dotenv
 import tiktoken
+from app.utils.openai_client import get_openai_client
+from app.services.model_router import DOCUMENT, route_request
 
 # Load environment variables
 load_dotenv()
@@ -96,8 +97,6 @@ def extract_data_from_csv(file_path):
 def analyze_document_with_ai(text_content, file_type, filename):
     """Analyze document content using OpenAI"""
     try:
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        
         # Create analysis prompt based on file type
         if file_type == "csv" or file_type in ["xls", "xlsx"]:
             prompt = f"""Analyze this financial data from {filename} and provide insights:
@@ -124,13 +123,15 @@ Please provide:
 
 Format your response in a clear, structured manner."""
         
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a financial advisor analyzing documents. Provide clear, actionable insights."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
+        messages = [
+            {"role": "system", "content": "You are a financial advisor analyzing documents. Provide clear, actionable insights."},
+            {"role": "user", "content": prompt}
+        ]
+        route = route_request(DOCUMENT, messages)
+        response = get_openai_client().chat.completions.create(
+            model=route.model,
+            messages=messages,
+            max_tokens=route.max_tokens,
             temperature=0.3
         )
         
@@ -1,5 +1,6 @@
 from flask import request, jsonify
 import logging
+import math
 from datetime import datetime
 import uuid
 from typing import Optional, Dict, Any, Union
@@ -116,6 +117,19 @@ class ExternalServiceError(APIError):
             details=details or {"service": service} if service else {}
         )
 
+class RateLimitError(APIError):
+    """Raised when a request is refused by rate limiting or admission control"""
+    def __init__(self, message: str, retry_after: float, scope: Optional[str] = None):
+        super().__init__(
+            message=message,
+            error_type=ErrorType.RATE_LIMIT_ERROR,
+            status_code=429,
+            severity=ErrorSeverity.LOW,
+            details={"scope": scope} if scope else {}
+        )
+        # Whole seconds, at least 1, as sent in the Retry-After header
+        self.retry_after = max(1, math.ceil(retry_after))
+
 def log_error(error: APIError, context: Optional[Dict[str, Any]] = None):
     """Log error with consistent format and context"""
     log_data = {
@@ -157,6 +171,12 @@ def create_error_response(error: APIError, include_details: bool = False) -> tup
     if include_details and error.details:
         response["error"]["details"] = error.details
     
+    if isinstance(error, RateLimitError):
+        response["error"]["retry_after"] = error.retry_after
+        flask_response = jsonify(response)
+        flask_response.headers["Retry-After"] = str(error.retry_after)
+        return flask_response, error.status_code
+    
     return jsonify(response), error.status_code
 
 def handle_api_error(error: Exception, message: str = "An error occurred") -> tuple:
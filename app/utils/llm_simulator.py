@@ -0,0 +1,152 @@
+"""
+Offline stand-in for the OpenAI client, for load and latency testing.
+
+Chat and document services only use ``client.chat.completions.create``, so
+that method is the provider interface: ``get_openai_client`` returns either
+the real client or a ``SimulatedLLMClient`` depending on ``LLM_PROVIDER``.
+The simulator answers with deterministic text derived from the prompt,
+waits ``SIM_TIME_TO_FIRST_TOKEN`` seconds before the first token, emits
+``SIM_TOKENS_PER_SECOND`` tokens per second and fails a ``SIM_ERROR_RATE``
+fraction of calls with a connection error. No network access is needed.
+"""
+
+import hashlib
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice, ChoiceDelta
+from openai.types.completion_usage import CompletionUsage
+
+SIMULATED_WORDS = (
+    "A diversified portfolio balances stocks , bonds and cash according to your goals and time horizon .\n\n"
+    "- Build an emergency fund covering three to six months of expenses .\n"
+    "- Pay down high-interest debt before investing aggressively .\n"
+    "- Contribute enough to your 401(k) to capture the full employer match .\n\n"
+    "The future value of regular savings is $FV = P \\frac{(1 + r)^n - 1}{r}$ , where $r$ is the rate per period ."
+).split(" ")
+
+class SimulatedLLMError(openai.APIConnectionError):
+    """Injected failure, raised like a dropped connection to the API"""
+
+    def __init__(self):
+        super().__init__(
+            message="Simulated LLM failure",
+            request=httpx.Request("POST", "http://llm-simulator/v1/chat/completions"),
+        )
+
+def simulated_tokens(messages: List[Dict[str, Any]], max_tokens: int, response_tokens: int) -> List[str]:
+    """Return the reply for a prompt as a list of tokens; the same prompt always gets the same reply"""
+    prompt = "\n".join(f"{msg.get('role')}:{msg.get('content')}" for msg in messages)
+    offset = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % len(SIMULATED_WORDS)
+    count = max(1, min(max_tokens, response_tokens))
+    return [
+        SIMULATED_WORDS[(offset + i) % len(SIMULATED_WORDS)] + ("" if i == count - 1 else " ")
+        for i in range(count)
+    ]
+
+class _Completions:
+    def __init__(self, client: "SimulatedLLMClient"):
+        self._client = client
+
+    def create(
+        self,
+        *,
+        model: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+        stream: bool = False,
+        **kwargs: Any,
+    ):
+        """Simulate ``chat.completions.create`` for a streamed or complete response"""
+        client = self._client
+        tokens = simulated_tokens(messages, max_tokens or client.response_tokens, client.response_tokens)
+        completion_id = f"chatcmpl-sim-{uuid.uuid4().hex[:12]}"
+        if client.should_fail():
+            raise SimulatedLLMError()
+        if stream:
+            return client.stream_chunks(completion_id, model, tokens)
+
+        client.sleep(client.time_to_first_token + len(tokens) / client.tokens_per_second)
+        prompt_tokens = sum(len(str(msg.get("content", "")).split()) for msg in messages)
+        return ChatCompletion(
+            id=completion_id,
+            choices=[Choice(
+                finish_reason="length" if max_tokens and len(tokens) >= max_tokens else "stop",
+                index=0,
+                message=ChatCompletionMessage(role="assistant", content="".join(tokens)),
+            )],
+            created=int(time.time()),
+            model=model,
+            object="chat.completion",
+            usage=CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=len(tokens),
+                total_tokens=prompt_tokens + len(tokens),
+            ),
+        )
+
+class _Chat:
+    def __init__(self, client: "SimulatedLLMClient"):
+        self.completions = _Completions(client)
+
+class SimulatedLLMClient:
+    """Drop-in replacement for ``openai.OpenAI`` covering chat completions"""
+
+    def __init__(
+        self,
+        tokens_per_second: float = 50.0,
+        time_to_first_token: float = 0.3,
+        error_rate: float = 0.0,
+        response_tokens: int = 200,
+        seed: Optional[int] = None,
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.time_to_first_token = time_to_first_token
+        self.error_rate = error_rate
+        self.response_tokens = response_tokens
+        self.chat = _Chat(self)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        """Decide whether to inject a failure into the next call"""
+        if self.error_rate <= 0:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def stream_chunks(self, completion_id: str, model: str, tokens: List[str]) -> Iterator[ChatCompletionChunk]:
+        """Yield one chunk per token at the configured pace, then the finishing chunk"""
+        created = int(time.time())
+        start = time.monotonic() + self.time_to_first_token
+        for index, token in enumerate(tokens):
+            # Pace against the start time so slow consumers do not add up delays
+            self.sleep(start + index / self.tokens_per_second - time.monotonic())
+            yield ChatCompletionChunk(
+                id=completion_id,
+                choices=[ChunkChoice(delta=ChoiceDelta(content=token), finish_reason=None, index=0)],
+                created=created,
+                model=model,
+                object="chat.completion.chunk",
+            )
+        yield ChatCompletionChunk(
+            id=completion_id,
+            choices=[ChunkChoice(delta=ChoiceDelta(), finish_reason="stop", index=0)],
+            created=created,
+            model=model,
+            object="chat.completion.chunk",
+        )
+
+    def close(self) -> None:
+        """Nothing to release; present so it can be closed like the real client"""
@@ -0,0 +1,89 @@
+import threading
+import logging
+from typing import Optional, Union
+
+import httpx
+import openai
+
+from app.utils.llm_simulator import SimulatedLLMClient
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[Union[openai.OpenAI, SimulatedLLMClient]] = None
+_client_lock = threading.Lock()
+
+def create_openai_client() -> openai.OpenAI:
+    """
+    Create an OpenAI client backed by a tuned httpx connection pool.
+    
+    Connections are kept alive and reused across calls, so only the first
+    request on a connection pays for the TCP/TLS handshake. Explicit connect,
+    read and pool timeouts make sure a hung upstream fails the request instead
+    of pinning a worker forever.
+    
+    Returns:
+        openai.OpenAI: A new client instance
+    """
+    timeout = httpx.Timeout(
+        Config.OPENAI_READ_TIMEOUT,
+        connect=Config.OPENAI_CONNECT_TIMEOUT,
+        pool=Config.OPENAI_POOL_TIMEOUT,
+    )
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        timeout=timeout,
+    )
+    return openai.OpenAI(
+        api_key=Config.OPENAI_API_KEY,
+        max_retries=Config.OPENAI_MAX_RETRIES,
+        timeout=timeout,
+        http_client=http_client,
+    )
+
+def create_simulated_client() -> SimulatedLLMClient:
+    """Create the offline LLM simulator configured by the SIM_* settings"""
+    return SimulatedLLMClient(
+        tokens_per_second=Config.SIM_TOKENS_PER_SECOND,
+        time_to_first_token=Config.SIM_TIME_TO_FIRST_TOKEN,
+        error_rate=Config.SIM_ERROR_RATE,
+        response_tokens=Config.SIM_RESPONSE_TOKENS,
+        seed=Config.SIM_SEED,
+    )
+
+def get_openai_client() -> Union[openai.OpenAI, SimulatedLLMClient]:
+    """
+    Get the process-wide OpenAI client.
+    
+    The client is created lazily on first use (so each forked worker builds
+    its own connection pool) and shared by every thread afterwards. With
+    LLM_PROVIDER=simulated it is the offline simulator instead, which serves
+    the same ``chat.completions.create`` interface without network access.
+    
+    Usage:
+        client = get_openai_client()
+        response = client.chat.completions.create(...)
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if Config.LLM_PROVIDER == "simulated":
+                    _client = create_simulated_client()
+                    logger.warning("LLM_PROVIDER=simulated: using the offline LLM simulator instead of OpenAI")
+                else:
+                    _client = create_openai_client()
+                    logger.debug("Created shared OpenAI client")
+    return _client
+
+def close_openai_client() -> None:
+    """Close the shared client's connection pool (e.g. on worker shutdown)"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,36 @@
+"""
+Keyset pagination helpers.
+
+List endpoints page by the sort key of the last row returned instead of an
+OFFSET, so every page costs one index range scan no matter how deep it is.
+The key travels to the client as an opaque, URL-safe cursor.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Sequence
+
+from .error_handlers import ValidationError, validate_numeric_range
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    payload = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor made by encode_cursor into its `size` values; raises ValidationError otherwise"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValidationError("Invalid cursor", field="cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValidationError("Invalid cursor", field="cursor")
+    return values
+
+def parse_limit(value: Optional[str], default: int, maximum: int) -> int:
+    """Validate a page size query parameter"""
+    if value is None or value == "":
+        return default
+    return int(validate_numeric_range(value, 1, maximum, "limit"))
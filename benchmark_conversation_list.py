@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark the conversation list: one COUNT per conversation versus keyset pages.
+
+Seeds a scratch schema (``bench_conversation_list`` by default) of the
+database in DATABASE_URL with N conversations and M messages each, using
+``generate_series`` so seeding 100k conversations takes seconds. The app's
+own tables are never touched. Reports latency of:
+
+* ``legacy_full_list``: the old handler, all conversations plus one COUNT each;
+* ``keyset_first_page``: ``list_conversations`` for the newest page;
+* ``keyset_deep_page``: the same for a page starting deep in the list;
+* ``activity_first_page``: the newest page sorted by recent activity.
+
+    python benchmark_conversation_list.py --conversations 100000 --messages 10 --json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db import DATABASE_URL
+from app.models import Base, Conversation, Message
+from app.services.conversation_list import list_conversations
+from app.utils.pagination import encode_cursor
+
+def seed(engine, schema: str, conversations: int, messages: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+        conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO conversations (title, created_at, tags, message_count, last_message_at)
+            SELECT 'Conversation ' || g, now() - make_interval(secs => g), ARRAY['bench'],
+                   :messages, now() - make_interval(secs => g)
+            FROM generate_series(1, :conversations) AS g
+        """), {"conversations": conversations, "messages": messages})
+        conn.execute(text("""
+            INSERT INTO messages (conversation_id, seq, role, content, timestamp, token_count, truncated)
+            SELECT c.id, s, CASE WHEN s % 2 = 1 THEN 'user' ELSE 'assistant' END,
+                   'Message ' || s || ' about budgeting, retirement savings and taxes', c.created_at, 12, false
+            FROM conversations AS c CROSS JOIN generate_series(1, :messages) AS s
+        """), {"messages": messages})
+        conn.execute(text("ANALYZE conversations"))
+        conn.execute(text("ANALYZE messages"))
+
+def legacy_full_list(session) -> int:
+    """The handler this benchmark replaces: every conversation, then one COUNT per row"""
+    result = []
+    for conv in session.query(Conversation).order_by(Conversation.created_at.desc()).all():
+        message_count = session.query(Message).filter_by(conversation_id=conv.id).count()
+        result.append({"id": conv.id, "title": conv.title, "message_count": message_count})
+    return len(result)
+
+def measure(make_session: Callable, run: Callable, repeats: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeats):
+        session = make_session()
+        try:
+            start = time.perf_counter()
+            run(session)
+            timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            session.close()
+    timings.sort()
+    return {
+        "repeats": repeats,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+def run(
+    conversations: int, messages: int, limit: int, depth: int, repeats: int,
+    schema: str, legacy: bool, keep: bool,
+) -> List[Dict[str, object]]:
+    engine = create_engine(DATABASE_URL, connect_args={"options": f"-csearch_path={schema}"})
+    make_session = sessionmaker(bind=engine)
+    seed(engine, schema, conversations, messages)
+    try:
+        with engine.connect() as conn:
+            created_at, conversation_id = conn.execute(text(
+                "SELECT created_at, id FROM conversations ORDER BY created_at DESC, id DESC OFFSET :depth LIMIT 1"
+            ), {"depth": max(0, min(depth, conversations - 1))}).one()
+        deep_cursor = encode_cursor([created_at.isoformat(), conversation_id])
+
+        cases = [
+            ("keyset_first_page", lambda session: list_conversations(session, limit), repeats),
+            ("keyset_deep_page", lambda session: list_conversations(session, limit, deep_cursor), repeats),
+            ("activity_first_page", lambda session: list_conversations(session, limit, sort="activity"), repeats),
+        ]
+        if legacy:
+            cases.append(("legacy_full_list", legacy_full_list, 1))
+
+        results = []
+        for name, case, case_repeats in cases:
+            results.append({
+                "case": name, "conversations": conversations, "messages_per_conversation": messages,
+                "limit": limit, **measure(make_session, case, case_repeats),
+            })
+        return results
+    finally:
+        if not keep:
+            with engine.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+        engine.dispose()
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the N+1 conversation list with keyset pages")
+    parser.add_argument("--conversations", type=int, default=100000, help="Conversations to seed")
+    parser.add_argument("--messages", type=int, default=10, help="Messages per conversation")
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--depth", type=int, default=90000, help="Rows skipped before the deep page")
+    parser.add_argument("--repeats", type=int, default=50, help="Runs per keyset measurement")
+    parser.add_argument("--schema", default="bench_conversation_list", help="Scratch schema, dropped afterwards")
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the slow one-COUNT-per-row listing")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded schema")
+    parser.add_argument("--json", action="store_true", help="Print a JSON report instead of a table")
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.conversations, args.messages, args.limit, args.depth, args.repeats,
+        args.schema, not args.skip_legacy, args.keep,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    columns = ["case", "conversations", "limit", "repeats", "p50_ms", "p95_ms", "max_ms"]
+    print("  ".join(f"{column:>17}" for column in columns))
+    for result in results:
+        print("  ".join(f"{result[column]!s:>17}" for column in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
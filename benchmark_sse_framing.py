@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark SSE framing: one frame per delta versus coalesced frames.
+
+Each run streams one simulated answer (``SimulatedLLMClient``, no network)
+through a ``StreamBuffer`` and tails it exactly like the streaming route does.
+Every frame is written to a real socket with one ``sendall`` call, the way a
+WSGI server writes and flushes each yielded chunk. Per answer, the benchmark
+reports frames (= write syscalls), bytes sent, JSON encodes, the CPU time of
+the writing thread and the time to the first frame.
+
+    python benchmark_sse_framing.py --rates 20,100,1000 --tokens 400 --json
+"""
+
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+from unittest.mock import patch
+
+from app.services import stream_buffer
+from app.services.stream_buffer import StreamBuffer, produce
+from app.utils.llm_simulator import SimulatedLLMClient
+
+MODES = {
+    "per_delta": {"flush_interval": 0.0, "max_frame_bytes": 0},
+    "coalesced": {"flush_interval": 0.030, "max_frame_bytes": 512},
+}
+
+def drain(sock: socket.socket) -> None:
+    while sock.recv(65536):
+        pass
+
+def run_answer(rate: float, tokens: int, flush_interval: float, max_frame_bytes: int) -> Dict[str, float]:
+    """Stream one answer and measure the writing side"""
+    client = SimulatedLLMClient(tokens_per_second=rate, time_to_first_token=0.0, response_tokens=tokens)
+    messages = [{"role": "user", "content": "How should I invest my savings?"}]
+
+    def chunks():
+        for chunk in client.chat.completions.create(model="gpt-3.5-turbo", messages=messages, stream=True):
+            if chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
+
+    writer, reader = socket.socketpair()
+    drainer = threading.Thread(target=drain, args=(reader,), daemon=True)
+    drainer.start()
+
+    buffer = StreamBuffer(conversation_id=1, max_events=tokens + 10)
+    encodes = 0
+    real_format = stream_buffer.format_sse
+
+    def counting_format(*args, **kwargs):
+        nonlocal encodes
+        encodes += 1
+        return real_format(*args, **kwargs)
+
+    frames = 0
+    sent = 0
+    first_frame: Optional[float] = None
+    with patch.object(stream_buffer, "format_sse", counting_format):
+        start = time.monotonic()
+        producer = threading.Thread(target=produce, args=(buffer, chunks(), 60.0), daemon=True)
+        producer.start()
+        cpu_start = time.thread_time()
+        for frame in buffer.tail(0, keepalive_seconds=15.0, flush_interval=flush_interval, max_frame_bytes=max_frame_bytes):
+            data = frame.encode("utf-8")
+            writer.sendall(data)
+            frames += 1
+            sent += len(data)
+            if first_frame is None:
+                first_frame = time.monotonic() - start
+        cpu = time.thread_time() - cpu_start
+        wall = time.monotonic() - start
+        producer.join()
+
+    writer.close()
+    drainer.join()
+    reader.close()
+    return {
+        "frames": frames,
+        "write_syscalls": frames,
+        "bytes": sent,
+        "json_encodes": encodes,
+        "writer_cpu_ms": round(cpu * 1000, 3),
+        "first_frame_ms": round((first_frame or 0.0) * 1000, 3),
+        "wall_ms": round(wall * 1000, 3),
+    }
+
+def run(rates: Sequence[float], tokens: int, repeats: int) -> List[Dict[str, object]]:
+    results = []
+    for rate in rates:
+        for mode, settings in MODES.items():
+            runs = [run_answer(rate, tokens, **settings) for _ in range(repeats)]
+            averaged = {key: round(sum(r[key] for r in runs) / len(runs), 3) for key in runs[0]}
+            results.append({"tokens_per_second": rate, "tokens": tokens, "mode": mode, **settings, **averaged})
+    return results
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare per-delta and coalesced SSE framing")
+    parser.add_argument("--rates", default="20,100,1000", help="Comma-separated upstream tokens/sec to simulate")
+    parser.add_argument("--tokens", type=int, default=400, help="Tokens per answer")
+    parser.add_argument("--repeats", type=int, default=3, help="Answers averaged per measurement")
+    parser.add_argument("--json", action="store_true", help="Print a JSON report instead of a table")
+    args = parser.parse_args(argv)
+
+    results = run([float(rate) for rate in args.rates.split(",")], args.tokens, args.repeats)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    columns = ["tokens_per_second", "mode", "frames", "bytes", "json_encodes", "writer_cpu_ms", "first_frame_ms", "wall_ms"]
+    print("  ".join(f"{column:>17}" for column in columns))
+    for result in results:
+        print("  ".join(f"{result[column]!s:>17}" for column in columns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
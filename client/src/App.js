@@ -330,10 +330,18 @@ function AppContent() {
 
   const refreshConversations = async (preserveSelection = false) => {
     try {
-      const res = await fetch(getApiUrl('/conversations'));
-      const data = await res.json();
-      // Ensure data is always an array
-      const conversationsArray = Array.isArray(data) ? data : [];
+      // The list is paged; follow the X-Next-Cursor header until the last page
+      let conversationsArray = [];
+      let cursor = null;
+      do {
+        const query = cursor ? `?limit=200&cursor=${encodeURIComponent(cursor)}` : '?limit=200';
+        const res = await fetch(getApiUrl(`/conversations${query}`));
+        const data = await res.json();
+        // Ensure data is always an array
+        if (!Array.isArray(data)) break;
+        conversationsArray = conversationsArray.concat(data);
+        cursor = res.headers.get('X-Next-Cursor');
+      } while (cursor);
       setConversations(conversationsArray);
 
       // Only set to first conversation if we don't have a selection AND we're not preserving
@@ -402,94 +410,132 @@ function AppContent() {
       // Add an empty assistant message that we'll fill with streaming content
       setChatHistory(prev => [...prev, { role: 'assistant', content: '' }]);
       
-      // Use the streaming endpoint
-      const response = await fetch(getApiUrl(`/conversations/${selectedConversationId}/stream`), {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: userMessage.trim() }),
-      });
+      // Use the streaming endpoint. Every event carries an id; after a network
+      // drop we reconnect with Last-Event-ID and the server replays what we missed
+      const streamUrl = getApiUrl(`/conversations/${selectedConversationId}/stream`);
+      let lastEventId = null;
+      let reconnects = 0;
+      let admissionRetries = 0;
+      let streamFinished = false;
+      let fullResponse = ''; // Track the complete response
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+      while (!streamFinished) {
+        const response = await fetch(streamUrl, {
+          method: 'POST',
+          headers: lastEventId
+            ? { 'Content-Type': 'application/json', 'Last-Event-ID': lastEventId }
+            : { 'Content-Type': 'application/json' },
+          body: JSON.stringify(lastEventId ? {} : { message: newMsg.content }),
+        });
+
+        if (response.status === 429 && !lastEventId && admissionRetries < 2) {
+          // Server is shedding load: wait as long as it asks (capped), then try again
+          const retryAfter = Math.min(parseInt(response.headers.get('Retry-After'), 10) || 1, 10);
+          admissionRetries += 1;
+          await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+          continue;
+        }
 
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
-      let buffer = '';
-      let fullResponse = ''; // Track the complete response
+        if (response.status === 404 && lastEventId) {
+          // The server no longer buffers this stream (expired or another worker):
+          // send the message again as a fresh request and start the answer over
+          lastEventId = null;
+          fullResponse = '';
+          setChatHistory(prev => {
+            const newHistory = [...prev];
+            const lastMessage = newHistory[newHistory.length - 1];
+            if (lastMessage && lastMessage.role === 'assistant') {
+              lastMessage.content = '';
+            }
+            return newHistory;
+          });
+          continue;
+        }
 
-      while (true) {
-        // Check if user wants to stop the response
-        if (shouldStopResponseRef.current) {
-          console.log('User stopped the response');
-          reader.cancel(); // Cancel the stream
-          break;
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const { done, value } = await reader.read();
-        if (done) break;
-
-        buffer += decoder.decode(value, { stream: true });
-        const lines = buffer.split('\n');
-        buffer = lines.pop() || ''; // Keep incomplete line in buffer
-
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
-            try {
-              const data = JSON.parse(line.slice(6));
-              
-              if (data.chunk) {
-                // Check if this chunk contains the normalized content marker
-                if (data.chunk.includes('<!-- NORMALIZED_CONTENT_START -->')) {
-                  // Extract the normalized content
-                  const startMarker = '<!-- NORMALIZED_CONTENT_START -->';
-                  const endMarker = '<!-- NORMALIZED_CONTENT_END -->';
-                  const startIndex = data.chunk.indexOf(startMarker) + startMarker.length;
-                  const endIndex = data.chunk.indexOf(endMarker);
-                  const normalizedContent = data.chunk.substring(startIndex, endIndex).trim();
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        try {
+          while (true) {
+            // Check if user wants to stop the response
+            if (shouldStopResponseRef.current) {
+              console.log('User stopped the response');
+              reader.cancel(); // Cancel the stream
+              if (lastEventId) {
+                // Stop generation on the server too, instead of waiting for a reconnect
+                const streamId = lastEventId.split(':')[0];
+                fetch(getApiUrl(`/conversations/${selectedConversationId}/streams/${streamId}`), { method: 'DELETE' })
+                  .catch(err => console.error('Failed to cancel stream:', err));
+              }
+              streamFinished = true;
+              break;
+            }
+
+            const { done, value } = await reader.read();
+            if (done) {
+              // A clean close without an end event still counts as finished
+              streamFinished = true;
+              break;
+            }
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop() || ''; // Keep incomplete line in buffer
+
+            for (const line of lines) {
+              if (line.startsWith('id: ')) {
+                lastEventId = line.slice(4).trim();
+              } else if (line.startsWith('data: ')) {
+                try {
+                  const data = JSON.parse(line.slice(6));
                   
-                  // Replace the assistant message with the normalized content
-                  setChatHistory(prev => {
-                    const newHistory = [...prev];
-                    const lastMessage = newHistory[newHistory.length - 1];
-                    if (lastMessage && lastMessage.role === 'assistant') {
-                      lastMessage.content = normalizedContent;
-                    }
-                    return newHistory;
-                  });
-                } else {
-                  // Build the complete response incrementally
-                  fullResponse += data.chunk;
+                  if (data.chunk) {
+                    // Build the complete response incrementally
+                    fullResponse += data.chunk;
+                    
+                    // Update the assistant message with the complete response so far
+                    setChatHistory(prev => {
+                      const newHistory = [...prev];
+                      const lastMessage = newHistory[newHistory.length - 1];
+                      if (lastMessage && lastMessage.role === 'assistant') {
+                        lastMessage.content = fullResponse;
+                      }
+                      return newHistory;
+                    });
+                    
+                    // Auto-scroll as content streams in
+                    setTimeout(() => {
+                      setShouldAutoScroll(true);
+                    }, 0);
+                  }
                   
-                  // Update the assistant message with the complete response so far
-                  setChatHistory(prev => {
-                    const newHistory = [...prev];
-                    const lastMessage = newHistory[newHistory.length - 1];
-                    if (lastMessage && lastMessage.role === 'assistant') {
-                      lastMessage.content = fullResponse;
-                    }
-                    return newHistory;
-                  });
+                  if (data.end) {
+                    // Streaming is complete
+                    streamFinished = true;
+                  }
+                  
+                  if (data.error) {
+                    throw new Error(data.error);
+                  }
+                } catch (parseError) {
+                  console.error('Error parsing SSE data:', parseError);
                 }
-                
-                // Auto-scroll as content streams in
-                setTimeout(() => {
-                  setShouldAutoScroll(true);
-                }, 0);
-              }
-              
-              if (data.end) {
-                // Streaming is complete
-                break;
-              }
-              
-              if (data.error) {
-                throw new Error(data.error);
               }
-            } catch (parseError) {
-              console.error('Error parsing SSE data:', parseError);
             }
           }
+        } catch (networkError) {
+          // Connection dropped mid-answer: resume from the last event we saw
+          if (!lastEventId || reconnects >= 3) {
+            throw networkError;
+          }
+          reconnects += 1;
+          console.warn(`Stream interrupted, resuming (attempt ${reconnects})`, networkError);
+          await new Promise(resolve => setTimeout(resolve, 1000 * reconnects));
         }
       }
       
@@ -601,11 +647,11 @@ function AppContent() {
 
   const handleAutoRename = async (id) => {
     try {
-      const res = await fetch(getApiUrl(`/conversations/${id}/auto_rename`), {
+      await fetch(getApiUrl(`/conversations/${id}/auto_rename`), {
         method: 'POST',
       });
-      const data = await res.json();
-      await refreshConversations(true); // Preserve selection when auto-renaming
+      // Titles are generated in the background; pick up the new one shortly
+      setTimeout(() => refreshConversations(true), 5000); // Preserve selection when auto-renaming
     } catch (err) {
       console.error("Failed to auto rename conversation:", err);
     }
@@ -27,6 +27,92 @@ class Config:
     OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '1000'))
     OPENAI_TEMPERATURE = float(os.getenv('OPENAI_TEMPERATURE', '0.3'))
     
+    # LLM provider: "openai", or "simulated" for the offline simulator used in load tests
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai').lower()
+    SIM_TOKENS_PER_SECOND = float(os.getenv('SIM_TOKENS_PER_SECOND', '50'))
+    SIM_TIME_TO_FIRST_TOKEN = float(os.getenv('SIM_TIME_TO_FIRST_TOKEN', '0.3'))  # seconds
+    SIM_ERROR_RATE = float(os.getenv('SIM_ERROR_RATE', '0'))  # Fraction of calls that fail
+    SIM_RESPONSE_TOKENS = int(os.getenv('SIM_RESPONSE_TOKENS', '200'))  # Reply length, capped by max_tokens
+    SIM_SEED = int(os.getenv('SIM_SEED')) if os.getenv('SIM_SEED') else None  # Seed for reproducible error injection
+    
+    # Model routing configuration
+    ROUTER_FAST_MODEL = os.getenv('ROUTER_FAST_MODEL', 'gpt-3.5-turbo')  # Titles and other short utility calls
+    ROUTER_LARGE_CONTEXT_MODEL = os.getenv('ROUTER_LARGE_CONTEXT_MODEL', 'gpt-4o-mini')  # Only for prompts the preferred model cannot fit
+    TITLE_MAX_TOKENS = int(os.getenv('TITLE_MAX_TOKENS', '20'))  # Per conversation in a titling batch
+    DOCUMENT_MAX_TOKENS = int(os.getenv('DOCUMENT_MAX_TOKENS', '1000'))
+    
+    # Chat calculator tools (function calling, run in-process)
+    CHAT_TOOLS_ENABLED = os.getenv('CHAT_TOOLS_ENABLED', 'True').lower() == 'true'
+    CHAT_TOOL_MAX_ROUNDS = int(os.getenv('CHAT_TOOL_MAX_ROUNDS', '3'))  # Tool call/result round trips per reply
+    
+    # OpenAI HTTP client configuration (shared keep-alive connection pool)
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+    OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '60'))
+    OPENAI_POOL_TIMEOUT = float(os.getenv('OPENAI_POOL_TIMEOUT', '10'))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '10'))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '30'))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+    
+    # First-turn response cache configuration
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '3600'))  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 10 * 1024 * 1024))  # 10MB
+    
+    # Rolling conversation summary configuration
+    SUMMARY_TRIGGER_TOKENS = int(os.getenv('SUMMARY_TRIGGER_TOKENS', '3000'))  # Un-summarized tail size that triggers a summary
+    SUMMARY_KEEP_RECENT_TOKENS = int(os.getenv('SUMMARY_KEEP_RECENT_TOKENS', '1500'))  # Recent tail always sent verbatim
+    SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', '400'))
+    
+    # Recall of earlier messages related to the current question (BM25)
+    RETRIEVAL_ENABLED = os.getenv('RETRIEVAL_ENABLED', 'True').lower() == 'true'
+    RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '4'))  # Candidate messages ranked per prompt
+    RETRIEVAL_MAX_TOKENS = int(os.getenv('RETRIEVAL_MAX_TOKENS', '600'))  # Prompt budget reserved for recalled messages
+    RETRIEVAL_MAX_CONVERSATIONS = int(os.getenv('RETRIEVAL_MAX_CONVERSATIONS', '1000'))  # Indexes kept in memory per worker
+    
+    # Conversation list paging
+    CONVERSATIONS_PAGE_SIZE = int(os.getenv('CONVERSATIONS_PAGE_SIZE', '50'))
+    CONVERSATIONS_MAX_PAGE_SIZE = int(os.getenv('CONVERSATIONS_MAX_PAGE_SIZE', '200'))
+    
+    # Message history paging
+    MESSAGES_PAGE_SIZE = int(os.getenv('MESSAGES_PAGE_SIZE', '50'))
+    MESSAGES_MAX_PAGE_SIZE = int(os.getenv('MESSAGES_MAX_PAGE_SIZE', '500'))
+    
+    # Full-text search configuration
+    SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '20'))  # Message hits per page
+    SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', '100'))
+    SEARCH_MAX_QUERY_LENGTH = int(os.getenv('SEARCH_MAX_QUERY_LENGTH', '200'))
+    SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', '2000'))  # Most recent matches ranked per query
+    SEARCH_TITLE_LIMIT = int(os.getenv('SEARCH_TITLE_LIMIT', '5'))  # Conversation title hits on the first page
+
+    # Resumable stream configuration
+    STREAM_BUFFER_MAX_STREAMS = int(os.getenv('STREAM_BUFFER_MAX_STREAMS', '500'))  # Buffered streams per worker
+    STREAM_BUFFER_MAX_EVENTS = int(os.getenv('STREAM_BUFFER_MAX_EVENTS', '2000'))  # Ring size per stream
+    STREAM_BUFFER_TTL_SECONDS = float(os.getenv('STREAM_BUFFER_TTL_SECONDS', '300'))  # Kept this long after finishing
+    STREAM_RESUME_GRACE_SECONDS = float(os.getenv('STREAM_RESUME_GRACE_SECONDS', '15'))  # Detached time before generation stops
+    STREAM_KEEPALIVE_SECONDS = float(os.getenv('STREAM_KEEPALIVE_SECONDS', '15'))
+    STREAM_FLUSH_INTERVAL_MS = float(os.getenv('STREAM_FLUSH_INTERVAL_MS', '30'))  # Max time deltas wait to share a frame, 0 for one frame per delta
+    STREAM_FRAME_MAX_BYTES = int(os.getenv('STREAM_FRAME_MAX_BYTES', '512'))  # A frame is sent as soon as this much text is pending
+    
+    # Chat admission control (per worker process)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_CLIENT_PER_MINUTE = float(os.getenv('RATE_LIMIT_CLIENT_PER_MINUTE', '20'))  # Sustained chat requests per client
+    RATE_LIMIT_CLIENT_BURST = float(os.getenv('RATE_LIMIT_CLIENT_BURST', '5'))  # Requests a client may send back to back
+    RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv('RATE_LIMIT_GLOBAL_PER_SECOND', '10'))  # Sustained chat requests for all clients
+    RATE_LIMIT_GLOBAL_BURST = float(os.getenv('RATE_LIMIT_GLOBAL_BURST', '30'))
+    RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', '10000'))  # Client buckets kept in memory
+    RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'  # Identify clients by X-Forwarded-For
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '1'))  # Proxies that append to X-Forwarded-For
+    CHAT_MAX_IN_FLIGHT = int(os.getenv('CHAT_MAX_IN_FLIGHT', '16'))  # Concurrent model calls before requests are refused
+    CHAT_BUSY_RETRY_AFTER_SECONDS = float(os.getenv('CHAT_BUSY_RETRY_AFTER_SECONDS', '2'))  # Retry-After when every slot is taken
+    
+    # Background conversation titling configuration
+    TITLE_DEBOUNCE_SECONDS = float(os.getenv('TITLE_DEBOUNCE_SECONDS', '2'))  # Quiet period before a conversation is titled
+    TITLE_MAX_DELAY_SECONDS = float(os.getenv('TITLE_MAX_DELAY_SECONDS', '10'))  # Upper bound on debouncing
+    TITLE_BATCH_SIZE = int(os.getenv('TITLE_BATCH_SIZE', '10'))  # Conversations titled per completion
+    TITLE_CONTEXT_TOKENS = int(os.getenv('TITLE_CONTEXT_TOKENS', '500'))  # Leading tokens of a conversation sent for its title
+    
     # File upload configuration
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
@@ -49,7 +135,7 @@ class Config:
         """Validate that all required configuration is present"""
         missing_configs = []
         
-        if not cls.OPENAI_API_KEY:
+        if not cls.OPENAI_API_KEY and cls.LLM_PROVIDER != "simulated":
             missing_configs.append("OPENAI_API_KEY")
         
         if not cls.DB_USER or not cls.DB_PASSWORD:
@@ -69,8 +155,13 @@ class ProductionConfig(Config):
     
     # Override with production-specific settings
     SECRET_KEY = os.getenv('SECRET_KEY')
-    if not SECRET_KEY:
-        raise ValueError("SECRET_KEY must be set in production")
+    
+    @classmethod
+    def validate_config(cls):
+        """Validate configuration, requiring an explicit SECRET_KEY in production"""
+        if not cls.SECRET_KEY:
+            raise ValueError("SECRET_KEY must be set in production")
+        return super().validate_config()
 
 class TestingConfig(Config):
     """Testing configuration"""
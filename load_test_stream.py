@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Load generator for the streaming chat endpoint.
+
+Opens many concurrent SSE connections to
+``POST /api/v1/conversations/<id>/stream``, parses the ``data:`` frames and
+measures, per stream, the time to the first chunk, the chunk rate and the total
+duration. Concurrency is raised level by level. Each level's p50/p95/p99 is
+written to a JSON report, so runs against different gunicorn worker
+configurations can be compared.
+
+Run it against a server using the offline LLM simulator so no OpenAI quota is
+spent, e.g.::
+
+    LLM_PROVIDER=simulated RATE_LIMIT_ENABLED=false RESPONSE_CACHE_ENABLED=false gunicorn -w 4 -k gthread --threads 50 "app.main:create_app()"
+    python load_test_stream.py --levels 10,50,100,200 --label "4x50 gthread" --output report.json
+
+or let the script start the app's own threaded test server in-process::
+
+    python load_test_stream.py --serve --levels 10,50,100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+DEFAULT_BASE_URL = "http://127.0.0.1:5000/api/v1"
+DEFAULT_MESSAGE = "How should I split my savings between an emergency fund and index funds?"
+
+class SSEParser:
+    """Incremental parser turning SSE lines into the data payload of each event"""
+
+    def __init__(self):
+        self._data: List[str] = []
+
+    def feed_line(self, line: str) -> Optional[str]:
+        """Feed one line (without its newline); returns the event data when a frame ends"""
+        line = line.rstrip("\r")
+        if not line:
+            if not self._data:
+                return None
+            data = "\n".join(self._data)
+            self._data = []
+            return data
+        if line.startswith(":"):
+            # Comment / keep-alive
+            return None
+        name, _, value = line.partition(":")
+        if name == "data":
+            self._data.append(value[1:] if value.startswith(" ") else value)
+        return None
+
+@dataclass
+class StreamResult:
+    """Measurements of one SSE stream"""
+    ok: bool = False
+    status: Optional[int] = None
+    error: Optional[str] = None
+    time_to_first_chunk: Optional[float] = None
+    duration: float = 0.0
+    chunks: int = 0
+    chunk_bytes: int = 0
+
+    @property
+    def chunks_per_second(self) -> Optional[float]:
+        if self.time_to_first_chunk is None or self.chunks < 2:
+            return None
+        streaming_time = self.duration - self.time_to_first_chunk
+        return (self.chunks - 1) / streaming_time if streaming_time > 0 else None
+
+@dataclass
+class LevelReport:
+    """Aggregated results for one concurrency level"""
+    concurrency: int
+    streams: int
+    succeeded: int
+    failed: int
+    wall_time: float
+    total_chunks: int
+    aggregate_chunks_per_second: float
+    time_to_first_chunk: Dict[str, Optional[float]] = field(default_factory=dict)
+    chunks_per_second: Dict[str, Optional[float]] = field(default_factory=dict)
+    duration: Dict[str, Optional[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile (pct in 0-100) of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def summarize(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Return min/mean/p50/p95/p99/max of a list of values, rounded to microseconds"""
+    def rounded(value):
+        return None if value is None else round(value, 6)
+    return {
+        "min": rounded(min(values)) if values else None,
+        "mean": rounded(sum(values) / len(values)) if values else None,
+        "p50": rounded(percentile(values, 50)),
+        "p95": rounded(percentile(values, 95)),
+        "p99": rounded(percentile(values, 99)),
+        "max": rounded(max(values)) if values else None,
+    }
+
+def build_level_report(concurrency: int, results: List[StreamResult], wall_time: float) -> LevelReport:
+    """Aggregate the stream results of one level"""
+    succeeded = [r for r in results if r.ok]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if not result.ok:
+            errors[result.error or "unknown"] = errors.get(result.error or "unknown", 0) + 1
+    total_chunks = sum(r.chunks for r in results)
+    return LevelReport(
+        concurrency=concurrency,
+        streams=len(results),
+        succeeded=len(succeeded),
+        failed=len(results) - len(succeeded),
+        wall_time=round(wall_time, 6),
+        total_chunks=total_chunks,
+        aggregate_chunks_per_second=round(total_chunks / wall_time, 3) if wall_time > 0 else 0.0,
+        time_to_first_chunk=summarize([r.time_to_first_chunk for r in succeeded if r.time_to_first_chunk is not None]),
+        chunks_per_second=summarize([r.chunks_per_second for r in succeeded if r.chunks_per_second is not None]),
+        duration=summarize([r.duration for r in succeeded]),
+        errors=errors,
+    )
+
+async def run_stream(client: httpx.AsyncClient, base_url: str, conversation_id: int, message: str) -> StreamResult:
+    """Send one streaming message and time its SSE frames"""
+    result = StreamResult()
+    parser = SSEParser()
+    start = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST",
+            f"{base_url}/conversations/{conversation_id}/stream",
+            json={"message": message},
+            headers={"Accept": "text/event-stream"},
+        ) as response:
+            result.status = response.status_code
+            if response.status_code != 200:
+                result.error = f"HTTP {response.status_code}"
+                return result
+            async for line in response.aiter_lines():
+                data = parser.feed_line(line)
+                if data is None:
+                    continue
+                event = json.loads(data)
+                if "chunk" in event:
+                    if result.time_to_first_chunk is None:
+                        result.time_to_first_chunk = time.perf_counter() - start
+                    result.chunks += 1
+                    result.chunk_bytes += len(event["chunk"].encode("utf-8"))
+                elif event.get("end"):
+                    result.ok = True
+                elif "error" in event:
+                    result.error = f"stream error: {event['error']}"
+                    break
+            if not result.ok and result.error is None:
+                result.error = "stream closed without end event"
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+    except ValueError as e:
+        result.error = f"bad frame: {e}"
+    finally:
+        result.duration = time.perf_counter() - start
+    return result
+
+async def create_conversations(client: httpx.AsyncClient, base_url: str, count: int) -> List[int]:
+    """Create one conversation per stream so streams do not contend on a conversation row"""
+    async def create(index: int) -> int:
+        response = await client.post(f"{base_url}/conversations", json={"title": f"Load test {index}"})
+        response.raise_for_status()
+        return response.json()["id"]
+    return list(await asyncio.gather(*(create(i) for i in range(count))))
+
+async def run_level(base_url: str, concurrency: int, streams: int, message: str, timeout: float) -> LevelReport:
+    """Run `streams` streams with at most `concurrency` open at once"""
+    limits = httpx.Limits(max_connections=concurrency + 10, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(timeout), limits=limits) as client:
+        conversation_ids = await create_conversations(client, base_url, streams)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(conversation_id: int) -> StreamResult:
+            async with semaphore:
+                return await run_stream(client, base_url, conversation_id, message)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(cid) for cid in conversation_ids))
+        wall_time = time.perf_counter() - start
+    return build_level_report(concurrency, list(results), wall_time)
+
+def start_local_server(port: int) -> str:
+    """Start the app's threaded development server in-process with the LLM simulator"""
+    os.environ.setdefault("LLM_PROVIDER", "simulated")
+    # Every stream comes from this one address; admission control would turn most of them into 429s
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    # Every stream sends the same first message; cached replays would hide the streaming path
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from werkzeug.serving import make_server
+    from app.main import create_app
+
+    server = make_server("127.0.0.1", port, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/api/v1"
+
+def parse_levels(value: str) -> List[int]:
+    levels = [int(part) for part in value.split(",") if part.strip()]
+    if not levels or any(level < 1 for level in levels):
+        raise argparse.ArgumentTypeError("levels must be positive integers, e.g. 10,50,100")
+    return levels
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the SSE chat stream endpoint")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="API root, e.g. http://host:5000/api/v1")
+    parser.add_argument("--serve", action="store_true", help="Start the app's test server in-process (LLM_PROVIDER=simulated, RATE_LIMIT_ENABLED=false, RESPONSE_CACHE_ENABLED=false)")
+    parser.add_argument("--port", type=int, default=0, help="Port for --serve (default: any free port)")
+    parser.add_argument("--levels", type=parse_levels, default=[10, 50, 100, 200], help="Comma-separated concurrency levels")
+    parser.add_argument("--streams-per-level", type=int, default=0, help="Streams per level (default: 2x the concurrency)")
+    parser.add_argument("--message", default=DEFAULT_MESSAGE, help="User message sent on every stream")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--label", default="", help="Free-form label stored in the report (e.g. the gunicorn config)")
+    parser.add_argument("--output", default="-", help="Report path, or - for stdout")
+    args = parser.parse_args(argv)
+
+    base_url = start_local_server(args.port) if args.serve else args.base_url.rstrip("/")
+
+    levels = []
+    for concurrency in args.levels:
+        streams = args.streams_per_level or concurrency * 2
+        print(f"Running {streams} streams at concurrency {concurrency}...", file=sys.stderr)
+        level = asyncio.run(run_level(base_url, concurrency, streams, args.message, args.timeout))
+        print(
+            f"  ok={level.succeeded} failed={level.failed} "
+            f"ttfc p50={level.time_to_first_chunk['p50']} p99={level.time_to_first_chunk['p99']} "
+            f"chunks/s={level.aggregate_chunks_per_second}",
+            file=sys.stderr,
+        )
+        levels.append(asdict(level))
+
+    report = {
+        "label": args.label,
+        "target": base_url,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "message_chars": len(args.message),
+        "levels": levels,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    return 0 if all(level["failed"] == 0 for level in levels) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Recompute every conversation's message_count and last_message_at from messages.
+
+The chat service keeps these counters current as it stores messages; run
+this after importing or editing messages any other way, or if the counters
+are suspected to have drifted. Safe to run while the app is serving.
+
+    python repair_conversation_counters.py --batch-size 1000
+"""
+
+import argparse
+import json
+import sys
+from typing import Optional, Sequence
+
+from app.services.conversation_counters import REPAIR_BATCH_SIZE, repair_conversation_counters
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute denormalized conversation counters")
+    parser.add_argument("--batch-size", type=int, default=REPAIR_BATCH_SIZE, help="Conversation ids per transaction")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(repair_conversation_counters(args.batch_size)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
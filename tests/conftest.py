@@ -16,6 +16,7 @@ from app.main import create_app
 from app.db import SessionLocal, engine
 from app.models_base import Base, Conversation, Message
 from app.utils.database import get_db_session
+from app.services.admission import chat_admission
 
 @pytest.fixture(scope="session")
 def app():
@@ -30,6 +31,9 @@ def app():
         'UPLOAD_FOLDER': test_upload_dir,
         'MAX_CONTENT_LENGTH': 16 * 1024 * 1024,  # 16MB
     })
+    # The suite sends bursts of chat requests from one test client; admission
+    # control has its own tests that patch in an enabled controller
+    chat_admission.enabled = False
     
     # Create test database tables
     with app.app_context():
@@ -96,11 +100,13 @@ def sample_messages(app, sample_conversation):
             messages = [
                 Message(
                     conversation_id=sample_conversation,
+                    seq=1,
                     role="user",
                     content="Hello, I need financial advice."
                 ),
                 Message(
                     conversation_id=sample_conversation,
+                    seq=2,
                     role="assistant",
                     content="Hello! I'd be happy to help you with financial advice. What specific questions do you have?"
                 )
@@ -127,9 +133,9 @@ def sample_messages(app, sample_conversation):
 @pytest.fixture
 def mock_openai():
     """Mock OpenAI API responses."""
-    with patch('app.services.chat.OpenAI') as mock_openai_class:
+    with patch('app.services.chat.get_openai_client') as mock_get_client:
         mock_client = MagicMock()
-        mock_openai_class.return_value = mock_client
+        mock_get_client.return_value = mock_client
         # Mock successful response
         mock_response = MagicMock()
         mock_response.choices = [MagicMock()]
@@ -35,6 +35,15 @@ class TestHealthEndpoints:
         assert data['status'] == 'ok'
         assert 'timestamp' in data
     
+    def test_metrics_endpoint(self, client):
+        """Test the metrics endpoint exposes response cache counters."""
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        
+        data = response.get_json()
+        assert 'hits' in data['response_cache']
+        assert 'misses' in data['response_cache']
+    
     def test_api_docs(self, client):
         """Test the API documentation endpoint."""
         response = client.get('/api')
@@ -100,6 +109,41 @@ class TestConversationEndpoints:
         assert 'tags' in conversation
         assert 'message_count' in conversation
     
+    def test_get_conversations_pages(self, client, sample_conversation, sample_messages):
+        """Test keyset pages of the conversation list with message counts."""
+        from app.services.conversation_counters import repair_conversation_counters
+        # Fixture messages bypass the chat service, so their counters need a repair
+        assert repair_conversation_counters()['repaired'] >= 1
+        newer = client.post('/api/v1/conversations', json={"title": "Newer Conversation"}).get_json()['id']
+        
+        first = client.get('/api/v1/conversations?limit=1')
+        assert_success_response(first)
+        assert [conv['id'] for conv in first.get_json()] == [newer]
+        assert first.get_json()[0]['message_count'] == 0
+        
+        cursor = first.headers['X-Next-Cursor']
+        second = client.get(f'/api/v1/conversations?limit=1&cursor={cursor}').get_json()
+        assert second[0]['id'] == sample_conversation
+        assert second[0]['message_count'] == 2
+        
+        assert_error_response(client.get('/api/v1/conversations?cursor=bogus'), 400)
+        assert_error_response(client.get('/api/v1/conversations?sort=title'), 400)
+        client.delete(f'/api/v1/conversations/{newer}')
+    
+    def test_sending_messages_updates_counters(self, client, sample_conversation, mock_openai):
+        """Test that a chat turn bumps the counters and moves the conversation up by activity."""
+        newer = client.post('/api/v1/conversations', json={"title": "Newer Conversation"}).get_json()['id']
+        
+        response = client.post(f'/api/v1/conversations/{sample_conversation}',
+                               json={"message": "How much should I save?"})
+        assert_success_response(response)
+        
+        by_activity = client.get('/api/v1/conversations?sort=activity&limit=2').get_json()
+        assert [conv['id'] for conv in by_activity] == [sample_conversation, newer]
+        assert by_activity[0]['message_count'] == 2
+        assert by_activity[0]['last_message_at'] is not None
+        client.delete(f'/api/v1/conversations/{newer}')
+    
     def test_get_conversation_by_id(self, client, sample_conversation, sample_messages):
         """Test getting a specific conversation by ID."""
         response = client.get(f'/api/v1/conversations/{sample_conversation}')
@@ -111,6 +155,79 @@ class TestConversationEndpoints:
         assert 'messages' in data
         assert isinstance(data['messages'], list)
     
+    def test_get_conversation_recent_messages(self, client, sample_conversation, sample_messages):
+        """Test that recent=N returns only the newest messages and a cursor for older ones."""
+        response = client.get(f'/api/v1/conversations/{sample_conversation}?recent=1')
+        assert_success_response(response)
+        
+        data = response.get_json()
+        assert [msg['seq'] for msg in data['messages']] == [2]
+        assert data['messages_before'] == 2
+    
+    def test_get_conversation_messages_pages(self, client, sample_conversation, sample_messages):
+        """Test paging backwards through message history."""
+        first = client.get(f'/api/v1/conversations/{sample_conversation}/messages?limit=1')
+        assert_success_response(first)
+        first = first.get_json()
+        assert [msg['role'] for msg in first['messages']] == ["assistant"]
+        
+        second = client.get(
+            f"/api/v1/conversations/{sample_conversation}/messages?limit=1&before={first['next_before']}"
+        ).get_json()
+        assert [msg['seq'] for msg in second['messages']] == [1]
+        assert second['next_before'] is None
+        
+        both = client.get(f'/api/v1/conversations/{sample_conversation}/messages').get_json()
+        assert [msg['seq'] for msg in both['messages']] == [1, 2]
+        
+        assert_error_response(client.get('/api/v1/conversations/99999/messages'), 404)
+        assert_error_response(client.get(f'/api/v1/conversations/{sample_conversation}/messages?before=x'), 400)
+    
+    def test_conditional_get_conversation(self, client, sample_conversation, sample_messages):
+        """Test that an unchanged conversation answers 304 and a rename changes its ETag."""
+        url = f'/api/v1/conversations/{sample_conversation}'
+        etag = client.get(url).headers['ETag']
+        
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+        
+        client.post(f'{url}/rename', json={"title": "Renamed"})
+        changed = client.get(url, headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.get_json()['title'] == "Renamed"
+    
+    def test_conditional_get_conversation_list(self, client, sample_conversation):
+        """Test that the list ETag follows the global change counter."""
+        etag = client.get('/api/v1/conversations').headers['ETag']
+        assert client.get('/api/v1/conversations', headers={'If-None-Match': etag}).status_code == 304
+        
+        created = client.post('/api/v1/conversations', json={"title": "Another"}).get_json()['id']
+        assert client.get('/api/v1/conversations', headers={'If-None-Match': etag}).status_code == 200
+        client.delete(f'/api/v1/conversations/{created}')
+    
+    def test_conversation_changes_since_cursor(self, client, sample_conversation, sample_messages, mock_openai):
+        """Test that polling returns only what changed after the sync cursor."""
+        full = client.get(f'/api/v1/conversations/{sample_conversation}').get_json()
+        assert [msg['seq'] for msg in full['messages']] == [1, 2]
+        cursor = full['sync_cursor']
+        url = f'/api/v1/conversations/{sample_conversation}/changes'
+        
+        unchanged = client.get(f'{url}?since={cursor}').get_json()
+        assert unchanged['messages'] == [] and unchanged['conversation'] is None
+        assert unchanged['cursor'] == cursor
+        
+        client.post(f'/api/v1/conversations/{sample_conversation}', json={"message": "How much should I save?"})
+        changes = client.get(f'{url}?since={cursor}').get_json()
+        assert [msg['seq'] for msg in changes['messages']] == [3, 4]
+        assert changes['conversation']['title'] == "Test Conversation"
+        
+        again = client.get(f"{url}?since={changes['cursor']}").get_json()
+        assert again['messages'] == [] and again['conversation'] is None
+        
+        assert_error_response(client.get(f'{url}?since=bogus'), 400)
+        assert_error_response(client.get('/api/v1/conversations/99999/changes'), 404)
+    
     def test_get_nonexistent_conversation(self, client):
         """Test getting a conversation that doesn't exist."""
         response = client.get('/api/v1/conversations/99999')
@@ -151,14 +268,62 @@ class TestConversationEndpoints:
         conversation_data = get_response.get_json()
         assert conversation_data['title'] == new_title
     
-    def test_auto_rename_conversation(self, client, sample_conversation, sample_messages, mock_openai):
-        """Test auto-renaming a conversation."""
-        response = client.post(f'/api/v1/conversations/{sample_conversation}/auto_rename',
-                             headers={'Content-Type': 'application/json'})
-        assert_success_response(response)
+    def test_auto_rename_conversation(self, client, sample_conversation, sample_messages):
+        """Test that auto-renaming is scheduled without waiting for the model."""
+        with patch('app.routes.conversations.title_worker') as mock_worker:
+            response = client.post(f'/api/v1/conversations/{sample_conversation}/auto_rename',
+                                 headers={'Content-Type': 'application/json'})
+        assert_success_response(response, 202)
         response_data = response.get_json()
         assert 'title' in response_data
-        assert 'message' in response_data
+        assert response_data['status'] == 'pending'
+        mock_worker.request.assert_called_once_with(sample_conversation)
+    
+    def test_stream_resumes_from_last_event_id(self, client, sample_conversation):
+        """Test that a reconnect replays missed events without a new generation."""
+        def fake_stream(message, conversation_id):
+            yield "Save "
+            yield "early."
+        
+        with patch('app.routes.conversations.get_chat_response_stream', side_effect=fake_stream) as mock_stream:
+            response = client.post(f'/api/v1/conversations/{sample_conversation}/stream',
+                                   json={"message": "How much should I save?"})
+            body = response.get_data(as_text=True)
+            first_id = next(line[4:] for line in body.splitlines() if line.startswith('id: '))
+            
+            resumed = client.post(f'/api/v1/conversations/{sample_conversation}/stream',
+                                  headers={'Last-Event-ID': first_id})
+            resumed_body = resumed.get_data(as_text=True)
+        
+        assert resumed.status_code == 200
+        assert '"chunk": "Save "' not in resumed_body
+        assert '"chunk": "early."' in resumed_body
+        assert '"end": true' in resumed_body
+        assert mock_stream.call_count == 1
+    
+    def test_stream_resume_unknown_id(self, client, sample_conversation):
+        """Test that resuming an unknown stream asks the client to resend."""
+        response = client.post(f'/api/v1/conversations/{sample_conversation}/stream',
+                               headers={'Last-Event-ID': 'missing:3'})
+        assert response.status_code == 404
+    
+    def test_chat_requests_over_the_limit_get_429(self, client, sample_conversation, mock_openai):
+        """Test that a client over its burst is refused fast with Retry-After."""
+        from app.services.admission import AdmissionController
+        admission = AdmissionController(client_rate=1 / 60, client_burst=1, global_rate=10, global_burst=10, max_in_flight=4)
+        
+        with patch('app.routes.conversations.chat_admission', admission):
+            allowed = client.post(f'/api/v1/conversations/{sample_conversation}',
+                                  json={"message": "How much should I save?"})
+            refused = client.post(f'/api/v1/conversations/{sample_conversation}/stream',
+                                  json={"message": "And for retirement?"})
+        
+        assert allowed.status_code == 200
+        assert refused.status_code == 429
+        assert refused.headers['Retry-After'] == '60'
+        assert refused.get_json()['error']['type'] == 'rate_limit_error'
+        assert mock_openai.chat.completions.create.call_count == 1
+        assert admission.stats()['in_flight'] == 0
     
     def test_update_conversation_tags(self, client, sample_conversation):
         """Test updating conversation tags."""
@@ -367,6 +532,42 @@ class TestDashboardEndpoints:
         assert isinstance(data['messages_by_month'], list)
         assert isinstance(data['popular_topics'], list)
 
+class TestSearchEndpoints:
+    """Test full-text search endpoints."""
+    
+    def test_search_messages(self, client, sample_conversation, sample_messages):
+        """Test that matching messages come back ranked with highlighted snippets."""
+        response = client.get('/api/v1/search?q=financial advice')
+        assert_success_response(response)
+        
+        data = response.get_json()
+        hits = [hit for hit in data['results'] if hit['conversation_id'] == sample_conversation]
+        assert len(hits) == 2
+        assert all('**' in hit['snippet'] for hit in hits)
+        assert hits[0]['conversation_title'] == "Test Conversation"
+        ranks = [hit['rank'] for hit in data['results']]
+        assert ranks == sorted(ranks, reverse=True)
+    
+    def test_search_pages_with_cursor(self, client, sample_conversation, sample_messages):
+        """Test that keyset pages do not repeat hits."""
+        first = client.get('/api/v1/search?q=financial&limit=1').get_json()
+        assert first['next_cursor']
+        
+        second = client.get(f"/api/v1/search?q=financial&limit=1&cursor={first['next_cursor']}").get_json()
+        assert second['results'][0]['message_id'] != first['results'][0]['message_id']
+        assert second['conversations'] == []
+    
+    def test_search_title(self, client, sample_conversation):
+        """Test that conversation titles are searched on the first page."""
+        data = client.get('/api/v1/search?q=test conversation').get_json()
+        assert sample_conversation in [conv['conversation_id'] for conv in data['conversations']]
+    
+    def test_search_invalid_requests(self, client):
+        """Test that a missing query or a bad cursor is rejected."""
+        assert_error_response(client.get('/api/v1/search'), 400)
+        assert_error_response(client.get('/api/v1/search?q=tax&cursor=not-a-cursor'), 400)
+        assert_error_response(client.get('/api/v1/search?q=tax&limit=0'), 400)
+
 class TestErrorHandling:
     """Test error handling across endpoints."""
     
@@ -350,6 +350,52 @@ class TestPerformanceIntegration:
         assert len(results) == 5
         assert all(status == 200 for status in results)
     
+    def test_concurrent_streams_exceed_pool_size(self, client):
+        """Test that concurrent chat streams are not limited by the DB pool size."""
+        import threading
+        from types import SimpleNamespace
+        from app.db import engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+        
+        stream_count = DB_POOL_SIZE + DB_MAX_OVERFLOW + 5
+        checked_out_while_streaming = []
+        
+        def slow_stream(*args, **kwargs):
+            for word in ["Save ", "early ", "and ", "often."]:
+                time.sleep(0.2)
+                checked_out_while_streaming.append(engine.pool.checkedout())
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))])
+        
+        response = client.post('/api/v1/conversations', json={"title": "Load test"})
+        conversation_id = response.get_json()['id']
+        
+        results = []
+        errors = []
+        
+        def open_stream():
+            try:
+                response = client.post(
+                    f'/api/v1/conversations/{conversation_id}/stream',
+                    json={"message": "How much should I save?"}
+                )
+                results.append(response.get_data(as_text=True))
+            except Exception as e:
+                errors.append(str(e))
+        
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = slow_stream
+        with patch('app.services.chat.get_openai_client', return_value=mock_client):
+            threads = [threading.Thread(target=open_stream) for _ in range(stream_count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        assert len(errors) == 0
+        assert len(results) == stream_count
+        assert all('"end": true' in body for body in results)
+        # Streaming threads did not pin connections, so the pool never filled up
+        assert max(checked_out_while_streaming) < DB_POOL_SIZE + DB_MAX_OVERFLOW
+    
     def test_large_data_handling(self, client):
         """Test handling of large data."""
         # Test with large JSON payload
@@ -0,0 +1,201 @@
+"""
+Test suite for math delimiter normalization.
+
+The cases below are the ones the old ad-hoc ``test_math_*`` scripts checked.
+The randomized tests compare the single-pass tokenizer against the previous
+multi-pass regex implementation, kept here as a reference.
+"""
+
+import random
+import re
+import time
+
+import pytest
+
+from app.services.math_format import convert_bracket_math_to_dollars, format_standalone_math_line
+
+def reference_convert_standalone_math_to_block(text):
+    """Previous line-by-line standalone formula conversion."""
+    lines = text.split('\n')
+    result_lines = []
+    for line in lines:
+        stripped = line.strip()
+        if (stripped.startswith('$') and stripped.endswith('$') and
+            stripped.count('$') == 2 and '$$' not in stripped):
+            result_lines.append(f"$${stripped[1:-1].strip()}$$")
+        elif (stripped.startswith('$$') and stripped.endswith('$$') and
+              stripped.count('$$') == 2):
+            result_lines.append(f"$${stripped[2:-2].strip()}$$")
+        elif (stripped.startswith('\\(') and stripped.endswith('\\)')):
+            result_lines.append(f"$${stripped[2:-2].strip()}$$")
+        elif (stripped.startswith('\\[') and stripped.endswith('\\]')):
+            result_lines.append(f"$${stripped[2:-2].strip()}$$")
+        else:
+            result_lines.append(line)
+    return '\n'.join(result_lines)
+
+def reference_convert_bracket_math_to_dollars(text):
+    """Previous multi-pass regex implementation."""
+    def replacer_block(match):
+        return f"$$\n{match.group(1).strip()}\n$$"
+
+    def replacer_inline(match):
+        return f"${match.group(1).strip()}$"
+
+    text = re.compile(r"^\s*\[(.*?)\]\s*$", re.DOTALL | re.MULTILINE).sub(replacer_block, text)
+
+    def manual_double_parens_replace(s):
+        result = ''
+        i = 0
+        while i < len(s):
+            if s[i:i+2] == '((':
+                start = i + 2
+                depth = 1
+                j = start
+                while j < len(s):
+                    if s[j:j+2] == '))' and depth == 1:
+                        match_str = s[start:j]
+                        if match_str and s[start-1] == '(':
+                            match_str = '(' + match_str
+                        result += f'${match_str}$'
+                        i = j + 2
+                        break
+                    elif s[j:j+2] == '((':
+                        depth += 1
+                        j += 2
+                    elif s[j:j+2] == '))' and depth > 1:
+                        depth -= 1
+                        j += 2
+                    else:
+                        j += 1
+                else:
+                    result += s[i:]
+                    break
+            else:
+                result += s[i]
+                i += 1
+        return result
+    text = manual_double_parens_replace(text)
+
+    text = re.sub(r"\\\((.*?)\\\)", r"$\1$", text)
+    text = re.sub(r"\\\[(.*?)\\\]", r"$$\1$$", text)
+    text = re.compile(r"(?<!\()\[(.*?)](?!\))").sub(replacer_inline, text)
+    text = re.sub(r"^\s*[-*+]\s*\(([A-Za-z_][A-Za-z0-9_]*)\)", r"* $\1$", text, flags=re.MULTILINE)
+    text = re.sub(r"=\s*\(([A-Za-z_][A-Za-z0-9_]*)\)", r"= $\1$", text)
+    return reference_convert_standalone_math_to_block(text)
+
+def random_formula(rng):
+    """Build a random formula from common financial math fragments."""
+    parts = ["x", "y^2", "S_0 N(d_1)", "e^{-rt}", "(1 + r)^n", "\\frac{a}{b}", "P", " + ", " - ", " = "]
+    return "".join(rng.choice(parts) for _ in range(rng.randint(1, 4)))
+
+def random_line(rng):
+    """Build a random response line mixing prose and math delimiters."""
+    formula = random_formula(rng)
+    kind = rng.random()
+    if kind < 0.1:
+        return ""
+    if kind < 0.2:
+        return rng.choice(["", "  "]) + f"[{formula}]" + rng.choice(["", " "])
+    if kind < 0.3:
+        return f"${formula}$"
+    if kind < 0.35:
+        return f"$${formula}$$"
+    if kind < 0.45:
+        return rng.choice(["- ", "* ", "+ "]) + "(B_x) is the bond price = (P)"
+    if kind < 0.5:
+        return f"\\({formula}\\)"
+    if kind < 0.55:
+        return rng.choice(["[", "]"])
+    segments = [
+        "The rate", "is applied", "monthly", f"\\({formula}\\)", f"\\[{formula}\\]", f"[{formula}]",
+        f"(({formula}))", f"${formula}$", f"$${formula}$$", "= (P)", "(see note)", "[link](http://x)", "f(x)",
+    ]
+    return " ".join(rng.choice(segments) for _ in range(rng.randint(1, 6)))
+
+class TestMathNormalization:
+    """Test math delimiter conversion."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("The formula [C = S_0 N(d_1) - Xe^{-rt} N(d_2)] is important.",
+         "The formula $C = S_0 N(d_1) - Xe^{-rt} N(d_2)$ is important."),
+        ("Here's the formula:\n[C = S_0 N(d_1) - Xe^{-rt} N(d_2)]\nThat's it.",
+         "Here's the formula:\n$$\nC = S_0 N(d_1) - Xe^{-rt} N(d_2)\n$$\nThat's it."),
+        ("The value \\(x + y\\) is calculated.",
+         "The value $x + y$ is calculated."),
+        ("The equation is:\n\\[E = mc^2\\]\nEinstein's famous formula.",
+         "The equation is:\n$$E = mc^2$$\nEinstein's famous formula."),
+        ("The result ((a + b)^2)) is expanded.",
+         "The result $(a + b)^2$ is expanded."),
+        ("* (B_x) represents the bond price\n* (P) is the principal",
+         "* $B_x$ represents the bond price\n* $P$ is the principal"),
+        ("The value = (S) represents stock price",
+         "The value = $S$ represents stock price"),
+        ("Formula [x^2 + y^2 = z^2] and \\(a + b\\) are both valid.",
+         "Formula $x^2 + y^2 = z^2$ and $a + b$ are both valid."),
+    ])
+    def test_delimiters_are_converted(self, text, expected):
+        """Test each supported delimiter style."""
+        assert convert_bracket_math_to_dollars(text) == expected
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Here's a formula:\n$C = S_0 N(d_1) - Xe^{-rt} N(d_2)$\nThat's it.",
+         "Here's a formula:\n$$C = S_0 N(d_1) - Xe^{-rt} N(d_2)$$\nThat's it."),
+        ("The formula $x + y = z$ is simple.",
+         "The formula $x + y = z$ is simple."),
+        ("First formula:\n$E = mc^2$\nSecond formula:\n$F = ma$\nDone.",
+         "First formula:\n$$E = mc^2$$\nSecond formula:\n$$F = ma$$\nDone."),
+        ("  $a^2 + b^2 = c^2$  ",
+         "$$a^2 + b^2 = c^2$$"),
+        ("Inline: $x + y$ and standalone:\n$z = x + y$\nEnd.",
+         "Inline: $x + y$ and standalone:\n$$z = x + y$$\nEnd."),
+    ])
+    def test_standalone_formulas_become_blocks(self, text, expected):
+        """Test that a line holding only one formula is centered as block math."""
+        assert convert_bracket_math_to_dollars(text) == expected
+
+    def test_standalone_line_rules(self):
+        """Test the per-line block math rule."""
+        assert format_standalone_math_line("  $$ x $$ ") == "$$x$$"
+        assert format_standalone_math_line("$a$ and $b$") == "$a$ and $b$"
+        assert format_standalone_math_line("  plain text ") == "  plain text "
+
+    def test_matches_reference_on_examples(self):
+        """Test parity with the previous implementation on a realistic response."""
+        text = (
+            "The monthly payment is:\n\n[M = P\\frac{r(1+r)^n}{(1+r)^n-1}]\n\nWhere:\n"
+            "- (M) is the payment\n- (P) is the principal\n"
+            "and \\(r\\) = (r_m) is the monthly rate, so ((1 + r)^n)) grows.\n$A = P(1 + r)^n$\n"
+        )
+        assert convert_bracket_math_to_dollars(text) == reference_convert_bracket_math_to_dollars(text)
+
+    def test_matches_reference_on_random_responses(self):
+        """Test parity with the previous implementation on generated responses."""
+        rng = random.Random(0)
+        for _ in range(2000):
+            text = "\n".join(random_line(rng) for _ in range(rng.randint(1, 8)))
+            assert convert_bracket_math_to_dollars(text) == reference_convert_bracket_math_to_dollars(text), text
+
+    @pytest.mark.performance
+    @pytest.mark.parametrize("unit", [
+        "The payment is \\(M = P\\frac{r(1+r)^n}{(1+r)^n-1}\\) where [r] is the rate.\n- (P) principal\n"
+        "[A = P(1 + r)^n]\n$x = y$\n((a + b)^2)) and = (S)\n\n",
+        "[unclosed bracket \n",
+        "\\( unclosed ",
+    ])
+    def test_scales_linearly(self, unit):
+        """Test that conversion time grows linearly on 100 KB+ inputs."""
+        def best_time(size):
+            text = (unit * (size // len(unit) + 1))[:size]
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                convert_bracket_math_to_dollars(text)
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        small = best_time(100 * 1024)
+        large = best_time(400 * 1024)
+
+        # 4x the input: linear is ~4x the time, quadratic would be ~16x
+        assert large < small * 8
@@ -0,0 +1,918 @@
+"""
+Test suite for chat service helpers.
+"""
+
+import json
+from datetime import datetime
+import threading
+import time
+import pytest
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.services.history import (
+    build_history_window,
+    count_message_tokens,
+    get_context_window,
+    REPLY_PRIMING_TOKENS,
+    TOKENS_PER_MESSAGE,
+)
+from app.services.chat import StreamingResponseNormalizer, build_message_payload, clean_ai_response, get_chat_response, get_chat_response_stream, normalize_ai_response
+from app.services.retrieval import ConversationIndex, RetrievalIndex, tokenize
+from app.services.search import decode_search_cursor
+from app.services.conversation_list import decode_conversation_cursor
+from app.services.message_pages import decode_sync_cursor
+from app.utils.pagination import encode_cursor, parse_limit
+from app.services.chat_tools import run_tool
+from app.services.response_cache import ResponseCache, iter_cached_chunks, make_cache_key
+from app.services.summaries import format_summary_prompt, select_messages_to_summarize
+from app.services.stream_metrics import StreamMetrics
+from app.services.stream_buffer import StreamBuffer, StreamRegistry, parse_event_id, produce, start_stream
+from app.services.admission import AdmissionController, get_client_id
+from app.utils.error_handlers import RateLimitError, ValidationError
+from app.services.model_router import CHAT, DOCUMENT, TITLE, route_request
+from app.utils.llm_simulator import SimulatedLLMClient
+from app.services.titling import TitleWorker, clean_title, get_leading_transcript, parse_titles
+from config import Config
+
+def make_message(role, content):
+    """Create a lightweight stand-in for a Message row."""
+    return SimpleNamespace(role=role, content=content)
+
+class TestHistoryWindow:
+    """Test token-budgeted history assembly."""
+
+    def test_context_window_prefix_lookup(self):
+        """Test that dated model snapshots resolve to their family."""
+        assert get_context_window("gpt-4-0613") == 8192
+        assert get_context_window("gpt-4o-mini-2024-07-18") == 128000
+        assert get_context_window("unknown-model") == 4096
+
+    def test_short_history_is_kept_whole(self):
+        """Test that a history within budget is sent unchanged."""
+        history = [
+            make_message("user", "How much should I save?"),
+            make_message("assistant", "Start with 15% of your income."),
+            make_message("user", "What about an emergency fund?"),
+        ]
+        window = build_history_window("You are an advisor.", history, "gpt-3.5-turbo", 1000)
+
+        assert window.dropped_messages == 0
+        assert window.dropped_tokens == 0
+        assert window.messages[0] == {"role": "system", "content": "You are an advisor."}
+        assert [m["content"] for m in window.messages[1:]] == [m.content for m in history]
+
+    def test_oldest_messages_are_dropped_first(self):
+        """Test that the newest turns that fit are kept."""
+        history = [make_message("user", f"message number {i} " * 20) for i in range(50)]
+        per_message = count_message_tokens(history[-1].content, "gpt-3.5-turbo")
+        system_tokens = count_message_tokens("system", "gpt-3.5-turbo") + REPLY_PRIMING_TOKENS
+        context_window = 100 + system_tokens + per_message * 5
+
+        window = build_history_window("system", history, "gpt-3.5-turbo", 100, context_window=context_window)
+
+        assert len(window.messages) == 1 + 5
+        assert window.messages[-1]["content"] == history[-1].content
+        assert window.dropped_messages == 45
+        assert window.dropped_tokens > 0
+        assert window.prompt_tokens <= window.budget
+
+    def test_newest_message_always_kept(self):
+        """Test that the current user turn is never dropped."""
+        history = [make_message("user", "word " * 500)]
+        window = build_history_window("system", history, "gpt-3.5-turbo", 100, context_window=200)
+
+        assert len(window.messages) == 2
+        assert window.dropped_messages == 0
+
+    def test_stored_token_counts_are_used(self):
+        """Test that a stored token_count is used instead of re-tokenizing."""
+        history = [SimpleNamespace(role="user", content="short", token_count=10000)]
+        history.append(SimpleNamespace(role="user", content="latest", token_count=None))
+
+        window = build_history_window("system", history, "gpt-3.5-turbo", 100, context_window=1000)
+
+        assert window.dropped_messages == 1
+        assert window.dropped_tokens == 10000 + TOKENS_PER_MESSAGE
+
+class TestRollingSummaries:
+    """Test summary checkpoint selection."""
+
+    def test_short_tail_is_not_summarized(self):
+        """Test that nothing is summarized below the trigger."""
+        tail = [SimpleNamespace(id=i, role="user", content="hi", token_count=10) for i in range(5)]
+        assert select_messages_to_summarize(tail, "gpt-3.5-turbo", trigger_tokens=1000, keep_recent_tokens=100) == []
+
+    def test_oldest_messages_are_summarized(self):
+        """Test that the newest messages stay verbatim once the trigger is passed."""
+        tail = [SimpleNamespace(id=i, role="user", content="hi", token_count=96) for i in range(10)]
+
+        selected = select_messages_to_summarize(tail, "gpt-3.5-turbo", trigger_tokens=500, keep_recent_tokens=300)
+
+        assert [msg.id for msg in selected] == [0, 1, 2, 3, 4, 5, 6]
+
+    def test_summary_prompt_includes_previous_summary(self):
+        """Test that the summary is advanced from the previous checkpoint."""
+        messages = [SimpleNamespace(role="user", content="My rate is 6.5%")]
+        prompt = format_summary_prompt("User is 35 and saving for a house.", messages)
+
+        assert "User is 35 and saving for a house." in prompt
+        assert "User: My rate is 6.5%" in prompt
+
+class TestResponseCache:
+    """Test the first-turn response cache."""
+
+    def test_normalized_prompts_share_a_key(self):
+        """Test that case, whitespace and trailing punctuation are ignored."""
+        key = make_cache_key("How much should I save for retirement?", "gpt-3.5-turbo", 0.7)
+        assert key == make_cache_key("  how much should I   save for retirement ", "gpt-3.5-turbo", 0.7)
+        assert key != make_cache_key("How much should I save for retirement?", "gpt-4", 0.7)
+        assert key != make_cache_key("How much should I save for retirement?", "gpt-3.5-turbo", 0.3)
+
+    def test_hits_and_misses_are_counted(self):
+        """Test hit/miss counters."""
+        cache = ResponseCache()
+        assert cache.get("key") is None
+        cache.set("key", "Save 15% of your income.")
+        assert cache.get("key") == "Save 15% of your income."
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test LRU eviction when the entry limit is reached."""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.stats()["evictions"] == 1
+
+    def test_memory_cap_is_enforced(self):
+        """Test that the cache stays within its byte budget."""
+        cache = ResponseCache(max_bytes=100)
+        for i in range(10):
+            cache.set(f"key{i}", "x" * 30)
+
+        assert cache.stats()["bytes"] <= 100
+
+    def test_entries_expire(self):
+        """Test TTL expiry."""
+        cache = ResponseCache(ttl_seconds=0)
+        cache.set("key", "value")
+
+        assert cache.get("key") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_cached_response_replays_as_stream(self):
+        """Test that replayed chunks reassemble the cached text."""
+        text = "Start with an emergency fund.\n1. Save 3-6 months of expenses\n"
+        chunks = list(iter_cached_chunks(text))
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == text
+
+BLACK_SCHOLES_CHUNKS = [
+    "The Black-Scholes formula for a European call option is:\n\n",
+    "$$C = S_0 N(d_1)",
+    " - Xe^{-rt} N(d_2)",
+    "$$\n\n",
+    "Where:\n",
+    "- $C$ = Price of the call option\n",
+    "- $r$ = Risk-free interest rate\n\n",
+    "\\[d_2 = d_1 - ",
+    "\\sigma \\sqrt{t}\\",
+    "]\n\n",
+    "Use \\(",
+    "d_1\\) to price",
+    " the option.",
+]
+
+def stream_chunks(chunks):
+    """Feed chunks through a normalizer and return what it yields."""
+    normalizer = StreamingResponseNormalizer()
+    output = [normalizer.feed(chunk) for chunk in chunks]
+    output.append(normalizer.finish())
+    return [part for part in output if part]
+
+class TestStreamingNormalizer:
+    """Test chunk-at-a-time response post-processing."""
+
+    def test_streamed_text_matches_stored_text(self):
+        """Test that the streamed chunks reassemble the normalized full response."""
+        streamed = "".join(stream_chunks(BLACK_SCHOLES_CHUNKS))
+
+        assert streamed == normalize_ai_response("".join(BLACK_SCHOLES_CHUNKS))
+        assert "$$d_2 = d_1 - \\sigma \\sqrt{t}$$" in streamed
+        assert "Use $d_1$ to price the option." in streamed
+
+    def test_chunk_boundaries_do_not_change_output(self):
+        """Test that every split of the text produces the same output."""
+        text = "".join(BLACK_SCHOLES_CHUNKS)
+        expected = normalize_ai_response(text)
+
+        for size in (1, 2, 3, 7):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            assert "".join(stream_chunks(chunks)) == expected
+
+    def test_math_blocks_are_never_split(self):
+        """Test that a block is released in one piece once it closes."""
+        parts = stream_chunks(BLACK_SCHOLES_CHUNKS)
+
+        assert any("$$C = S_0 N(d_1) - Xe^{-rt} N(d_2)$$" in part for part in parts)
+        assert any("$$d_2 = d_1 - \\sigma \\sqrt{t}$$" in part for part in parts)
+
+    def test_plain_text_streams_without_waiting_for_newlines(self):
+        """Test that ordinary text is released as soon as it arrives."""
+        normalizer = StreamingResponseNormalizer()
+
+        assert normalizer.feed("You should") == "You should"
+        assert normalizer.feed(" save more ") == " save more"
+        assert normalizer.feed("each month.") == " each month."
+
+    def test_newline_cleanup_matches_clean_ai_response(self):
+        """Test that text without math is cleaned like clean_ai_response."""
+        text = "Budget tips:\n\n1. Track spending\n2. Cut costs\nthen review.\n\nNote: be consistent\n**Summary**\nSave early."
+
+        assert "".join(stream_chunks(list(text))) == clean_ai_response(text)
+
+    def test_unterminated_block_is_flushed(self):
+        """Test that an unclosed block is released unchanged at the end."""
+        assert "".join(stream_chunks(["Costs \\[ 5 ", "and more"])) == "Costs \\[ 5 and more"
+
+class TestTitleWorker:
+    """Test background conversation titling."""
+
+    def test_repeated_requests_are_debounced(self):
+        """Test that a burst of requests leaves one pending entry."""
+        worker = TitleWorker(debounce_seconds=60, max_delay_seconds=120)
+        try:
+            for _ in range(5):
+                worker.request(7)
+            worker.request(8)
+
+            assert worker.pending_count() == 2
+            assert worker.take_due() == []
+            assert sorted(worker.take_due(now=time.monotonic() + 61)) == [7, 8]
+            assert worker.pending_count() == 0
+        finally:
+            worker.stop(timeout=1)
+
+    def test_debounce_is_capped_by_max_delay(self):
+        """Test that continuous requests cannot postpone a title forever."""
+        worker = TitleWorker(debounce_seconds=60, max_delay_seconds=0)
+        try:
+            worker.request(7)
+            worker.request(7)
+            assert worker.take_due(now=time.monotonic()) == [7]
+        finally:
+            worker.stop(timeout=1)
+
+    def test_only_leading_tokens_are_read(self):
+        """Test that the transcript stops after the token budget."""
+        messages = [SimpleNamespace(role="user", content="word " * 400, token_count=400) for _ in range(5)]
+        transcript = get_leading_transcript(messages, "gpt-3.5-turbo", max_tokens=500)
+
+        first, second = transcript.split("\n")
+        assert len(second) < len(first) / 2
+
+    def test_titles_are_parsed_per_conversation(self):
+        """Test parsing of the batched JSON reply."""
+        content = 'Here you go: {"1": "\\"Retirement Savings Plan\\"", "2": "", "3": "Paying Off Student Loans Faster Than Planned"}'
+        titles = parse_titles(content, [1, 2, 3])
+
+        assert titles == {1: "Retirement Savings Plan", 3: "Paying Off Student Loans Faster Than"}
+        assert parse_titles("not json", [1]) == {}
+        assert clean_title("  'Budget Basics'  ") == "Budget Basics"
+
+    def test_pending_conversations_share_one_completion(self):
+        """Test that a batch is titled with a single model call and one write."""
+        conversations = {i: SimpleNamespace(id=i, title="New Conversation") for i in (1, 2, 3)}
+        session = MagicMock()
+        session.get.side_effect = lambda model, conversation_id: conversations[conversation_id]
+        query = session.query.return_value.filter.return_value.order_by.return_value.limit.return_value
+        query.all.return_value = [SimpleNamespace(role="user", content="How do I budget?", token_count=5)]
+
+        @contextmanager
+        def fake_session():
+            yield session
+
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices = [
+            SimpleNamespace(message=SimpleNamespace(content=json.dumps({"1": "Budget Basics", "2": "Emergency Fund"})))
+        ]
+
+        calls = []
+        with patch('app.services.titling.get_db_session', fake_session), \
+             patch('app.services.titling.get_openai_client', return_value=client), \
+             patch('app.services.titling.bump_conversation_version', side_effect=lambda s, cid: calls.append(cid)), \
+             patch('app.services.titling.bump_list_version', side_effect=lambda s: calls.append("list")):
+            titles = TitleWorker().title_conversations([1, 2, 3])
+
+        assert client.chat.completions.create.call_count == 1
+        assert titles == {1: "Budget Basics", 2: "Emergency Fund", 3: "How do I budget?"}
+        assert conversations[2].title == "Emergency Fund"
+        # The list counter is bumped once, after every conversation row
+        assert calls == [1, 2, 3, "list"]
+
+class TestModelRouter:
+    """Test model and output budget selection."""
+
+    def test_titles_use_the_fast_model(self):
+        """Test that short utility work goes to the cheapest model."""
+        with patch.object(Config, 'ROUTER_FAST_MODEL', 'gpt-3.5-turbo'), \
+             patch.object(Config, 'OPENAI_MODEL', 'gpt-4'):
+            route = route_request(TITLE, [{"role": "user", "content": "Title this"}], max_tokens=40)
+
+        assert route.model == 'gpt-3.5-turbo'
+        assert route.max_tokens == 40
+        assert not route.escalated
+
+    def test_chat_uses_the_configured_model(self):
+        """Test that chat turns honor OPENAI_MODEL and OPENAI_MAX_TOKENS."""
+        with patch.object(Config, 'OPENAI_MODEL', 'gpt-4'), patch.object(Config, 'OPENAI_MAX_TOKENS', 500):
+            route = route_request(CHAT, [{"role": "user", "content": "How much should I save?"}])
+
+        assert route.model == 'gpt-4'
+        assert route.max_tokens == 500
+        assert route.prompt_tokens > 0
+
+    def test_oversized_prompt_escalates(self):
+        """Test that only prompts too large for the preferred model escalate."""
+        messages = [{"role": "user", "content": "ledger " * 9000}]
+        with patch.object(Config, 'OPENAI_MODEL', 'gpt-4'), \
+             patch.object(Config, 'ROUTER_LARGE_CONTEXT_MODEL', 'gpt-4o-mini'):
+            route = route_request(DOCUMENT, messages, max_tokens=1000)
+
+        assert route.model == 'gpt-4o-mini'
+        assert route.escalated
+        assert route.max_tokens == 1000
+
+    def test_output_budget_shrinks_without_a_larger_model(self):
+        """Test that the reply budget is cut to the room left in the window."""
+        messages = [{"role": "user", "content": "a " * 6000}]
+        with patch.object(Config, 'OPENAI_MODEL', 'gpt-4'), \
+             patch.object(Config, 'ROUTER_LARGE_CONTEXT_MODEL', 'gpt-4'):
+            route = route_request(DOCUMENT, messages, max_tokens=4000)
+
+        assert route.model == 'gpt-4'
+        assert not route.escalated
+        assert route.prompt_tokens + route.max_tokens <= 8192
+
+class TestStreamCancellation:
+    """Test that a client disconnect stops generation and keeps the partial reply."""
+
+    def run_stream(self, chunks_to_read, response_tokens=50):
+        client = SimulatedLLMClient(tokens_per_second=1e6, time_to_first_token=0, response_tokens=response_tokens)
+        upstream_streams = []
+        create = client.chat.completions.create
+
+        def tracking_create(**kwargs):
+            stream = create(**kwargs)
+            upstream_streams.append(stream)
+            return stream
+
+        client.chat.completions.create = tracking_create
+        metrics = StreamMetrics()
+        with patch('app.services.chat.start_chat_turn', return_value=(5, [{"role": "user", "content": "Hi"}], False)), \
+             patch('app.services.chat.finish_chat_turn') as finish, \
+             patch('app.services.chat.get_openai_client', return_value=client), \
+             patch('app.services.chat.stream_metrics', metrics), \
+             patch.object(Config, 'OPENAI_MAX_TOKENS', 400):
+            stream = get_chat_response_stream("Hi", 5)
+            received = [next(stream) for _ in range(chunks_to_read)]
+            stream.close()
+        return received, finish, metrics, upstream_streams[0]
+
+    def test_disconnect_saves_truncated_reply(self):
+        """Test that closing the stream persists what was generated, marked truncated."""
+        received, finish, metrics, upstream = self.run_stream(chunks_to_read=3)
+
+        finish.assert_called_once()
+        conversation_id, content = finish.call_args.args
+        assert conversation_id == 5
+        assert finish.call_args.kwargs == {"truncated": True}
+        assert content.startswith("".join(received))
+        assert len(content.split()) < 50
+
+        # The upstream generator was closed, not drained
+        assert upstream.gi_frame is None
+        stats = metrics.stats()
+        assert stats["cancelled"] == 1 and stats["completed"] == 0
+        assert stats["tokens_saved"] > 300
+
+    def test_completed_stream_is_not_truncated(self):
+        """Test that a fully read stream is stored normally."""
+        client = SimulatedLLMClient(tokens_per_second=1e6, time_to_first_token=0, response_tokens=10)
+        metrics = StreamMetrics()
+        with patch('app.services.chat.start_chat_turn', return_value=(5, [{"role": "user", "content": "Hi"}], False)), \
+             patch('app.services.chat.finish_chat_turn') as finish, \
+             patch('app.services.chat.get_openai_client', return_value=client), \
+             patch('app.services.chat.stream_metrics', metrics):
+            text = "".join(get_chat_response_stream("Hi", 5))
+
+        finish.assert_called_once_with(5, text)
+        assert metrics.stats()["completed"] == 1
+        assert metrics.stats()["tokens_streamed"] == 10
+
+class TestResumableStreams:
+    """Test stream buffering and Last-Event-ID resumption."""
+
+    def frames(self, sse_text):
+        return [frame for frame in sse_text.split("\n\n") if frame]
+
+    def test_resume_replays_missed_events(self):
+        """Test that tailing after an event id replays only later events."""
+        buffer = StreamBuffer(conversation_id=3)
+        for word in ["Save ", "early ", "and ", "often."]:
+            buffer.append({"chunk": word})
+        buffer.append({"end": True})
+        buffer.finish()
+
+        first = self.frames("".join(buffer.tail(0)))
+        assert len(first) == 5
+        last_event_id = first[1].split("\n")[0][len("id: "):]
+        assert parse_event_id(last_event_id) == (buffer.stream_id, 2)
+
+        resumed = self.frames("".join(buffer.tail(parse_event_id(last_event_id)[1])))
+        assert [json.loads(frame.split("data: ")[1]) for frame in resumed] == [
+            {"chunk": "and "}, {"chunk": "often."}, {"end": True}
+        ]
+
+    def test_dropped_events_cannot_be_resumed(self):
+        """Test that resuming past the ring's oldest event reports an error."""
+        buffer = StreamBuffer(conversation_id=3, max_events=3)
+        for i in range(10):
+            buffer.append({"chunk": str(i)})
+        buffer.finish()
+
+        assert buffer.events_after(2) is None
+        assert [number for number, _ in buffer.events_after(7)] == [8, 9, 10]
+        resumed = self.frames("".join(buffer.tail(2)))
+        assert '"resumable": false' in resumed[0]
+
+    def test_registry_is_bounded(self):
+        """Test the stream count cap and TTL eviction."""
+        registry = StreamRegistry(max_streams=2, ttl_seconds=60)
+        first = registry.create(1)
+        first.finish()
+        second = registry.create(1)
+        third = registry.create(1)
+
+        # The finished stream is evicted before any running one
+        assert registry.get(first.stream_id) is None
+        assert registry.get(second.stream_id) is second
+        fourth = registry.create(1)
+        assert second.cancelled
+        assert len(registry) == 2
+
+        third.finish()
+        fourth.finish()
+        with patch('app.services.stream_buffer.time.monotonic', return_value=time.monotonic() + 61):
+            assert registry.get(third.stream_id) is None
+        assert len(registry) == 0
+
+    def test_abandoned_stream_stops_generation(self):
+        """Test that the producer closes the chat stream once no client is attached."""
+        closed = []
+
+        def chunks():
+            try:
+                for i in range(100):
+                    yield f"{i} "
+            finally:
+                closed.append(True)
+
+        buffer = StreamBuffer(conversation_id=3)
+        buffer.cancel()
+        produce(buffer, chunks(), grace_seconds=15)
+
+        assert closed == [True]
+        assert buffer.finished
+        assert buffer.events_after(0)[-1][1] == {"error": "Stream cancelled", "resumable": False}
+
+    def test_attached_stream_runs_to_completion(self):
+        """Test that a stream with a client attached is produced in full."""
+        buffer = StreamBuffer(conversation_id=3)
+        buffer.attach()
+        produce(buffer, iter(["a", "b"]), grace_seconds=0)
+
+        assert [data for _, data in buffer.events_after(0)] == [
+            {"chunk": "a"}, {"chunk": "b"}, {"end": True, "conversation_id": 3}
+        ]
+
+class TestFrameCoalescing:
+    """Test batching of stream deltas into SSE frames."""
+
+    def frame_data(self, frames):
+        return [json.loads(frame.split("data: ")[1]) for frame in "".join(frames).split("\n\n") if frame]
+
+    def test_pending_chunks_share_a_frame(self):
+        """Test that available chunks merge into one frame ending at the last id."""
+        buffer = StreamBuffer(conversation_id=3)
+        for word in ["Save ", "early ", "and ", "often."]:
+            buffer.append({"chunk": word})
+        buffer.append({"end": True})
+        buffer.finish()
+
+        frames = list(buffer.tail(0, flush_interval=0.03, max_frame_bytes=0))
+        assert self.frame_data(frames) == [{"chunk": "Save early and often."}, {"end": True}]
+        assert frames[0].startswith(f"id: {buffer.stream_id}:4\n")
+
+        # Without coalescing every delta is its own frame
+        assert len(list(buffer.tail(0))) == 5
+
+    def test_byte_threshold_splits_frames(self):
+        """Test that a frame is cut once max_frame_bytes of text are pending."""
+        buffer = StreamBuffer(conversation_id=3)
+        for _ in range(10):
+            buffer.append({"chunk": "abcd"})
+        buffer.finish()
+
+        frames = self.frame_data(buffer.tail(0, flush_interval=0.03, max_frame_bytes=12))
+        assert [len(frame["chunk"]) for frame in frames] == [12, 12, 12, 4]
+
+    def test_fast_stream_is_batched_without_delaying_first_token(self):
+        """Test that a fast producer yields far fewer frames than deltas."""
+        buffer = StreamBuffer(conversation_id=3)
+        client = SimulatedLLMClient(tokens_per_second=2000, time_to_first_token=0.01, response_tokens=200)
+
+        def chunks():
+            for chunk in client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "Hi"}], stream=True):
+                if chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+        producer = threading.Thread(target=produce, args=(buffer, chunks(), 60.0))
+        producer.start()
+        frames = self.frame_data(buffer.tail(0, flush_interval=0.03, max_frame_bytes=512))
+        producer.join()
+
+        assert len(frames) < 40
+        assert len(frames[0]["chunk"]) < 20
+        assert frames[-1] == {"end": True, "conversation_id": 3}
+        complete = client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "Hi"}])
+        assert "".join(frame.get("chunk", "") for frame in frames) == complete.choices[0].message.content
+
+class TestChatTools:
+    """Test calculators run as local function-calling tools."""
+
+    def tool_call(self, call_id, name, arguments):
+        return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+    def test_mortgage_tool_returns_compact_exact_result(self):
+        """Test that a tool result carries the key figures but no schedules or advice."""
+        result = json.loads(run_tool("mortgage_calculator", json.dumps({
+            "loan_amount": 300000, "interest_rate": 6, "loan_term_years": 30,
+        })))
+
+        assert result["monthly_payment"] == 1798.65
+        assert result["total_interest"] == pytest.approx(347514.57, abs=0.5)
+        assert "amortization_schedule" not in result
+        assert "insights" not in result
+
+    def test_invalid_calls_return_errors_to_the_model(self):
+        """Test that bad arguments become an error result instead of an exception."""
+        assert json.loads(run_tool("mortgage_calculator", json.dumps({"loan_amount": 0})))["error"] == "Loan amount must be greater than 0"
+        assert "error" in json.loads(run_tool("calculate_tax", "not json"))
+        assert "error" in json.loads(run_tool("calculate_tax", json.dumps({"income": -5})))
+        assert json.loads(run_tool("wire_money", "{}")) == {"error": "Unknown tool: wire_money"}
+        assert json.loads(run_tool("calculate_tax", json.dumps({"income": 50000}))) == {"income": 50000.0, "estimated_tax": 6617.0}
+
+    def test_tool_call_is_answered_with_local_result(self):
+        """Test that a tool call runs in-process and the model answers from its result."""
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+                content=None, tool_calls=[self.tool_call("call_1", "calculate_tax", {"income": 50000})],
+            ))]),
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+                content="Your estimated tax is $6,617.00.", tool_calls=None,
+            ))]),
+        ]
+        with patch('app.services.chat.start_chat_turn', return_value=(5, [{"role": "user", "content": "Tax on 50k?"}], False)), \
+             patch('app.services.chat.finish_chat_turn') as finish, \
+             patch('app.services.chat.get_openai_client', return_value=client), \
+             patch.object(Config, 'CHAT_TOOLS_ENABLED', True):
+            reply, conversation_id = get_chat_response("Tax on 50k?", 5)
+
+        assert reply == "Your estimated tax is $6,617.00."
+        finish.assert_called_once_with(5, reply)
+        first, second = client.chat.completions.create.call_args_list
+        assert {tool["function"]["name"] for tool in first.kwargs["tools"]} >= {"calculate_tax", "mortgage_calculator"}
+        assistant, tool_result = second.kwargs["messages"][-2:]
+        assert assistant["tool_calls"][0]["id"] == "call_1"
+        assert tool_result == {"role": "tool", "tool_call_id": "call_1", "content": '{"income":50000.0,"estimated_tax":6617.0}'}
+
+    def test_streamed_tool_call_fragments_are_reassembled(self):
+        """Test that tool call deltas split across chunks are joined before running."""
+        def delta_chunk(**delta):
+            delta.setdefault("content", None)
+            delta.setdefault("tool_calls", None)
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(**delta))])
+
+        def fragment(index, arguments, call_id=None, name=None):
+            return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+        tool_round = [
+            delta_chunk(tool_calls=[fragment(0, "", call_id="call_1", name="calculate_tax")]),
+            delta_chunk(tool_calls=[fragment(0, '{"inco')]),
+            delta_chunk(tool_calls=[fragment(0, 'me": 50000}')]),
+        ]
+        answer_round = [delta_chunk(content="About "), delta_chunk(content="$6,617.00.")]
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [iter(tool_round), iter(answer_round)]
+        with patch('app.services.chat.start_chat_turn', return_value=(5, [{"role": "user", "content": "Tax on 50k?"}], False)), \
+             patch('app.services.chat.finish_chat_turn') as finish, \
+             patch('app.services.chat.get_openai_client', return_value=client), \
+             patch('app.services.chat.stream_metrics', StreamMetrics()), \
+             patch.object(Config, 'CHAT_TOOLS_ENABLED', True):
+            text = "".join(get_chat_response_stream("Tax on 50k?", 5))
+
+        assert text == "About $6,617.00."
+        finish.assert_called_once_with(5, text)
+        tool_result = client.chat.completions.create.call_args_list[1].kwargs["messages"][-1]
+        assert json.loads(tool_result["content"])["estimated_tax"] == 6617.0
+
+    def test_tool_rounds_are_capped(self):
+        """Test that the last allowed request forbids further tool calls."""
+        looping = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(
+            content="Done.", tool_calls=[self.tool_call("call_x", "calculate_tax", {"income": 1000})],
+        ))])
+        client = MagicMock()
+        client.chat.completions.create.return_value = looping
+        with patch('app.services.chat.start_chat_turn', return_value=(5, [{"role": "user", "content": "Hi"}], False)), \
+             patch('app.services.chat.finish_chat_turn'), \
+             patch('app.services.chat.get_openai_client', return_value=client), \
+             patch.object(Config, 'CHAT_TOOLS_ENABLED', True), \
+             patch.object(Config, 'CHAT_TOOL_MAX_ROUNDS', 2):
+            get_chat_response("Hi", 5)
+
+        calls = client.chat.completions.create.call_args_list
+        assert len(calls) == 3
+        assert calls[-1].kwargs["tool_choice"] == "none"
+
+class TestAdmissionControl:
+    """Test token-bucket rate limiting and the in-flight cap."""
+
+    def controller(self, **overrides):
+        settings = dict(client_rate=1.0, client_burst=2, global_rate=100.0, global_burst=100, max_in_flight=10, busy_retry_after=2.0)
+        settings.update(overrides)
+        return AdmissionController(**settings)
+
+    def test_client_burst_then_retry_after(self):
+        """Test that a client gets its burst, then a 429 with the refill wait."""
+        clock = [100.0]
+        with patch('app.services.admission.time.monotonic', lambda: clock[0]):
+            admission = self.controller(client_rate=0.5)
+            admission.admit("10.0.0.1").release()
+            admission.admit("10.0.0.1").release()
+            with pytest.raises(RateLimitError) as excinfo:
+                admission.admit("10.0.0.1")
+            admission.admit("10.0.0.2").release()
+
+            clock[0] += 2.0
+            admission.admit("10.0.0.1").release()
+
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.retry_after == 2
+        assert excinfo.value.details == {"scope": "client"}
+        assert admission.stats()["rejected_client"] == 1
+
+    def test_global_bucket_limits_all_clients(self):
+        """Test that the worker-wide budget is shared, and refusals consume nothing."""
+        with patch('app.services.admission.time.monotonic', lambda: 50.0):
+            admission = self.controller(client_burst=1, global_rate=1.0, global_burst=2)
+            admission.admit("a").release()
+            with pytest.raises(RateLimitError):
+                admission.admit("a")
+            admission.admit("b").release()
+            with pytest.raises(RateLimitError) as excinfo:
+                admission.admit("c")
+
+        assert excinfo.value.details == {"scope": "global"}
+        assert admission.stats()["admitted"] == 2
+
+    def test_in_flight_cap_sheds_load(self):
+        """Test that slots are held until released and released only once."""
+        admission = self.controller(client_burst=10, max_in_flight=2)
+        first = admission.admit("a")
+        second = admission.admit("b")
+        with pytest.raises(RateLimitError) as excinfo:
+            admission.admit("c")
+        first.release()
+        first.release()
+        third = admission.admit("c")
+
+        assert excinfo.value.retry_after == 2
+        assert excinfo.value.details == {"scope": "in_flight"}
+        assert admission.stats()["in_flight"] == 2
+        second.release()
+        third.release()
+        assert admission.stats()["in_flight"] == 0
+
+    def test_stream_holds_slot_until_generation_ends(self):
+        """Test that a streamed reply releases its slot when the producer finishes."""
+        admission = self.controller(max_in_flight=1)
+        slot = admission.admit("a")
+        release_gate = threading.Event()
+
+        def chunks():
+            release_gate.wait(1)
+            yield "Done."
+
+        buffer = start_stream(StreamRegistry(), 1, chunks, grace_seconds=5, on_finish=slot.release)
+        assert admission.stats()["in_flight"] == 1
+        release_gate.set()
+        list(buffer.tail(0))
+        deadline = time.monotonic() + 1
+        while admission.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert admission.stats()["in_flight"] == 0
+
+    def test_disabled_controller_admits_everything(self):
+        """Test that RATE_LIMIT_ENABLED=false turns admission into a no-op."""
+        admission = self.controller(client_burst=1, max_in_flight=1, enabled=False)
+        slots = [admission.admit("a") for _ in range(5)]
+        for slot in slots:
+            slot.release()
+        assert admission.stats()["admitted"] == 0
+
+    def test_client_id_ignores_client_supplied_forwarded_hops(self):
+        """Test that only the X-Forwarded-For hop added by the trusted proxy identifies the client."""
+        def request(forwarded):
+            return SimpleNamespace(headers={"X-Forwarded-For": forwarded}, remote_addr="10.0.0.254")
+
+        with patch.object(Config, 'RATE_LIMIT_TRUST_PROXY', True), patch.object(Config, 'RATE_LIMIT_TRUSTED_PROXIES', 1):
+            assert get_client_id(request("6.6.6.6, 203.0.113.7")) == "203.0.113.7"
+            assert get_client_id(request("7.7.7.7, 203.0.113.7")) == "203.0.113.7"
+        with patch.object(Config, 'RATE_LIMIT_TRUST_PROXY', True), patch.object(Config, 'RATE_LIMIT_TRUSTED_PROXIES', 2):
+            assert get_client_id(request("6.6.6.6, 203.0.113.7, 10.0.0.3")) == "203.0.113.7"
+            assert get_client_id(request("203.0.113.7")) == "10.0.0.254"
+        with patch.object(Config, 'RATE_LIMIT_TRUST_PROXY', False):
+            assert get_client_id(request("203.0.113.7")) == "10.0.0.254"
+
+class TestMessageRetrieval:
+    """Test BM25 recall of older messages into the prompt."""
+
+    MESSAGES = [
+        (1, "user", "We bought a house last year. Our mortgage rate is 6.25% on a 30-year loan."),
+        (2, "assistant", "Thanks. With that rate, extra principal payments save a lot of interest."),
+        (3, "user", "I also have $12,000 in an emergency fund."),
+        (4, "assistant", "An emergency fund of six months of expenses is a good target."),
+        (5, "user", "Should I max out my Roth IRA this year?"),
+    ]
+
+    def test_tokenize_keeps_numbers(self):
+        """Test that figures survive tokenization and stopwords are dropped."""
+        assert tokenize("What was that mortgage rate I mentioned?") == ["mortgage", "rate", "mentioned"]
+        assert tokenize("Rates of 6.25% on $300,000 loans") == ["rate", "6.25", "300,000", "loan"]
+
+    def test_question_finds_the_stated_fact(self):
+        """Test that BM25 ranks the message where the rate was stated first."""
+        index = ConversationIndex()
+        for seq, _, content in self.MESSAGES:
+            index.add(seq, content)
+
+        hits = index.search("what was that mortgage rate I mentioned?", top_k=3)
+
+        assert hits[0][0] == 1
+        assert all(seq != 3 for seq, _ in hits)
+        assert index.search("mortgage rate", top_k=3, before_seq=1) == []
+
+    def test_index_catches_up_incrementally(self):
+        """Test that only messages not yet indexed are loaded, and appends stay contiguous."""
+        retrieval = RetrievalIndex(max_conversations=2)
+        loads = []
+
+        def load_rows(session, conversation_id, after_seq, before_seq):
+            loads.append((after_seq, before_seq))
+            return [(seq, content) for seq, _, content in self.MESSAGES if after_seq < seq < before_seq]
+
+        with patch.object(RetrievalIndex, '_load_rows', staticmethod(load_rows)):
+            assert retrieval.search(None, 7, "mortgage", before_seq=4, top_k=2)[0][0] == 1
+            retrieval.note_message(7, 4, self.MESSAGES[3][2])
+            retrieval.note_message(7, 9, "out of order, left for the next catch-up")
+            hits = retrieval.search(None, 7, "emergency fund", before_seq=5, top_k=2)
+            retrieval.search(None, 8, "fund", before_seq=2, top_k=1)
+            retrieval.search(None, 9, "fund", before_seq=2, top_k=1)
+
+        assert loads == [(0, 4), (0, 2), (0, 2)]
+        assert {seq for seq, _ in hits} == {3, 4}
+        assert retrieval.stats()["conversations"] == 2
+
+    def test_payload_recalls_messages_outside_the_window(self):
+        """Test that a fact dropped from the history window is added to the system prompt."""
+        rate_message = SimpleNamespace(seq=1, role="user", content=self.MESSAGES[0][2], token_count=20)
+        history = [
+            rate_message,
+            SimpleNamespace(seq=2, role="assistant", content="Long budgeting advice.", token_count=7500),
+            SimpleNamespace(seq=3, role="user", content="Long spending breakdown.", token_count=7500),
+            SimpleNamespace(seq=4, role="user", content="What was that mortgage rate I mentioned?", token_count=10),
+        ]
+        session = MagicMock()
+        session.query.return_value.filter.return_value.all.return_value = [rate_message]
+
+        def load_rows(session, conversation_id, after_seq, before_seq):
+            return [(msg.seq, msg.content) for msg in history if after_seq < msg.seq < before_seq]
+
+        with patch('app.services.retrieval.retrieval_index', RetrievalIndex()), \
+             patch.object(RetrievalIndex, '_load_rows', staticmethod(load_rows)), \
+             patch.object(Config, 'OPENAI_MODEL', 'gpt-3.5-turbo'), \
+             patch.object(Config, 'OPENAI_MAX_TOKENS', 1000), \
+             patch.object(Config, 'RETRIEVAL_ENABLED', True):
+            payload = build_message_payload(history, None, session, 7)
+
+        assert [msg["content"] for msg in payload[1:]] == ["Long spending breakdown.", "What was that mortgage rate I mentioned?"]
+        assert "User: We bought a house last year. Our mortgage rate is 6.25%" in payload[0]["content"]
+
+class TestKeysetCursors:
+    """Test the opaque keyset cursors of paged endpoints."""
+
+    def test_cursor_round_trip(self):
+        """Test that sort keys survive encoding exactly."""
+        rank = 0.060792710632085800
+        cursor = encode_cursor([rank, 12345])
+
+        assert "=" not in cursor
+        assert decode_search_cursor(cursor) == (rank, 12345)
+        assert decode_conversation_cursor(encode_cursor(["2026-10-17T14:05:41.582913", 7])) == (
+            datetime(2026, 10, 17, 14, 5, 41, 582913), 7
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test that tampered cursors raise a validation error."""
+        for cursor in ["not-a-cursor", encode_cursor([0.5, 1])[:-3], encode_cursor(["a", 1]), encode_cursor([0.5, 1.5])]:
+            with pytest.raises(ValidationError):
+                decode_search_cursor(cursor)
+        for cursor in [encode_cursor(["yesterday", 1]), encode_cursor(["2026-10-17T14:05:41", "1"]), encode_cursor([1])]:
+            with pytest.raises(ValidationError):
+                decode_conversation_cursor(cursor)
+        for cursor in [encode_cursor([3, -1]), encode_cursor(["3", 4]), encode_cursor([3, 4, 5])]:
+            with pytest.raises(ValidationError):
+                decode_sync_cursor(cursor)
+        assert decode_sync_cursor(encode_cursor([3, 4])) == (3, 4)
+
+    def test_parse_limit(self):
+        """Test page size defaults and bounds."""
+        assert parse_limit(None, 50, 200) == 50
+        assert parse_limit("20", 50, 200) == 20
+        with pytest.raises(ValidationError):
+            parse_limit("500", 50, 200)
+        with pytest.raises(ValidationError):
+            parse_limit("0", 50, 200)
+
+class TestConversationCounters:
+    """Test how chat turns and repairs maintain the conversation counters and versions."""
+
+    def test_list_version_is_bumped_last(self):
+        """Test that the global list counter is bumped after the prompt is built, just before commit."""
+        from app.services import chat
+        calls = []
+        session = MagicMock()
+
+        @contextmanager
+        def fake_session():
+            yield session
+            calls.append("commit")
+
+        with patch.object(chat, 'get_db_session', fake_session), \
+             patch.object(chat, 'next_message_seq', return_value=3), \
+             patch.object(chat, 'get_unsummarized_messages', return_value=[]), \
+             patch.object(chat, 'record_message_added', side_effect=lambda *a: calls.append("message")), \
+             patch.object(chat, 'build_message_payload', side_effect=lambda *a: calls.append("payload") or []), \
+             patch.object(chat, 'bump_list_version', side_effect=lambda *a: calls.append("list")), \
+             patch.object(chat.retrieval_index, 'note_message'), \
+             patch.object(chat, 'advance_summary'):
+            chat.start_chat_turn("How much should I save?", 7)
+            chat.finish_chat_turn(7, "About 15% of your income.")
+
+        assert calls == ["message", "payload", "list", "commit", "message", "list", "commit"]
+
+    def test_repair_bumps_versions_of_changed_batches(self):
+        """Test that a repair invalidates ETags of the rows and batches it changed."""
+        from app.services import conversation_counters
+        calls = []
+        session = MagicMock()
+        session.query.return_value.scalar.return_value = 4
+        session.execute.side_effect = [SimpleNamespace(rowcount=1), SimpleNamespace(rowcount=0)]
+
+        @contextmanager
+        def fake_session():
+            yield session
+            calls.append("commit")
+
+        with patch.object(conversation_counters, 'get_db_session', fake_session), \
+             patch.object(conversation_counters, 'bump_list_version', side_effect=lambda *a: calls.append("list")):
+            result = conversation_counters.repair_conversation_counters(batch_size=2)
+
+        assert result == {"max_conversation_id": 4, "repaired": 1}
+        assert calls == ["commit", "list", "commit", "commit"]
+        assert "version = conversations.version + 1" in str(session.execute.call_args_list[0][0][0])
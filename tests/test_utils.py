@@ -4,6 +4,7 @@ Test suite for utility functions.
 
 import pytest
 import tempfile
+import time
 import os
 import pandas as pd
 from unittest.mock import patch, MagicMock, mock_open
@@ -36,7 +37,11 @@ from app.utils.document_processor import (
     extract_data_from_csv,
     analyze_document_with_ai
 )
+from app.utils.openai_client import create_openai_client, get_openai_client, close_openai_client
+from app.utils.llm_simulator import SimulatedLLMClient, SimulatedLLMError
+from load_test_stream import SSEParser, StreamResult, build_level_report, percentile
 from app.main import create_app
+from config import Config
 
 class TestErrorHandling:
     """Test error handling utilities."""
@@ -320,11 +325,11 @@ class TestDocumentProcessor:
         finally:
             os.unlink(temp_file)
     
-    @patch('app.utils.document_processor.OpenAI')
-    def test_analyze_document_with_ai(self, mock_openai_class):
+    @patch('app.utils.document_processor.get_openai_client')
+    def test_analyze_document_with_ai(self, mock_get_client):
         """Test AI document analysis."""
         mock_client = MagicMock()
-        mock_openai_class.return_value = mock_client
+        mock_get_client.return_value = mock_client
         
         mock_response = MagicMock()
         mock_response.choices = [MagicMock()]
@@ -337,6 +342,120 @@ class TestDocumentProcessor:
         assert "This is a financial document analysis." in result
         mock_client.chat.completions.create.assert_called_once()
 
+class TestOpenAIClient:
+    """Test the shared OpenAI client factory."""
+    
+    @patch.object(Config, 'OPENAI_API_KEY', 'test-key')
+    def test_client_is_shared(self):
+        """Test that every caller gets the same pooled client."""
+        close_openai_client()
+        try:
+            assert get_openai_client() is get_openai_client()
+        finally:
+            close_openai_client()
+    
+    @patch.object(Config, 'OPENAI_API_KEY', 'test-key')
+    def test_client_timeouts_and_retries(self):
+        """Test that explicit timeouts and retries are configured."""
+        client = create_openai_client()
+        try:
+            assert client.timeout.connect == Config.OPENAI_CONNECT_TIMEOUT
+            assert client.timeout.read == Config.OPENAI_READ_TIMEOUT
+            assert client.max_retries == Config.OPENAI_MAX_RETRIES
+        finally:
+            client.close()
+
+class TestSimulatedLLMClient:
+    """Test the offline LLM simulator."""
+    
+    def test_selected_by_provider_flag(self):
+        """Test that LLM_PROVIDER=simulated swaps in the simulator."""
+        close_openai_client()
+        try:
+            with patch.object(Config, 'LLM_PROVIDER', 'simulated'):
+                assert isinstance(get_openai_client(), SimulatedLLMClient)
+        finally:
+            close_openai_client()
+    
+    def test_responses_are_deterministic(self):
+        """Test that the same prompt always gets the same reply."""
+        client = SimulatedLLMClient(tokens_per_second=1e6, time_to_first_token=0)
+        messages = [{"role": "user", "content": "How should I invest?"}]
+        
+        first = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages, max_tokens=30)
+        second = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages, max_tokens=30)
+        
+        assert first.choices[0].message.content == second.choices[0].message.content
+        assert len(first.choices[0].message.content.split(" ")) == 30
+        assert first.choices[0].finish_reason == "length"
+    
+    def test_stream_is_paced(self):
+        """Test time to first token and the token rate of a stream."""
+        client = SimulatedLLMClient(tokens_per_second=100, time_to_first_token=0.05, response_tokens=10)
+        messages = [{"role": "user", "content": "Explain compound interest"}]
+        
+        start = time.monotonic()
+        stream = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages, stream=True)
+        chunks = iter(stream)
+        first = next(chunks)
+        first_token_at = time.monotonic() - start
+        rest = list(chunks)
+        total = time.monotonic() - start
+        
+        assert first_token_at >= 0.05
+        assert total >= 0.05 + 9 / 100
+        assert first.choices[0].delta.content
+        assert rest[-1].choices[0].finish_reason == "stop"
+        streamed = "".join(chunk.choices[0].delta.content or "" for chunk in [first] + rest)
+        complete = client.chat.completions.create(model="gpt-3.5-turbo", messages=messages)
+        assert streamed == complete.choices[0].message.content
+    
+    def test_error_rate(self):
+        """Test that failures are injected at the configured rate."""
+        client = SimulatedLLMClient(time_to_first_token=0, tokens_per_second=1e6, error_rate=0.5, seed=1)
+        failures = 0
+        for _ in range(200):
+            try:
+                client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "hi"}])
+            except SimulatedLLMError:
+                failures += 1
+        
+        assert 60 < failures < 140
+
+class TestStreamLoadTestReport:
+    """Test the SSE load generator's parsing and statistics."""
+    
+    def test_sse_frames_are_parsed(self):
+        """Test that data lines are joined per event and comments ignored."""
+        parser = SSEParser()
+        lines = [': keep-alive', 'data: {"chunk": "Hi"}', '', 'data: {"chunk":', 'data:  "there"}', '', '']
+        events = [event for event in (parser.feed_line(line) for line in lines) if event is not None]
+        
+        assert events == ['{"chunk": "Hi"}', '{"chunk":\n "there"}']
+    
+    def test_percentiles(self):
+        """Test interpolated percentiles."""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50.5
+        assert percentile(values, 99) == pytest.approx(99.01)
+        assert percentile([], 50) is None
+    
+    def test_level_report(self):
+        """Test aggregation of stream results into a level report."""
+        results = [
+            StreamResult(ok=True, status=200, time_to_first_chunk=0.1, duration=1.1, chunks=11),
+            StreamResult(ok=True, status=200, time_to_first_chunk=0.3, duration=1.3, chunks=21),
+            StreamResult(ok=False, status=503, error="HTTP 503", duration=0.01),
+        ]
+        report = build_level_report(2, results, wall_time=2.0)
+        
+        assert (report.succeeded, report.failed) == (2, 1)
+        assert report.errors == {"HTTP 503": 1}
+        assert report.total_chunks == 32
+        assert report.aggregate_chunks_per_second == 16.0
+        assert report.time_to_first_chunk["p50"] == pytest.approx(0.2)
+        assert report.chunks_per_second["max"] == pytest.approx(20.0)
+
 class TestErrorResponseFormat:
     """Test error response formatting."""
     